@@ -3,7 +3,8 @@ from distutils.core import setup
 setup(
     name='simple_django_salesforce',
     version='0.1.0',
-    packages=['simple_django_salesforce', 'simple_django_salesforce.management.commands'],
+    packages=['simple_django_salesforce', 'simple_django_salesforce.management.commands',
+              'simple_django_salesforce.migrations', 'simple_django_salesforce.benchmark'],
     url='https://github.com/lorne-luo/simple_django_salesforce',
     download_url='https://github.com/lorne-luo/simple_django_salesforce/tarball/latest',
     license='Apache 2.0',
@@ -16,10 +17,15 @@ setup(
     install_requires=[
         'Django>=1.11.0',
         'requests[security]',
-        'simple_salesforce>=0.73.0',
+        'simple_salesforce>=0.75.3',  # headers= of SFType calls, _call_salesforce() passing stream= to requests
         'python-magic>=0.4.13',
     ],
+    extras_require={
+        'ijson': ['ijson>=3.1'],  # pull_all parses query pages while they stream in
+        'arrow': ['pyarrow>=1.0.0'],  # export to Parquet or Arrow IPC
+    },
     tests_require=[
+        'pytest-django>=3.0',
         'nose>=1.3.0',
         'pytz>=2014.1.1',
         'responses>=0.5.1',
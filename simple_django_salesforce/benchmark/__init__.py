@@ -0,0 +1,5 @@
+"""Benchmarks of sync paths against a local Salesforce stand-in
+
+    python -m simple_django_salesforce.benchmark --records 5000 --output before.json
+    python -m simple_django_salesforce.benchmark --records 5000 --compare before.json
+"""
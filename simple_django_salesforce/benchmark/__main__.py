@@ -0,0 +1,40 @@
+import argparse
+import json
+import sys
+
+from . import runner
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m simple_django_salesforce.benchmark',
+                                     description='Benchmark sync paths against a local Salesforce stand-in.')
+    parser.add_argument('--records', type=int, default=2000, help='records per scenario')
+    parser.add_argument('--push-records', type=int, default=None,
+                        help='records for per record http scenarios, default records / 10')
+    parser.add_argument('--page-size', type=int, default=500, help='query page size of the stand-in')
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every api request')
+    parser.add_argument('--scenario', action='append', dest='scenarios', help='only run given scenarios')
+    parser.add_argument('--label', default=None, help='label stored in the result, eg. version')
+    parser.add_argument('--output', default=None, help='write json result to file')
+    parser.add_argument('--compare', default=None, help='compare with a previous json result')
+    parser.add_argument('--threshold', type=float, default=0.1, help='allowed regression ratio')
+    args = parser.parse_args(argv)
+
+    bench = runner.Benchmark(records=args.records, push_records=args.push_records, page_size=args.page_size,
+                             scenarios=args.scenarios, latency=args.latency)
+    result = bench.run(label=args.label)
+
+    if args.output:
+        runner.dump(result, args.output)
+    else:
+        print(json.dumps(result, indent=2))
+
+    if args.compare:
+        lines, regressed = runner.compare(result, runner.load(args.compare), args.threshold)
+        print('\n'.join(lines))
+        return 1 if regressed else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,48 @@
+"""synthetic salesforce records for benchmarks"""
+import random
+from datetime import date, datetime, timedelta
+
+INDUSTRIES = ('Agriculture', 'Banking', 'Education', 'Energy', 'Retail', 'Technology')
+NAMES = ('Alice', 'Bob', 'Carol', 'Dave', 'Erin', 'Frank', 'Grace', 'Heidi', 'Ivan', 'Judy')
+
+
+def account_record(index, rnd):
+    founded = date(1950, 1, 1) + timedelta(days=rnd.randint(0, 25000))
+    last_activity = datetime(2017, 1, 1) + timedelta(seconds=rnd.randint(0, 3 * 365 * 86400))
+    return {
+        'Name': 'Account %06d' % index,
+        'Industry': rnd.choice(INDUSTRIES),
+        'AnnualRevenue': '%.2f' % (rnd.random() * 10 ** 7),
+        'NumberOfEmployees': rnd.randint(1, 50000),
+        'Active__c': rnd.random() > 0.2,
+        'Description': ' '.join(rnd.choice(NAMES) for _ in range(rnd.randint(5, 40))),
+        'Founded__c': founded.isoformat(),
+        'LastActivity__c': last_activity.strftime('%Y-%m-%dT%H:%M:%S.000+0000'),
+    }
+
+
+def contact_record(index, rnd, account_ids=()):
+    first_name, last_name = rnd.choice(NAMES), rnd.choice(NAMES)
+    return {
+        'AccountId': rnd.choice(account_ids) if account_ids else None,
+        'FirstName': first_name,
+        'LastName': '%s %06d' % (last_name, index),
+        'Email': '%s.%s%s@example.com' % (first_name.lower(), last_name.lower(), index),
+    }
+
+
+def account_records(count, seed=0):
+    rnd = random.Random(seed)
+    return [account_record(i, rnd) for i in range(count)]
+
+
+def contact_records(count, account_ids=(), seed=0):
+    rnd = random.Random(seed)
+    return [contact_record(i, rnd, list(account_ids)) for i in range(count)]
+
+
+def seed_store(store, accounts=0, contacts=0, seed=0):
+    """fill a SObjectStore, return (account ids, contact ids)"""
+    account_ids = [store.insert('Account', x) for x in account_records(accounts, seed)]
+    contact_ids = [store.insert('Contact', x) for x in contact_records(contacts, account_ids, seed)]
+    return account_ids, contact_ids
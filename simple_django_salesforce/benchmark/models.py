@@ -0,0 +1,85 @@
+from django.db import models
+
+from ..model import SalesforceModel, UniqueSalesforceModel
+
+
+class BenchmarkAccount(SalesforceModel):
+    name = models.CharField(max_length=255, blank=True, null=True)
+    industry = models.CharField(max_length=40, blank=True, null=True)
+    annual_revenue = models.DecimalField(max_digits=18, decimal_places=2, blank=True, null=True)
+    employees = models.IntegerField(blank=True, null=True)
+    active = models.BooleanField(default=False)
+    description = models.TextField(blank=True, null=True)
+    founded = models.DateField(blank=True, null=True)
+    last_activity = models.DateTimeField(blank=True, null=True)
+
+    salesforce_table_name = 'Account'
+    fields_map = {
+        'salesforce_id': 'Id',
+        'name': 'Name',
+        'industry': 'Industry',
+        'annual_revenue': 'AnnualRevenue',
+        'employees': 'NumberOfEmployees',
+        'active': 'Active__c',
+        'description': 'Description',
+        'founded': 'Founded__c',
+        'last_activity': 'LastActivity__c',
+    }
+
+
+class BenchmarkContact(SalesforceModel):
+    account = models.ForeignKey(BenchmarkAccount, blank=True, null=True, on_delete=models.SET_NULL)
+    first_name = models.CharField(max_length=40, blank=True, null=True)
+    last_name = models.CharField(max_length=80, blank=True, null=True)
+    email = models.EmailField(blank=True, null=True)
+
+    salesforce_table_name = 'Contact'
+    fields_map = {
+        'salesforce_id': 'Id',
+        'account.salesforce_id': 'AccountId',
+        'first_name': 'FirstName',
+        'last_name': 'LastName',
+        'email': 'Email',
+    }
+
+
+class BenchmarkContactWithAccount(BenchmarkContact):
+    """accounts selected through the `Account` relationship of the contact query"""
+    salesforce_parents = {'account': 'Account'}
+
+    class Meta:
+        proxy = True
+
+
+class BenchmarkAccountWithContacts(BenchmarkAccount):
+    """contacts selected through the `Contacts` child relationship of the account query"""
+    salesforce_children = {'Contacts': BenchmarkContact}
+
+    class Meta:
+        proxy = True
+
+
+class BenchmarkUniqueAccount(UniqueSalesforceModel):
+    """same as BenchmarkAccount with a unique salesforce_id, pulled with upserts"""
+    name = models.CharField(max_length=255, blank=True, null=True)
+    industry = models.CharField(max_length=40, blank=True, null=True)
+    annual_revenue = models.DecimalField(max_digits=18, decimal_places=2, blank=True, null=True)
+    employees = models.IntegerField(blank=True, null=True)
+    active = models.BooleanField(default=False)
+    description = models.TextField(blank=True, null=True)
+    founded = models.DateField(blank=True, null=True)
+    last_activity = models.DateTimeField(blank=True, null=True)
+
+    salesforce_table_name = 'Account'
+    fields_map = BenchmarkAccount.fields_map
+
+
+class BenchmarkUniqueContact(UniqueSalesforceModel):
+    """same as BenchmarkContact with a unique salesforce_id, pulled with upserts"""
+    account = models.ForeignKey(BenchmarkUniqueAccount, blank=True, null=True, on_delete=models.SET_NULL)
+    first_name = models.CharField(max_length=40, blank=True, null=True)
+    last_name = models.CharField(max_length=80, blank=True, null=True)
+    email = models.EmailField(blank=True, null=True)
+
+    salesforce_table_name = 'Contact'
+    fields_map = BenchmarkContact.fields_map
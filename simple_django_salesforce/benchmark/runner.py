@@ -0,0 +1,381 @@
+import io
+import json
+import platform
+import time
+import tracemalloc
+from collections import OrderedDict
+
+import django
+from django.conf import settings
+
+from .server import FakeSalesforceServer
+from . import generators
+
+
+def configure(server):
+    """standalone django settings pointing to the stand-in, must run before importing models"""
+    settings.configure(
+        DEBUG=False,
+        USE_TZ=True,
+        DATABASES={'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'}},
+        INSTALLED_APPS=['simple_django_salesforce', 'simple_django_salesforce.benchmark'],
+        SALESFORCE_OFFLINE=False,
+        SALESFORCE_API_USER='benchmark@example.com',
+        SALESFORCE_API_PASSWORD='',
+        SALESFORCE_API_TOKEN='',
+        SALESFORCE_SANDBOX=False,
+        SALESFORCE_MULTICHOICE_FIELD_SEPARATOR=';',
+        CHATTER_OAUTH_CLIENT_ID='benchmark',
+        CHATTER_OAUTH_CLIENT_SECRET='benchmark',
+        CHATTER_API_URL=server.url,
+    )
+    django.setup()
+    settings.SALESFORCE_CLIENT = server.client()
+
+    from django.core.management import call_command
+    call_command('migrate', run_syncdb=True, verbosity=0)
+
+
+class QueryCounter(object):
+    """count executed sql, CaptureQueriesContext is capped by queries_log size"""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class Scenario(object):
+    name = None
+
+    def __init__(self, bench):
+        self.bench = bench
+
+    def setup(self):
+        pass
+
+    def run(self):
+        """run the measured code, return number of records processed"""
+        raise NotImplementedError
+
+
+class SerializeScenario(Scenario):
+    name = 'serialize'
+
+    def setup(self):
+        from .models import BenchmarkAccount
+        self.objects = []
+        for record in generators.account_records(self.bench.records):
+            obj = BenchmarkAccount()
+            obj.deserialize(record)
+            self.objects.append(obj)
+
+    def run(self):
+        for obj in self.objects:
+            obj.serialize()
+        return len(self.objects)
+
+
+class DeserializeScenario(Scenario):
+    name = 'deserialize'
+
+    def setup(self):
+        self.data = generators.account_records(self.bench.records)
+
+    def run(self):
+        from .models import BenchmarkAccount
+        for record in self.data:
+            BenchmarkAccount().deserialize(record)
+        return len(self.data)
+
+
+class PullAllInsertScenario(Scenario):
+    name = 'pull_all_insert'
+
+    def setup(self):
+        self.bench.reset()
+        generators.seed_store(self.bench.server.store, accounts=self.bench.records)
+
+    def run(self):
+        from .models import BenchmarkAccount
+        existed, new, deleted = BenchmarkAccount.pull_all(create_new=True)
+        return len(new)
+
+
+class PullAllUpdateScenario(PullAllInsertScenario):
+    name = 'pull_all_update'
+
+    def setup(self):
+        from .models import BenchmarkAccount
+        super(PullAllUpdateScenario, self).setup()
+        BenchmarkAccount.pull_all(create_new=True)
+
+    def run(self):
+        from .models import BenchmarkAccount
+        existed, new, deleted = BenchmarkAccount.pull_all()
+        return len(existed)
+
+
+class PullAllPipelinedInsertScenario(PullAllInsertScenario):
+    name = 'pull_all_pipelined_insert'
+
+    def run(self):
+        from .models import BenchmarkAccount
+        existed, new, deleted = BenchmarkAccount.pull_all(create_new=True, pipelined=True)
+        return len(new)
+
+
+class PullAllParallelInsertScenario(PullAllInsertScenario):
+    name = 'pull_all_parallel_insert'
+
+    def run(self):
+        import os
+        from .models import BenchmarkAccount
+        existed, new, deleted = BenchmarkAccount.pull_all(create_new=True, workers=os.cpu_count() or 1)
+        return len(new)
+
+
+class PullAllUpsertInsertScenario(PullAllInsertScenario):
+    name = 'pull_all_upsert_insert'
+
+    def run(self):
+        from .models import BenchmarkUniqueAccount
+        existed, new, deleted = BenchmarkUniqueAccount.pull_all(create_new=True)
+        return len(new)
+
+
+class PullAllUpsertUpdateScenario(PullAllInsertScenario):
+    name = 'pull_all_upsert_update'
+
+    def setup(self):
+        from .models import BenchmarkUniqueAccount
+        super(PullAllUpsertUpdateScenario, self).setup()
+        BenchmarkUniqueAccount.pull_all(create_new=True)
+
+    def run(self):
+        from .models import BenchmarkUniqueAccount
+        existed, new, deleted = BenchmarkUniqueAccount.pull_all()
+        return len(existed)
+
+
+class PullAllForeignKeyScenario(Scenario):
+    name = 'pull_all_fk'
+
+    def setup(self):
+        from .models import BenchmarkAccount
+        self.bench.reset()
+        generators.seed_store(self.bench.server.store, accounts=max(1, self.bench.records // 10),
+                              contacts=self.bench.records)
+        BenchmarkAccount.pull_all(create_new=True)
+
+    def run(self):
+        from .models import BenchmarkContact
+        existed, new, deleted = BenchmarkContact.pull_all(create_new=True)
+        return len(new)
+
+
+class PullAllParentsScenario(Scenario):
+    name = 'pull_all_parents'
+
+    def setup(self):
+        self.bench.reset()
+        generators.seed_store(self.bench.server.store, accounts=max(1, self.bench.records // 10),
+                              contacts=self.bench.records)
+
+    def run(self):
+        from .models import BenchmarkContactWithAccount
+        existed, new, deleted = BenchmarkContactWithAccount.pull_all(create_new=True)
+        return len(new)
+
+
+class PushCreateScenario(Scenario):
+    name = 'push_create'
+
+    def setup(self):
+        from .models import BenchmarkAccount
+        self.bench.reset()
+        for record in generators.account_records(self.bench.push_records):
+            obj = BenchmarkAccount()
+            obj.deserialize(record)
+            obj.save()
+        self.objects = list(BenchmarkAccount.objects.all())
+
+    def run(self):
+        for obj in self.objects:
+            obj.push()
+        return len(self.objects)
+
+
+class PushUpdateScenario(PushCreateScenario):
+    name = 'push_update'
+
+    def setup(self):
+        super(PushUpdateScenario, self).setup()
+        for obj in self.objects:
+            obj.push()
+
+
+class BulkScenario(Scenario):
+    operation = None
+
+    def setup(self):
+        self.bench.reset()
+        self.data = generators.account_records(self.bench.records)
+        if self.operation != 'bulk_create':
+            ids = generators.seed_store(self.bench.server.store, accounts=self.bench.records)[0]
+            for record, record_id in zip(self.data, ids):
+                record['Id'] = record_id
+            if self.operation == 'bulk_delete':
+                self.data = [{'Id': x} for x in ids]
+
+    def run(self):
+        from .models import BenchmarkAccount
+        client = BenchmarkAccount.get_salesforce_client()
+        result = getattr(client, self.operation)(self.data)
+        return len(result)
+
+
+class BulkCreateScenario(BulkScenario):
+    name = operation = 'bulk_create'
+
+
+class BulkUpdateScenario(BulkScenario):
+    name = operation = 'bulk_update'
+
+
+class BulkUpsertScenario(BulkScenario):
+    name = operation = 'bulk_upsert'
+
+
+class BulkDeleteScenario(BulkScenario):
+    name = operation = 'bulk_delete'
+
+
+class ChatterUploadScenario(Scenario):
+    name = 'chatter_upload'
+
+    def setup(self):
+        self.files = []
+        for i in range(self.bench.push_records):
+            file_obj = io.BytesIO(b'benchmark file %06d\n' % i * 512)
+            file_obj.name = 'file%06d.txt' % i
+            self.files.append(file_obj)
+
+    def run(self):
+        from ..chatter import chatter
+        for file_obj in self.files:
+            success, file_id, download_url = chatter.upload_to_files_home_by_file_object(file_obj.name, file_obj)
+            if not success:
+                raise RuntimeError('upload failed: %s' % download_url)
+        return len(self.files)
+
+
+SCENARIOS = (SerializeScenario, DeserializeScenario, PullAllInsertScenario, PullAllUpdateScenario,
+             PullAllPipelinedInsertScenario, PullAllParallelInsertScenario, PullAllUpsertInsertScenario, PullAllUpsertUpdateScenario, PullAllForeignKeyScenario,
+             PullAllParentsScenario, PushCreateScenario, PushUpdateScenario,
+             BulkCreateScenario, BulkUpdateScenario, BulkUpsertScenario, BulkDeleteScenario, ChatterUploadScenario)
+
+
+class Benchmark(object):
+    def __init__(self, records=2000, push_records=None, page_size=500, scenarios=None, latency=0.0):
+        self.records = records
+        self.push_records = push_records or max(1, records // 10)
+        self.page_size = page_size
+        self.latency = latency
+        self.scenarios = [x for x in SCENARIOS if not scenarios or x.name in scenarios]
+        self.server = FakeSalesforceServer(page_size=page_size, latency=latency).start()
+        configure(self.server)
+
+    def reset(self):
+        from .models import BenchmarkAccount, BenchmarkContact, BenchmarkUniqueAccount, BenchmarkUniqueContact
+        BenchmarkContact.objects.all().delete()
+        BenchmarkAccount.objects.all().delete()
+        BenchmarkUniqueContact.objects.all().delete()
+        BenchmarkUniqueAccount.objects.all().delete()
+        self.server.salesforce.reset()
+
+    def measure(self, scenario):
+        from django.db import connection
+        from .. import metrics
+
+        scenario.setup()
+        counter = QueryCounter()
+        api_calls = self.server.request_count
+        with connection.execute_wrapper(counter), metrics.collect(scenario.name) as stats:
+            started = time.perf_counter()
+            count = scenario.run()
+            seconds = time.perf_counter() - started
+        api_calls = self.server.request_count - api_calls
+
+        # separate run for memory, tracemalloc slows down the timed run
+        scenario.setup()
+        tracemalloc.start()
+        scenario.run()
+        peak_memory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        count = count or 1
+        return OrderedDict([
+            ('records', count),
+            ('seconds', seconds),
+            ('records_per_second', count / seconds if seconds else None),
+            ('db_queries', counter.count),
+            ('db_queries_per_record', float(counter.count) / count),
+            ('api_calls', api_calls),
+            ('api_calls_per_record', float(api_calls) / count),
+            ('client_calls', stats.calls),
+            ('peak_memory', peak_memory),
+        ])
+
+    def run(self, label=None):
+        results = OrderedDict()
+        for scenario_class in self.scenarios:
+            results[scenario_class.name] = self.measure(scenario_class(self))
+        self.server.stop()
+        return OrderedDict([
+            ('meta', OrderedDict([
+                ('label', label),
+                ('timestamp', time.strftime('%Y-%m-%dT%H:%M:%S')),
+                ('python', platform.python_version()),
+                ('django', django.get_version()),
+                ('records', self.records),
+                ('push_records', self.push_records),
+                ('page_size', self.page_size),
+                ('latency', self.latency),
+            ])),
+            ('scenarios', results),
+        ])
+
+
+def compare(result, baseline, threshold=0.1):
+    """return (report lines, regressed) comparing two benchmark results"""
+    lines, regressed = [], False
+    for name, current in result['scenarios'].items():
+        previous = baseline['scenarios'].get(name)
+        if not previous or not previous['records_per_second'] or not current['records_per_second']:
+            continue
+        change = current['records_per_second'] / previous['records_per_second'] - 1
+        flags = []
+        if change < -threshold:
+            flags.append('SLOWER')
+        for key in ('db_queries_per_record', 'api_calls_per_record'):
+            if current[key] > previous[key] * (1 + threshold):
+                flags.append('MORE %s' % key.upper())
+        regressed = regressed or bool(flags)
+        lines.append('%-20s %12.1f rec/s %+7.1f%%  db/rec %.2f -> %.2f  api/rec %.3f -> %.3f  %s' % (
+            name, current['records_per_second'], change * 100, previous['db_queries_per_record'],
+            current['db_queries_per_record'], previous['api_calls_per_record'],
+            current['api_calls_per_record'], ' '.join(flags)))
+    return lines, regressed
+
+
+def dump(result, path):
+    with open(path, 'w') as f:
+        json.dump(result, f, indent=2)
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f, object_pairs_hook=OrderedDict)
@@ -0,0 +1,482 @@
+"""local stand-in of the salesforce http api, enough for the code paths of this package"""
+import gzip
+import json
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from email.utils import parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from urllib.parse import urlparse, parse_qs, unquote
+
+import requests
+from simple_salesforce import Salesforce
+
+from ..offline import SObjectStore, SOQLError, is_modified_since
+
+log = logging.getLogger(__name__)
+
+SESSION_ID = '00DFAKE!benchmark-session'
+API_LIMIT = 15000
+DATA_PREFIX_RE = re.compile(r'^/services/data/v[\d.]+/(?P<path>.*?)/?$')
+ASYNC_PREFIX_RE = re.compile(r'^/services/async/[\d.]+/(?P<path>.*?)/?$')
+COMETD_PREFIX_RE = re.compile(r'^/cometd/[\d.]+/?$')
+
+SOAP_LOGIN_RESPONSE = '''<?xml version="1.0" encoding="UTF-8"?>
+<soapenv:Envelope xmlns:soapenv="http://schemas.xmlsoap.org/soap/envelope/" xmlns="urn:partner.soap.sforce.com">
+<soapenv:Body><loginResponse><result>
+<serverUrl>%(url)s/services/Soap/u/38.0/00DFAKE</serverUrl>
+<sessionId>%(session_id)s</sessionId>
+<userId>005FAKE</userId>
+</result></loginResponse></soapenv:Body></soapenv:Envelope>'''
+
+
+class LocalSession(requests.Session):
+    """simple_salesforce always talks https, send it to the local http server instead"""
+
+    def __init__(self, address):
+        super(LocalSession, self).__init__()
+        self.https_prefix = 'https://%s' % address
+        self.http_prefix = 'http://%s' % address
+
+    def request(self, method, url, *args, **kwargs):
+        if url.startswith(self.https_prefix):
+            url = self.http_prefix + url[len(self.https_prefix):]
+        return super(LocalSession, self).request(method, url, *args, **kwargs)
+
+
+def parse_multipart(body, content_type):
+    """return {name: (filename, content)} of a multipart/form-data body"""
+    boundary = content_type.split('boundary=', 1)[1].strip('"').encode()
+    parts = {}
+    for part in body.split(b'--' + boundary):
+        if not part.strip() or part.strip() == b'--':
+            continue
+        head, _, content = part.lstrip(b'\r\n').partition(b'\r\n\r\n')
+        disposition = re.search(rb'name="(?P<name>[^"]*)"(?:; filename="(?P<filename>[^"]*)")?', head)
+        if disposition:
+            filename = disposition.group('filename')
+            parts[disposition.group('name').decode()] = (
+                filename.decode() if filename is not None else None, content[:-2] if content.endswith(b'\r\n') else content)
+    return parts
+
+
+class FakeSalesforce(object):
+    """state and request handling of the stand-in, independent from the http server"""
+
+    def __init__(self, store=None, page_size=2000, api_limit=API_LIMIT, long_poll_timeout=1.0, latency=0.0):
+        self.store = store or SObjectStore(page_size=page_size)
+        self.store.listeners.append(self.publish_change)
+        self.long_poll_timeout = long_poll_timeout
+        self.events = []  # (replay id, channel, payload)
+        self.event_condition = threading.Condition()
+        self.cometd_clients = {}
+        self.api_limit = api_limit
+        self.latency = latency  # seconds added to every data api request, like a remote org
+        self.request_count = 0
+        self.compressed_requests = 0
+        self.jobs = OrderedDict()
+        self.files = OrderedDict()
+        self.lock = threading.Lock()
+        self.url = None
+        self.started_at = time.time()
+        self.schema_modified = {}  # table -> time of the last schema change, for If-Modified-Since
+
+    def reset(self):
+        with self.lock:
+            self.store.reset()
+            self.jobs.clear()
+            self.files.clear()
+        with self.event_condition:
+            del self.events[:]
+
+    def count_request(self):
+        with self.lock:
+            self.request_count += 1
+            return self.request_count
+
+    # rest api
+    def handle_data(self, method, path, query, body, headers):
+        parts = [unquote(x) for x in path.split('/')]
+
+        if parts[0] in ('query', 'queryAll'):
+            if len(parts) == 2:
+                return self.query_more(parts[1])
+            return self.query(query['q'][0], include_deleted=parts[0] == 'queryAll')
+        if parts == ['sobjects', ''] or parts == ['sobjects']:
+            return 200, {'encoding': 'UTF-8', 'maxBatchSize': 200, 'sobjects': [
+                self.describe(x, fields=False) for x in list(self.store.tables)]}
+        if parts[0] == 'sobjects':
+            return self.handle_sobject(method, parts[1:], body, headers)
+        if parts[:2] == ['composite', 'graph']:
+            return 200, self.store.graph(json.loads(body.decode('utf-8'))['graphs'])
+        if parts[:2] == ['composite', 'sobjects']:
+            return 200, self.store.collection(method, parts[2:], json.loads(body.decode('utf-8'))['records'])
+        if parts[0] == 'connect' and parts[1] == 'files':
+            return self.handle_files(method, parts[2:], body, headers)
+        return 404, [{'errorCode': 'NOT_FOUND', 'message': 'unknown resource %s' % path}]
+
+    def handle_sobject(self, method, parts, body, headers=None):
+        table = parts[0]
+        store = self.store
+        if len(parts) == 1:
+            if method == 'POST':
+                record_id = store.insert(table, json.loads(body.decode('utf-8')))
+                return 201, {'id': record_id, 'success': True, 'errors': []}
+            if not self.is_schema_modified(table, headers):
+                return 304, None
+            return 200, {'objectDescribe': self.describe(table, fields=False), 'recentItems': []}
+
+        if parts[1] == 'describe':
+            if not self.is_schema_modified(table, headers):
+                return 304, None
+            return 200, self.describe(table)
+
+        if len(parts) == 2:
+            record_id = parts[1]
+            if method == 'GET':
+                record = store.get(table, record_id)
+                if record is None:
+                    return 404, [{'errorCode': 'NOT_FOUND', 'message': 'The requested resource does not exist'}]
+                if not is_modified_since(record, headers):
+                    return 304, None
+                return 200, store.project(table, record, record.keys())
+            if method == 'PATCH':
+                if not store.update(table, record_id, json.loads(body.decode('utf-8'))):
+                    return 404, [{'errorCode': 'NOT_FOUND', 'message': 'The requested resource does not exist'}]
+                return 204, None
+            if method == 'DELETE':
+                if not store.delete(table, record_id):
+                    return 404, [{'errorCode': 'ENTITY_IS_DELETED', 'message': 'entity is deleted'}]
+                return 204, None
+
+        field, value = parts[1], parts[2]
+        if method == 'GET':
+            record = store.find(table, field, value)
+            if record is None:
+                return 404, [{'errorCode': 'NOT_FOUND', 'message': 'The requested resource does not exist'}]
+            if not is_modified_since(record, headers):
+                return 304, None
+            return 200, store.project(table, record, record.keys())
+        if method == 'PATCH':
+            record_id, created = store.upsert(table, field, value, json.loads(body.decode('utf-8')))
+            if created:
+                return 201, {'id': record_id, 'success': True, 'errors': []}
+            return 204, None
+        return 405, [{'errorCode': 'METHOD_NOT_ALLOWED', 'message': method}]
+
+    def touch_schema(self, table):
+        self.schema_modified[table] = time.time()
+
+    def is_schema_modified(self, table, headers):
+        since = headers.get('If-Modified-Since') if headers is not None else None
+        if not since:
+            return True
+        modified = self.schema_modified.get(table, self.started_at)
+        return int(modified) > parsedate_to_datetime(since).timestamp()
+
+    def describe(self, table, fields=True):
+        result = {'name': table, 'label': table, 'custom': table.endswith('__c'), 'queryable': True,
+                  'urls': {'sobject': '/services/data/v38.0/sobjects/%s' % table}}
+        if fields:
+            names = OrderedDict()
+            for record in list(self.store.tables[table].values())[:100]:
+                for name, value in record.items():
+                    names.setdefault(name, value)
+            result['fields'] = [self.describe_field(name, value) for name, value in names.items()]
+        return result
+
+    def describe_field(self, name, value):
+        if name == 'Id':
+            field_type = 'id'
+        elif isinstance(value, bool):
+            field_type = 'boolean'
+        elif isinstance(value, int):
+            field_type = 'int'
+        elif isinstance(value, float):
+            field_type = 'double'
+        elif isinstance(value, str) and len(value) == 28 and value[10:11] == 'T':
+            field_type = 'datetime'
+        elif isinstance(value, str) and len(value) == 10 and value[4:5] == '-':
+            field_type = 'date'
+        else:
+            field_type = 'string'
+        return {'name': name, 'label': name, 'type': field_type, 'soapType': 'xsd:%s' % field_type,
+                'length': 255 if field_type == 'string' else 0, 'precision': 18, 'scale': 2,
+                'defaultValue': None, 'picklistValues': [], 'referenceTo': []}
+
+    def query(self, soql, include_deleted=False):
+        try:
+            return 200, self.store.query_page(soql, include_deleted=include_deleted)
+        except SOQLError as ex:
+            return 400, [{'errorCode': 'MALFORMED_QUERY', 'message': str(ex)}]
+
+    def query_more(self, locator):
+        result = self.store.query_more(locator)
+        if result is None:
+            return 400, [{'errorCode': 'INVALID_QUERY_LOCATOR', 'message': 'invalid query locator'}]
+        return 200, result
+
+    # streaming api, change data capture
+    def publish_change(self, table, change_type, record_id, fields):
+        from ..streaming import get_change_event_channel
+
+        payload = OrderedDict([('ChangeEventHeader', {
+            'entityName': table, 'changeType': change_type, 'recordIds': [record_id],
+            'changedFields': [x for x in fields if x != 'Id'] if change_type == 'UPDATE' else [],
+            'commitTimestamp': int(time.time() * 1000)})])
+        payload.update((k, v) for k, v in fields.items() if k not in ('Id', 'attributes'))
+        with self.event_condition:
+            self.events.append((len(self.events) + 1, get_change_event_channel(table), payload))
+            self.event_condition.notify_all()
+
+    def handle_cometd(self, messages):
+        responses = []
+        for message in messages:
+            channel = message['channel']
+            response = {'channel': channel, 'id': message.get('id'), 'successful': True}
+            client = self.cometd_clients.get(message.get('clientId'))
+
+            if channel == '/meta/handshake':
+                client_id = 'fake-client-%s' % (len(self.cometd_clients) + 1)
+                self.cometd_clients[client_id] = {}
+                response.update({'clientId': client_id, 'version': '1.0',
+                                 'supportedConnectionTypes': ['long-polling'],
+                                 'advice': {'reconnect': 'retry', 'interval': 0, 'timeout': 110000}})
+            elif client is None:
+                response.update({'successful': False, 'error': '403::Unknown client',
+                                 'advice': {'reconnect': 'handshake'}})
+            elif channel == '/meta/subscribe':
+                replay_id = (message.get('ext') or {}).get('replay', {}).get(message['subscription'], -1)
+                with self.event_condition:
+                    client[message['subscription']] = len(self.events) if replay_id == -1 else max(0, replay_id)
+                response['subscription'] = message['subscription']
+            elif channel == '/meta/connect':
+                responses.extend(self.poll_events(client))
+            elif channel == '/meta/disconnect':
+                self.cometd_clients.pop(message['clientId'], None)
+            responses.append(response)
+        return 200, responses
+
+    def poll_events(self, client):
+        with self.event_condition:
+            deadline = time.time() + self.long_poll_timeout
+            while True:
+                events = [x for x in self.events if x[1] in client and x[0] > client[x[1]]]
+                if events or time.time() >= deadline:
+                    break
+                self.event_condition.wait(deadline - time.time())
+            for replay_id, channel, payload in events:
+                client[channel] = max(client[channel], replay_id)
+        return [{'channel': channel, 'data': {'schema': 'fake', 'payload': payload, 'event': {'replayId': replay_id}}}
+                for replay_id, channel, payload in events]
+
+    # chatter files
+    def handle_files(self, method, parts, body, headers):
+        if parts[:2] == ['users', 'me'] or (method == 'POST' and len(parts) == 1):
+            file_id = parts[0] if len(parts) == 1 else self.store.new_id('ContentDocument')
+            uploaded = parse_multipart(body, headers.get('Content-Type', ''))
+            title = json.loads(uploaded['json'][1].decode('utf-8')).get('title')
+            filename, content = uploaded['fileData']
+            version = self.files[file_id]['versionNumber'] + 1 if file_id in self.files else 1
+            self.files[file_id] = {'id': file_id, 'title': title, 'name': filename, 'content': content,
+                                   'versionNumber': version}
+            return 201, self.file_info(file_id)
+
+        file_id = parts[0]
+        if file_id not in self.files:
+            return 404, [{'errorCode': 'NOT_FOUND', 'message': 'The requested resource does not exist'}]
+        if len(parts) == 2 and parts[1] == 'content':
+            return 200, self.files[file_id]['content']
+        return 200, self.file_info(file_id)
+
+    def file_info(self, file_id):
+        info = self.files[file_id]
+        return {'id': file_id, 'title': info['title'], 'name': info['name'], 'contentSize': len(info['content']),
+                'versionNumber': str(info['versionNumber']),
+                'downloadUrl': '/services/data/v38.0/connect/files/%s/content?versionNumber=%s' % (
+                    file_id, info['versionNumber'])}
+
+    # bulk api
+    def handle_async(self, method, path, body):
+        parts = path.split('/')
+        if parts == ['job']:
+            job = json.loads(body.decode('utf-8'))
+            job_id = '750FAKE%08d' % (len(self.jobs) + 1)
+            job.update({'id': job_id, 'state': 'Open', 'batches': OrderedDict()})
+            self.jobs[job_id] = job
+            return 201, self.job_info(job)
+
+        job = self.jobs.get(parts[1])
+        if job is None:
+            return 400, {'exceptionCode': 'InvalidJob', 'exceptionMessage': 'unknown job %s' % parts[1]}
+        if len(parts) == 2:
+            if method == 'POST':
+                job.update(json.loads(body.decode('utf-8')))
+            return 200, self.job_info(job)
+        if len(parts) == 3:
+            batch_id = '751FAKE%08d' % (len(job['batches']) + 1)
+            data = body.decode('utf-8')
+            job['batches'][batch_id] = self.run_batch(job, json.loads(data) if data.lstrip()[:1] in '[{' else data)
+            return 201, {'id': batch_id, 'jobId': job['id'], 'state': 'Completed'}
+
+        results = job['batches'][parts[3]]
+        if len(parts) == 4:
+            return 200, {'id': parts[3], 'jobId': job['id'], 'state': 'Completed',
+                         'numberRecordsProcessed': len(results)}
+        if job['operation'] in ('query', 'queryAll'):
+            if len(parts) == 5:
+                return 200, ['752FAKE00000001']
+        return 200, results
+
+    def job_info(self, job):
+        return {'id': job['id'], 'operation': job['operation'], 'object': job['object'],
+                'state': job['state'], 'contentType': job.get('contentType', 'JSON')}
+
+    def run_batch(self, job, data):
+        return self.store.bulk(job['object'], job['operation'], data, job.get('externalIdFieldName', 'Id'))
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True  # headers and body are separate writes
+
+    def log_message(self, format, *args):
+        log.debug(format % args)
+
+    def read_body(self):
+        body = self.read_raw_body()
+        if self.headers.get('Content-Encoding', '').lower() == 'gzip':
+            self.server.salesforce.compressed_requests += 1
+            body = gzip.decompress(body)
+        return body
+
+    def read_raw_body(self):
+        if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            body = b''
+            while True:
+                size = int(self.rfile.readline().strip(), 16)
+                if not size:
+                    self.rfile.readline()
+                    return body
+                body += self.rfile.read(size)
+                self.rfile.readline()
+        return self.rfile.read(int(self.headers.get('Content-Length') or 0))
+
+    def respond(self, status, body, content_type='application/json'):
+        salesforce = self.server.salesforce
+        if body is None:
+            data = b''
+        elif isinstance(body, bytes):
+            data, content_type = body, 'application/octet-stream'
+        elif isinstance(body, str):
+            data = body.encode('utf-8')
+        else:
+            data = json.dumps(body).encode('utf-8')
+
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        if len(data) >= 1024 and 'gzip' in self.headers.get('Accept-Encoding', ''):
+            data = gzip.compress(data)
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(data)))
+        self.send_header('Sforce-Limit-Info', 'api-usage=%s/%s' % (salesforce.request_count, salesforce.api_limit))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def dispatch(self, method):
+        salesforce = self.server.salesforce
+        url = urlparse(self.path)
+        body = self.read_body()
+
+        if url.path.startswith('/services/oauth2/token'):
+            return self.respond(200, {
+                'access_token': SESSION_ID, 'instance_url': salesforce.url,
+                'id': '%s/id/00DFAKE/005FAKE' % salesforce.url, 'token_type': 'Bearer',
+                'issued_at': '9999999999999', 'signature': 'fake'})
+        if url.path.startswith('/services/Soap/u/'):
+            return self.respond(200, SOAP_LOGIN_RESPONSE % {'url': salesforce.url, 'session_id': SESSION_ID},
+                                content_type='text/xml')
+
+        if COMETD_PREFIX_RE.match(url.path):
+            status, result = salesforce.handle_cometd(json.loads(body.decode('utf-8')))
+            return self.respond(status, result)
+
+        salesforce.count_request()
+        if salesforce.latency:
+            time.sleep(salesforce.latency)
+        match = DATA_PREFIX_RE.match(url.path)
+        if match:
+            status, result = salesforce.handle_data(method, match.group('path'), parse_qs(url.query), body,
+                                                    self.headers)
+            return self.respond(status, result)
+        match = ASYNC_PREFIX_RE.match(url.path)
+        if match:
+            status, result = salesforce.handle_async(method, match.group('path'), body)
+            return self.respond(status, result)
+        return self.respond(404, [{'errorCode': 'NOT_FOUND', 'message': url.path}])
+
+    def do_GET(self):
+        self.dispatch('GET')
+
+    def do_POST(self):
+        self.dispatch('POST')
+
+    def do_PATCH(self):
+        self.dispatch('PATCH')
+
+    def do_DELETE(self):
+        self.dispatch('DELETE')
+
+
+class _HTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class FakeSalesforceServer(object):
+    """run the stand-in on a local port in a background thread
+
+        server = FakeSalesforceServer(page_size=500).start()
+        settings.SALESFORCE_CLIENT = server.client()
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, **kwargs):
+        self.salesforce = FakeSalesforce(**kwargs)
+        self.httpd = _HTTPServer((host, port), Handler)
+        self.httpd.salesforce = self.salesforce
+        self.salesforce.url = self.url
+        self.thread = None
+
+    @property
+    def address(self):
+        return '%s:%s' % self.httpd.server_address[:2]
+
+    @property
+    def url(self):
+        return 'http://%s' % self.address
+
+    @property
+    def store(self):
+        return self.salesforce.store
+
+    @property
+    def request_count(self):
+        return self.salesforce.request_count
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name='fake-salesforce')
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def client(self, version='38.0'):
+        """simple_salesforce client connected to this server"""
+        return Salesforce(instance=self.address, session_id=SESSION_ID, version=version,
+                          session=LocalSession(self.address))
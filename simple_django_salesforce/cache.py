@@ -0,0 +1,172 @@
+"""describe() and metadata() responses cached across processes, revalidated with If-Modified-Since
+
+    SALESFORCE_DESCRIBE_CACHE = {
+        'BACKEND': 'django',  # or 'file'
+        'LOCATION': 'default',  # django cache alias, or directory for 'file'
+        'TTL': 3600,  # seconds a response is used without asking salesforce
+    }
+
+entries never expire from the storage, after TTL they are revalidated, a 304 renews them without a body
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.http import http_date
+from simple_salesforce.exceptions import SalesforceError
+
+log = logging.getLogger(__name__)
+log.setLevel(logging.INFO)
+
+DEFAULT_CONFIG = {
+    'BACKEND': 'django',
+    'LOCATION': 'default',
+    'TTL': 3600,
+}
+KEY_PREFIX = 'simple_django_salesforce:describe'
+
+
+class DjangoCacheStorage(object):
+    """entries in a django cache, clear() moves to a new key generation"""
+
+    def __init__(self, alias='default'):
+        self.alias = alias
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def get_generation(self):
+        generation_key = '%s:generation' % KEY_PREFIX
+        generation = self.cache.get(generation_key)
+        if generation is None:
+            self.cache.add(generation_key, 1, None)
+            generation = self.cache.get(generation_key, 1)
+        return generation
+
+    def make_key(self, key):
+        return '%s:%s:%s' % (KEY_PREFIX, self.get_generation(), key)
+
+    def get(self, key):
+        return self.cache.get(self.make_key(key))
+
+    def set(self, key, entry):
+        self.cache.set(self.make_key(key), entry, None)
+
+    def delete(self, key):
+        self.cache.delete(self.make_key(key))
+
+    def clear(self):
+        try:
+            self.cache.incr('%s:generation' % KEY_PREFIX)
+        except ValueError:
+            self.cache.set('%s:generation' % KEY_PREFIX, 2, None)
+
+
+class FileStorage(object):
+    """one json file per entry in a directory, replaced atomically"""
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def get_path(self, key):
+        return os.path.join(self.directory, '%s.json' % hashlib.sha1(key.encode('utf-8')).hexdigest())
+
+    def get(self, key):
+        try:
+            with open(self.get_path(key)) as f:
+                return json.load(f)
+        except (IOError, OSError, ValueError):
+            return None
+
+    def set(self, key, entry):
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(entry, f)
+        os.replace(temp_path, self.get_path(key))
+
+    def delete(self, key):
+        try:
+            os.remove(self.get_path(key))
+        except OSError:
+            pass
+
+    def clear(self):
+        if not os.path.isdir(self.directory):
+            return
+        for name in os.listdir(self.directory):
+            if name.endswith('.json'):
+                os.remove(os.path.join(self.directory, name))
+
+
+class DescribeCache(object):
+    def __init__(self, storage, ttl=DEFAULT_CONFIG['TTL']):
+        self.storage = storage
+        self.ttl = ttl
+
+    def make_key(self, using, kind, table_name=None):
+        return '%s:%s:%s' % (using, kind, table_name or '')
+
+    def get(self, using, kind, table_name, fetch):
+        """cached response of `fetch(headers)`, a fresh one once TTL passed and salesforce has a change"""
+        if getattr(settings, 'SALESFORCE_OFFLINE', False):
+            return fetch(None)  # in-memory store changes with every write
+
+        key = self.make_key(using, kind, table_name)
+        entry = self.storage.get(key)
+        now = time.time()
+        if entry is not None and now - entry['fetched_at'] < self.ttl:
+            return entry['value']
+
+        headers = {'If-Modified-Since': http_date(entry['fetched_at'])} if entry is not None else None
+        try:
+            value = fetch(headers)
+        except SalesforceError as ex:
+            if entry is None or getattr(ex, 'status', None) != 304:
+                raise
+            log.debug('[DescribeCache] %s not modified' % key)
+            value = entry['value']
+        self.storage.set(key, {'fetched_at': now, 'value': value})
+        return value
+
+    def invalidate(self, table_name=None, using=None, kind=None):
+        """forget responses of a table, or everything without table_name"""
+        if table_name is None:
+            self.storage.clear()
+            return
+        from .connections import connections
+
+        for kind in [kind] if kind else ('describe', 'metadata'):
+            self.storage.delete(self.make_key(connections.get_alias(using), kind, table_name))
+
+
+_describe_cache = None
+_describe_cache_lock = threading.Lock()
+
+
+def get_describe_cache():
+    """shared cache configured by `settings.SALESFORCE_DESCRIBE_CACHE`"""
+    global _describe_cache
+    if _describe_cache is None:
+        with _describe_cache_lock:
+            if _describe_cache is None:
+                config = dict(DEFAULT_CONFIG, **getattr(settings, 'SALESFORCE_DESCRIBE_CACHE', {}))
+                if config['BACKEND'] == 'file':
+                    storage = FileStorage(config['LOCATION'])
+                else:
+                    storage = DjangoCacheStorage(config['LOCATION'])
+                _describe_cache = DescribeCache(storage, config['TTL'])
+    return _describe_cache
+
+
+def invalidate(table_name=None, using=None):
+    """forget cached describe and metadata of a table, or all of them"""
+    get_describe_cache().invalidate(table_name, using)
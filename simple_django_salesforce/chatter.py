@@ -1,34 +1,57 @@
-import requests
 import os
 import magic
 import json
 import logging
 import pytz
+import threading
+import time
 from datetime import datetime, timedelta
 from django.utils import timezone
 from django.conf import settings
+from django.utils.functional import SimpleLazyObject
 from simple_salesforce import SalesforceResourceNotFound
+from . import metrics, ratelimit, sessions
+from .connections import DEFAULT_CONNECTION, connections
 
 log = logging.getLogger(__name__)
 DEFAULT_API_VERSION = '38.0'
 token_expiry = 110 * 60  # salesforce's default api token expiry is 2hr
+TOKEN_FIELDS = ('access_token', 'instance_url', 'id_url', 'token_type', 'issued_at', 'signature')
 
 
 class Chatter(object):
-    def __init__(self):
-        self.client_id = settings.CHATTER_OAUTH_CLIENT_ID
-        self.client_secret = settings.CHATTER_OAUTH_CLIENT_SECRET
-        self.username = settings.SALESFORCE_API_USER
-        self.password = settings.SALESFORCE_API_PASSWORD
-        self.api_token = settings.SALESFORCE_API_TOKEN
+    def __init__(self, using=DEFAULT_CONNECTION):
+        self.connection = connections[using]
+        config = self.connection.config
+        self.client_id = config.get('CHATTER_OAUTH_CLIENT_ID')
+        self.client_secret = config.get('CHATTER_OAUTH_CLIENT_SECRET')
+        self.api_url = config.get('CHATTER_API_URL')
+        self.username = config.get('USERNAME')
+        self.password = config.get('PASSWORD') or ''
+        self.api_token = config.get('SECURITY_TOKEN') or ''
+        self.lock = threading.Lock()  # one token refresh for all threads sharing the org
+        if getattr(settings, 'SALESFORCE_OFFLINE', False):
+            # nothing to login offline, chatter api is not available
+            self.access_token = self.instance_url = self.id_url = self.token_type = self.issued_at = self.signature = None
+            return
         self.access_token, self.instance_url, self.id_url, self.token_type, self.issued_at, self.signature = self.login()
 
     def login(self):
+        """oauth token of the org, shared through settings.SALESFORCE_SESSION_CACHE when set"""
+        cache = sessions.get_session_cache()
+        identity = self.connection.get_session_identity('chatter')
+        if cache is None or identity is None:
+            return self.call_login()
+        session = cache.get(self.connection.alias, 'chatter', identity,
+                            lambda: dict(zip(TOKEN_FIELDS, self.call_login())))
+        return tuple(session[x] for x in TOKEN_FIELDS)
+
+    def call_login(self):
         # https://developer.salesforce.com/docs/atlas.en-us.chatterapi.meta/chatterapi/quickstart_connecting.htm
         # https://developer.salesforce.com/page/Digging_Deeper_into_OAuth_2.0_on_Force.com#Obtaining_a_Token_in_an_Autonomous_Client_.28Username_and_Password_Flow.29
         # curl example:
         # curl -v https://login.salesforce.com/services/oauth2/token -d "grant_type=password" -d "client_id=3MVG9d8..z.hDcPJxg3SNKy1bvkwt28Kkqa2wuBTYu_iTEmn3PgGq17zW7S3wyRUhan9cbLcFRTKrcv80XrtY" -d "client_secret=5592036841034327676" -d "username=dylan.mctaggart@butterfly.com.au" -d "password=Butterfly16fyQH3ZFE6dDO8HVbAbC8XXFM"
-        loginUrl = settings.CHATTER_API_URL + "/services/oauth2/token"
+        loginUrl = self.api_url + "/services/oauth2/token"
         header = {"Content-Type": "application/x-www-form-urlencoded"}
 
         data = {
@@ -39,7 +62,7 @@ class Chatter(object):
             'password': self.password + self.api_token,
         }
         try:
-            r = requests.post(loginUrl, headers=header, data=data)
+            r = self._request('POST', loginUrl, 'login', headers=header, data=data)
             body = r.json()
         except Exception as ex:
             msg = "[Chatter] couldn't get login token  >> %s" % ex
@@ -66,12 +89,63 @@ class Chatter(object):
         local_dt = local_tz.normalize(utc_dt.astimezone(local_tz))
         token_expired_dt = local_dt + timedelta(hours=2)
         if timezone.now() >= token_expired_dt:
-            self._refresh_client()
+            issued_at = self.issued_at
+            with self.lock:
+                if self.issued_at == issued_at:
+                    self._refresh_client()
 
     def _refresh_client(self):
+        cache = sessions.get_session_cache()
+        identity = self.connection.get_session_identity('chatter')
+        if cache is not None and identity is not None:
+            cache.invalidate(self.connection.alias, 'chatter', identity, self.access_token, 'access_token')
         self.access_token, self.instance_url, self.id_url, self.token_type, self.issued_at, self.signature = self.login()
         return
 
+    def _request(self, method, url, operation, **kwargs):
+        """send a http request to salesforce, rate limited and reported to metrics"""
+        limiter = self.connection.rate_limiter
+        retries = 0
+        started = time.time()
+        metrics.reset_transfer()
+        while True:
+            limiter.acquire()
+            try:
+                r = self.connection.session.request(method, url, **kwargs)
+            except Exception as ex:
+                self._record(operation, started, retries, kwargs, error=ex)
+                raise
+
+            # a POST uploads a file, sent again after a 503 it may be uploaded twice
+            if ratelimit.is_throttled(status=r.status_code, content=r.text, idempotent=method != 'POST') and \
+                    limiter.should_retry(retries + 1):
+                retries += 1
+                limiter.backoff(retries)
+                continue
+            break
+
+        self._record(operation, started, retries, kwargs, response=r)
+        limiter.adapt(metrics.parse_limit_info(r.headers.get(metrics.LIMIT_INFO_HEADER)))
+        return r
+
+    def _record(self, operation, started, retries, kwargs, response=None, error=None):
+        success = error is None and response.status_code < 300
+        metric = metrics.CallMetric(
+            operation,
+            table='Chatter',
+            latency=time.time() - started,
+            payload_size=metrics.get_payload_size(kwargs.get('data')) + metrics.get_payload_size(
+                kwargs.get('files')),
+            retries=retries,
+            api_usage=metrics.parse_limit_info(
+                response.headers.get(metrics.LIMIT_INFO_HEADER)) if response is not None else None,
+            success=success,
+            error=error,
+            transfer=metrics.get_transfer(),
+            using=self.connection.alias,
+            status_code=response.status_code if response is not None else None)
+        metrics.record(metric, sender=type(self))
+
     def _get_file_url(self, salesforce_id):
         return '%s/services/data/v%s/connect/files/%s' % (self.instance_url, DEFAULT_API_VERSION, salesforce_id)
 
@@ -79,7 +153,7 @@ class Chatter(object):
         self._check_token()
         # get access token protected url from salesforce, return the content
         header = {'Authorization': '%s %s' % (self.token_type, self.access_token)}
-        r = requests.get(url, headers=header)
+        r = self._request('GET', url, 'get_token_url_content', headers=header)
         return r
 
     def download_token_url(self, url, path):
@@ -94,7 +168,8 @@ class Chatter(object):
 
         # on file on saleforce have different version, this get newest version download link
         header = {'Authorization': '%s %s' % (self.token_type, self.access_token)}
-        r = requests.get(self._get_file_url(salesforce_id), headers=header)
+        r = self._request('GET', self._get_file_url(salesforce_id), 'get_download_url_by_document_id',
+                          headers=header)
         body = r.json()
         if (r.status_code > 299):
             return False, body[0]['errorCode'], body[0]['message']
@@ -118,7 +193,7 @@ class Chatter(object):
         if salesforce_id:
             # check exist on salesforce
             try:
-                settings.SALESFORCE_CLIENT.ContentDocument.get(salesforce_id)
+                self.connection.client.ContentDocument.get(salesforce_id)
                 # existed file, update a new version
                 url = self._get_file_url(salesforce_id)
             except SalesforceResourceNotFound:
@@ -138,7 +213,7 @@ class Chatter(object):
                  'fileData': (
                  filename, file_buffer, mime_type)}  # binary part need 3 fields: filename, binary bytes, file type
 
-        r = requests.post(url, headers=header, files=files)
+        r = self._request('POST', url, 'upload_file', headers=header, files=files)
         # response example
         # {'renditionUrl240By180': '/services/data/v38.0/connect/files/0697F000000TXGJQA4/rendition?type=THUMB240BY180', 'thumb120By90RenditionStatus': 'NotScheduled', 'motif': {'mediumIconUrl': '/img/content/content32.png', 'smallIconUrl': '/img/icon/files16.png', 'color': 'BAAC93', 'svgIconUrl': None, 'largeIconUrl': '/img/content/content64.png'}, 'type': 'File', 'renditionUrl': '/services/data/v38.0/connect/files/0697F000000TXGJQA4/rendition?type=THUMB120BY90', 'moderationFlags': None, 'name': 'test.txt', 'isMajorVersion': True, 'contentModifiedDate': '2017-09-13T07:04:22.000Z', 'externalFilePermissionInformation': None, 'mimeType': 'text/plain', 'pdfRenditionStatus': 'NotScheduled', 'contentUrl': None, 'topics': {'topics': [], 'currentPageUrl': None, 'nextPageUrl': None}, 'origin': 'Chatter', 'fileType': 'Text', 'id': '0697F000000TXGJQA4', 'title': 'test.txt', 'description': None, 'fileAsset': None, 'checksum': 'e1758ae79b29d99b7e5c0da6048202a9', 'mySubscription': None, 'sharingOption': 'Allowed', 'thumb720By480RenditionStatus': 'NotScheduled', 'modifiedDate': '2017-09-13T07:04:22.000Z', 'textPreview': None, 'publishStatus': 'PrivateAccess', 'sharingRole': 'Owner', 'contentSize': 31, 'isInMyFileSync': False, 'thumb240By180RenditionStatus': 'NotScheduled', 'parentFolder': None, 'owner': {'displayName': 'Dylan McTaggart', 'mySubscription': None, 'isActive': True, 'isInThisCommunity': True, 'lastName': 'McTaggart', 'type': 'User', 'companyName': None, 'firstName': 'Dylan', 'additionalLabel': None, 'id': '0057F000000J99QQAS', 'name': 'Dylan McTaggart', 'title': None, 'motif': {'mediumIconUrl': '/img/icon/profile32.png', 'smallIconUrl': '/img/icon/profile16.png', 'color': '65CAE4', 'svgIconUrl': None, 'largeIconUrl': '/img/icon/profile64.png'}, 'url': '/services/data/v38.0/chatter/users/0057F000000J99QQAS', 'userType': 'Internal', 'communityNickname': 'dylan', 'reputation': None, 'photo': {'standardEmailPhotoUrl': 'https://ap5.salesforce.com/img/userprofile/default_profile_45_v2.png?fromEmail=1', 'photoVersionId': None, 'largePhotoUrl': 'https://c.ap5.content.force.com/profilephoto/005/F', 'mediumPhotoUrl': 'https://c.ap5.content.force.com/profilephoto/005/M', 'url': '/services/data/v38.0/connect/user-profiles/0057F000000J99QQAS/photo', 'fullEmailPhotoUrl': 'https://ap5.salesforce.com/img/userprofile/default_profile_200_v2.png?fromEmail=1', 'smallPhotoUrl': 'https://c.ap5.content.force.com/profilephoto/005/T'}}, 'flashRenditionStatus': 'NotScheduled', 'versionNumber': '1', 'renditionUrl720By480': '/services/data/v38.0/connect/files/0697F000000TXGJQA4/rendition?type=THUMB720BY480', 'downloadUrl': '/services/data/v38.0/connect/files/0697F000000TXGJQA4/content?versionNumber=1', 'pageCount': 0, 'url': '/services/data/v38.0/connect/files/0697F000000TXGJQA4?versionNumber=1', 'externalDocumentUrl': None, 'fileExtension': 'txt', 'repositoryFileId': None, 'contentHubRepository': None, 'repositoryFileUrl': None}
 
@@ -149,4 +224,5 @@ class Chatter(object):
             return True, body['id'], self.instance_url + body['downloadUrl']
 
 
-chatter = Chatter()
+# chatter of the default connection, logs in on first use instead of at import
+chatter = SimpleLazyObject(lambda: connections[DEFAULT_CONNECTION].chatter)
@@ -1,120 +1,204 @@
 from __future__ import unicode_literals
 import functools
 import logging
-import six
+import re
+import time
+import warnings
+from importlib import metadata
 
 from requests import ConnectionError
-from unittest.mock import MagicMock
 from django.conf import settings
 from django.core.exceptions import ImproperlyConfigured
-from simple_salesforce import Salesforce
 from simple_salesforce.exceptions import (SalesforceResourceNotFound,
                                           SalesforceError,
                                           SalesforceExpiredSession,
                                           SalesforceMalformedRequest)
+from . import decoder, metrics, ratelimit, read_cache, tracing
+from .cache import get_describe_cache
+from .read_cache import get_read_cache
+from .connections import connections
 
 log = logging.getLogger(__name__)
 log.setLevel(logging.INFO)
 
+# a 503 may come after salesforce created the records, these are only retried when the call was rejected
+NOT_IDEMPOTENT = frozenset(['create', 'create_with_custom_key', 'bulk_create', 'collection_create',
+                            'composite_graph'])
+CALL_SALESFORCE_MIN_VERSION = (0, 75, 3)  # _call_salesforce() passing stream= to requests, as setup.py
+
 
 class reconnect_decorator(object):
     RETRY_COUNT_MAX = 3
 
     def __init__(self, func):
-        self.retry_count = 1
         self.func = func
 
     def __get__(self, obj, objtype):
         """Support instance methods."""
         return functools.partial(self.__call__, obj)
 
-    def wrapper(self, base_client, *args, **kwargs):
-        try:
-            return_func = self.func(base_client, *args, **kwargs)
-            self.retry_count = 1
-            return return_func
-        except (SalesforceExpiredSession, ConnectionError, SalesforceMalformedRequest) as ex:
-            # reconnect only catch SalesforceMalformedRequest with `InvalidSessionId` err code
-            # SalesforceMalformedRequest('https://ap5.salesforce.com/services/async/38.0/job', 400, '', {'exceptionCode': 'InvalidSessionId', 'exceptionMessage': 'Invalid session id'})
-            if isinstance(ex, SalesforceMalformedRequest):
-                if isinstance(ex.content, dict) and ex.content.get('exceptionCode', None) == 'InvalidSessionId':
-                    pass
-                else:
-                    raise ex
-
-            if self.retry_count == self.RETRY_COUNT_MAX:
+    def wrapper(self, base_client, retries, *args, **kwargs):
+        connection = connections[getattr(base_client, 'using', None)]
+        limiter = connection.rate_limiter
+        while True:
+            limiter.acquire()
+            expired = connection.get_client()
+            try:
+                return_func = self.func(base_client, *args, **kwargs)
+                limiter.adapt(metrics.get_limit_info())
+                return return_func
+            except (SalesforceError, ConnectionError) as ex:
+                if ratelimit.is_throttled(ex, idempotent=self.func.__name__ not in NOT_IDEMPOTENT):
+                    # REQUEST_LIMIT_EXCEEDED or concurrent request caps, back off and retry
+                    retries['throttle'] += 1
+                    if not limiter.should_retry(retries['throttle']):
+                        raise
+                    limiter.backoff(retries['throttle'])
+                    continue
+
+                # reconnect only catch SalesforceMalformedRequest with `InvalidSessionId` err code
+                # SalesforceMalformedRequest('https://ap5.salesforce.com/services/async/38.0/job', 400, '', {'exceptionCode': 'InvalidSessionId', 'exceptionMessage': 'Invalid session id'})
+                if isinstance(ex, SalesforceMalformedRequest):
+                    if not (isinstance(ex.content, dict) and ex.content.get('exceptionCode', None) == 'InvalidSessionId'):
+                        raise
+                elif not isinstance(ex, (SalesforceExpiredSession, ConnectionError)):
+                    raise
+
+            if retries['reconnect'] + 1 == self.RETRY_COUNT_MAX:
                 raise Exception('Salesforce connection ended after too many reconnection retries.')
 
-            self.retry_count += 1
-            settings.SALESFORCE_CLIENT = Salesforce(
-                username=settings.SALESFORCE_API_USER,
-                password=settings.SALESFORCE_API_PASSWORD,
-                security_token=settings.SALESFORCE_API_TOKEN,
-                sandbox=settings.SALESFORCE_SANDBOX
-            )
-
-        return self.wrapper(base_client, *args, **kwargs)
+            retries['reconnect'] += 1
+            connection.reconnect(expired=expired)
 
     def __call__(self, base_client, *args, **kwargs):
-        self.retry_count = 1
-        return self.wrapper(base_client, *args, **kwargs)
+        # retry counters are per call, the decorator instance is shared by all threads
+        retries = {'reconnect': 0, 'throttle': 0}
+        metrics.reset_limit_info()
+        started = time.time()
+        try:
+            result = self.wrapper(base_client, retries, *args, **kwargs)
+        except Exception as ex:
+            self.record(base_client, started, retries, args, kwargs, error=ex)
+            raise
+        self.record(base_client, started, retries, args, kwargs)
+        if tracing.is_tracing():
+            self.trace(base_client, started, result)
+        return result
+
+    def trace(self, base_client, started, result):
+        """`fetch` until the response arrived, `decode` for parsing it, the body is read in `fetch` by the
+        TransferAdapter of connection sessions, else in `decode`"""
+        finished = time.time()
+        response_at = metrics.get_response_at() or finished
+        attributes = {'table': getattr(base_client, 'table_name', None), 'operation': self.func.__name__}
+        tracing.add_span('fetch', started, response_at, **attributes)
+        if response_at < finished:
+            count = len(result.get('records', ())) if isinstance(result, dict) else None
+            tracing.add_span('decode', response_at, finished, count=count, **attributes)
+
+    def record(self, base_client, started, retries, args, kwargs, error=None):
+        metric = metrics.CallMetric(
+            self.func.__name__,
+            table=getattr(base_client, 'table_name', None),
+            using=getattr(base_client, 'using', None),
+            latency=time.time() - started,
+            payload_size=metrics.get_payload_size(args) + metrics.get_payload_size(kwargs),
+            retries=retries['reconnect'] + retries['throttle'],
+            api_usage=metrics.get_limit_info(),
+            success=error is None,
+            error=error,
+            transfer=metrics.get_transfer())
+        metrics.record(metric, sender=type(base_client))
+
+
+def invalidate_decorator(func):
+    """forget cached reads of the table after a write, also when it failed half way"""
+
+    @functools.wraps(func)
+    def wrapper(base_client, *args, **kwargs):
+        try:
+            return func(base_client, *args, **kwargs)
+        finally:
+            cache = get_read_cache()
+            if cache is not None:
+                cache.invalidate(base_client.using, base_client.table_name)
+
+    return wrapper
 
 
 def offline_decorator(*args, **kwargs):
-    default_offline_return = None
+    """deprecated, offline calls run against the in-memory salesforce of `offline.py` without it,
+    with an argument the decorated function still just returns it when offline"""
+    warnings.warn('offline_decorator is deprecated, SALESFORCE_OFFLINE clients need no decorator',
+                  DeprecationWarning, stacklevel=2)
+    if len(args) == 1 and callable(args[0]):
+        return args[0]
+
+    return_value = args[0] if len(args) else None
 
-    # the only argument is mock return, return None with no arguments
     def real_decorator(function):
-        @six.wraps(function)
+        @functools.wraps(function)
         def wrapper(*args, **kwargs):
+            if settings.SALESFORCE_OFFLINE:
+                return return_value
             return function(*args, **kwargs)
 
         return wrapper
 
-    if len(args) == 1 and callable(args[0]):
-        if not settings.SALESFORCE_OFFLINE:
-            return real_decorator(args[0])
-        else:
-            return MagicMock(return_value=default_offline_return)
-    else:
-        if not settings.SALESFORCE_OFFLINE:
-            return real_decorator
-        else:
+    return real_decorator
+
+
+def offline_decorator2(*args, **kwargs):
+    """deprecated, use offline_decorator"""
+    warnings.warn('offline_decorator2 is deprecated, use offline_decorator', DeprecationWarning, stacklevel=2)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', DeprecationWarning)
+        return offline_decorator(*args, **kwargs)
+
 
-            return_value = args[0] if len(args) else default_offline_return
-            return MagicMock(return_value=MagicMock(return_value=return_value))
+@functools.lru_cache(maxsize=None)
+def get_simple_salesforce_version():
+    """installed simple_salesforce version as a tuple, None when unknown"""
+    try:
+        return tuple(int(x) for x in re.findall(r'\d+', metadata.version('simple_salesforce'))[:3])
+    except metadata.PackageNotFoundError:
+        return None
 
 
-class offline_decorator2(object):
-    def __init__(self, arg1):
-        """
-        If there are decorator arguments, the function
-        to be decorated is not passed to the constructor!
-        """
-        print("Inside __init__()")
-        self.arg1 = arg1
+def call_salesforce(salesforce_client, method, url, name='', **kwargs):
+    """requests response of `Salesforce._call_salesforce()`, the one private simple_salesforce api used,
+    so a simple_salesforce changing it fails here with a clear error"""
+    version = get_simple_salesforce_version()
+    call = getattr(salesforce_client, '_call_salesforce', None)
+    if call is None or (version is not None and version < CALL_SALESFORCE_MIN_VERSION):
+        raise ImproperlyConfigured(
+            'streamed queries need Salesforce._call_salesforce() of simple_salesforce>=%s, found %s' % (
+                '.'.join(map(str, CALL_SALESFORCE_MIN_VERSION)),
+                '.'.join(map(str, version)) if version else 'an unknown version'))
+    return call(method, url, name=name, **kwargs)
 
-    def __call__(self, f):
-        """
-        If there are decorator arguments, __call__() is only called
-        once, as part of the decoration process! You can only give
-        it a single argument, which is the function object.
-        """
-        print("Inside __call__()")
 
-        def wrapped_f(*args):
-            print("Inside wrapped_f()")
-            print("Decorator arguments:", self.arg1, self.arg2, self.arg3)
-            f(*args)
-            print("After f(*args)")
+def is_not_modified(ex):
+    """a 304 answer to a request with `If-Modified-Since`"""
+    return isinstance(ex, SalesforceError) and getattr(ex, 'status', None) == 304
 
-        return wrapped_f
+
+def reconnect(using=None):
+    """login again and replace the client of connection `using`"""
+    return connections[using].reconnect()
+
+
+def get_salesforce_connection(using=None):
+    """simple_salesforce client of connection `using`, or the in-memory one when SALESFORCE_OFFLINE"""
+    return connections[using].client
 
 
 # todo handle salesforce unavailable
 class SalesforceClient(object):
     DEFAULT_SALESFORCE_KEY_NAME = 'Id'  # salesforce use `Id` as default id
     DEFAULT_KEY_FIELD_NAME_IN_DJANGO = 'salesforce_id'
+    COLLECTION_SIZE = 200  # max records of a sObject collections call
+    GRAPH_SIZE = 500  # max nodes of a composite graph
 
     # salesforce_client = None
     # model_client = None
@@ -126,13 +210,14 @@ class SalesforceClient(object):
         self.table_name = kwargs.pop('salesforce_table_name', None)
         self.key_field_name = kwargs.pop('salesforce_key_name',
                                          self.DEFAULT_SALESFORCE_KEY_NAME)
+        self.using = connections.get_alias(kwargs.pop('using', None))
 
         if not self.table_name:
             raise ImproperlyConfigured('Salesforce client not configured properly, need table_name.')
 
     @property
     def salesforce_client(self):
-        return settings.SALESFORCE_CLIENT
+        return get_salesforce_connection(self.using)
 
     @property
     def model_client(self):
@@ -160,27 +245,44 @@ class SalesforceClient(object):
 
         return result
 
-    @offline_decorator
+    def get_by_custom_id(self, field_name, id, headers=None, use_cache=True):
+        """record by external id, from the read cache when configured, conditional reads such as
+        `If-Modified-Since` always go to salesforce"""
+        cache = get_read_cache() if use_cache and not read_cache.is_conditional(headers) else None
+        if cache is None:
+            return self.call_get_by_custom_id(field_name, id, headers)
+        return cache.get(self.using, self.table_name, 'get_by_custom_id',
+                         (field_name, id) + read_cache.get_header_parts(headers),
+                         lambda: self.call_get_by_custom_id(field_name, id, headers))
+
     @reconnect_decorator
-    def get_by_custom_id(self, field_name, id):
+    def call_get_by_custom_id(self, field_name, id, headers=None):
         try:
-            object = self.model_client.get_by_custom_id(field_name, id)
+            object = self.model_client.get_by_custom_id(field_name, id, headers=headers)
             return object
         except SalesforceResourceNotFound as ex:
             log.error('[SF.%s.get_by_custom_id] %s' % (self.table_name, ex))
             raise ex
 
-    @offline_decorator
+    def get(self, id, headers=None, use_cache=True):
+        """record by id, from the read cache when configured, conditional reads such as
+        `If-Modified-Since` always go to salesforce"""
+        cache = get_read_cache() if use_cache and not read_cache.is_conditional(headers) else None
+        if cache is None:
+            return self.call_get(id, headers)
+        return cache.get(self.using, self.table_name, 'get', (id,) + read_cache.get_header_parts(headers),
+                         lambda: self.call_get(id, headers))
+
     @reconnect_decorator
-    def get(self, id):
+    def call_get(self, id, headers=None):
         try:
-            object = self.model_client.get(id)
+            object = self.model_client.get(id, headers=headers)
             return object
         except SalesforceResourceNotFound as ex:
             log.error('[SF.%s.get] %s' % (self.table_name, ex))
             raise ex
 
-    @offline_decorator
+    @invalidate_decorator
     @reconnect_decorator
     def create(self, fields):
         if not fields:
@@ -197,7 +299,7 @@ class SalesforceClient(object):
             log.error('[SF.%s.create] data=%s' % (self.table_name, fields))
             raise ex
 
-    @offline_decorator
+    @invalidate_decorator
     @reconnect_decorator
     def create_with_custom_key(self, fields, key=None):
         if not fields:
@@ -216,7 +318,7 @@ class SalesforceClient(object):
             log.error('[SF.%s.create] data=%s' % (self.table_name, fields))
             raise ex
 
-    @offline_decorator
+    @invalidate_decorator
     @reconnect_decorator
     def update(self, id, fields):
         if not fields or not id:
@@ -235,7 +337,7 @@ class SalesforceClient(object):
             log.error('[SF.%s.update] id=%s, data=%s' % (self.table_name, id, fields))
             raise ex
 
-    @offline_decorator
+    @invalidate_decorator
     @reconnect_decorator
     def upsert(self, id, fields):
         if not fields or not id:
@@ -253,7 +355,7 @@ class SalesforceClient(object):
             log.error('[SF.%s.upsert] id=%s, data=%s' % (self.table_name, id, fields))
             raise ex
 
-    @offline_decorator
+    @invalidate_decorator
     @reconnect_decorator
     def delete(self, id):
         if not id:
@@ -267,7 +369,7 @@ class SalesforceClient(object):
             log.error('[SF.%s.delete] id=%s' % (self.table_name, id))
             raise ex
 
-    @offline_decorator
+    @invalidate_decorator
     @reconnect_decorator
     def bulk_create(self, data):
         if not data:
@@ -281,7 +383,7 @@ class SalesforceClient(object):
             log.error('[SF.%s.bulk_create] data=%s' % (self.table_name, data))
             raise ex
 
-    @offline_decorator
+    @invalidate_decorator
     @reconnect_decorator
     def bulk_update(self, data):
         if not data:
@@ -295,7 +397,7 @@ class SalesforceClient(object):
             log.error('[SF.%s.bulk_update] data=%s' % (self.table_name, data))
             raise ex
 
-    @offline_decorator
+    @invalidate_decorator
     @reconnect_decorator
     def bulk_upsert(self, data, key_field_name=DEFAULT_SALESFORCE_KEY_NAME):
         if not data:
@@ -309,7 +411,7 @@ class SalesforceClient(object):
             log.error('[SF.%s.bulk_upsert] data=%s' % (self.table_name, data))
             raise ex
 
-    @offline_decorator
+    @invalidate_decorator
     @reconnect_decorator
     def bulk_delete(self, ids):
         if not ids:
@@ -323,7 +425,7 @@ class SalesforceClient(object):
             log.error('[SF.%s.bulk_delete] data=%s' % (self.table_name, ids))
             raise ex
 
-    @offline_decorator
+    @invalidate_decorator
     @reconnect_decorator
     def bulk_hard_delete(self, ids):
         if not ids:
@@ -337,43 +439,159 @@ class SalesforceClient(object):
             log.error('[SF.%s.bulk_hard_delete] data=%s' % (self.table_name, ids))
             raise ex
 
-    @offline_decorator
+    @invalidate_decorator
     @reconnect_decorator
     def bulk_delete_queryset(self, queryset):
         if queryset:
             delete_ids = self.get_salesforce_ids(queryset)
             self.bulk_delete(delete_ids)
 
-    @offline_decorator
+    @invalidate_decorator
     @reconnect_decorator
     def bulk_hard_deletequeryset(self, queryset):
         if queryset:
             delete_ids = self.get_salesforce_ids(queryset)
             self.bulk_hard_delete(delete_ids)
 
+    def get_collection_records(self, data):
+        return [dict(x, attributes={'type': self.table_name}) for x in data]
+
+    @invalidate_decorator
+    @reconnect_decorator
+    def collection_create(self, data):
+        """create up to COLLECTION_SIZE records in one sObject collections call"""
+        if not data:
+            return None
+
+        try:
+            return self.salesforce_client.restful('composite/sobjects', method='POST', json={
+                'allOrNone': False, 'records': self.get_collection_records(data)})
+        except SalesforceError as ex:
+            log.error('[SF.%s.collection_create] %s' % (self.table_name, ex))
+            log.error('[SF.%s.collection_create] data=%s' % (self.table_name, data))
+            raise ex
+
+    @invalidate_decorator
+    @reconnect_decorator
+    def collection_update(self, data):
+        """update up to COLLECTION_SIZE records with `Id` in one sObject collections call"""
+        if not data:
+            return None
+
+        try:
+            return self.salesforce_client.restful('composite/sobjects', method='PATCH', json={
+                'allOrNone': False, 'records': self.get_collection_records(data)})
+        except SalesforceError as ex:
+            log.error('[SF.%s.collection_update] %s' % (self.table_name, ex))
+            log.error('[SF.%s.collection_update] data=%s' % (self.table_name, data))
+            raise ex
+
+    @invalidate_decorator
+    @reconnect_decorator
+    def collection_upsert(self, data, key_field_name):
+        """upsert up to COLLECTION_SIZE records by external id field, needs api v46.0+"""
+        if not data:
+            return None
+
+        try:
+            path = 'composite/sobjects/%s/%s' % (self.table_name, key_field_name)
+            return self.salesforce_client.restful(path, method='PATCH', json={
+                'allOrNone': False, 'records': self.get_collection_records(data)})
+        except SalesforceError as ex:
+            log.error('[SF.%s.collection_upsert] %s' % (self.table_name, ex))
+            log.error('[SF.%s.collection_upsert] data=%s' % (self.table_name, data))
+            raise ex
+
+    def get_sobject_url(self, table_name, *parts):
+        """url of a composite subrequest"""
+        version = getattr(self.salesforce_client, 'sf_version', None) or '50.0'
+        return '/services/data/v%s/sobjects/%s' % (version, '/'.join((table_name,) + parts))
+
+    @reconnect_decorator
+    def composite_graph(self, graphs):
+        """run composite graphs of up to GRAPH_SIZE nodes each, a graph is saved all or nothing,
+        needs api v50.0+"""
+        try:
+            return self.salesforce_client.restful('composite/graph', method='POST', json={'graphs': graphs})['graphs']
+        except SalesforceError as ex:
+            log.error('[SF.%s.composite_graph] %s' % (self.table_name, ex))
+            raise ex
+
     # simply wrap other general method of simple-salesforce
-    @offline_decorator
+    def query(self, sql, use_cache=True):
+        """first page of `sql`, from the read cache when configured"""
+        cache = get_read_cache() if use_cache else None
+        if cache is None:
+            return self.call_query(sql)
+        return cache.get_query(self.using, sql, lambda: self.call_query(sql))
+
     @reconnect_decorator
-    def query(self, sql):
+    def call_query(self, sql):
         log.debug('[SF.query] %s' % sql)
         return self.salesforce_client.query(sql)
 
-    @offline_decorator
     @reconnect_decorator
     def query_more(self, sql):
         log.debug('[SF.query_more] %s' % sql)
         return self.salesforce_client.query_more(sql)
 
-    @offline_decorator
+    @reconnect_decorator
+    def query_rows(self, sql, columns):
+        """first page of `sql` with records decoded into decoder.Row of `columns`"""
+        log.debug('[SF.query_rows] %s' % sql)
+        if settings.SALESFORCE_OFFLINE:
+            return decoder.project(self.salesforce_client.query(sql), columns)
+        response = call_salesforce(self.salesforce_client, 'GET', self.salesforce_client.base_url + 'query/',
+                                   name='query', params={'q': sql}, stream=True)
+        return decoder.decode_response(response, columns)
+
+    @reconnect_decorator
+    def query_more_rows(self, locator, columns):
+        """next page of a query_rows() result"""
+        log.debug('[SF.query_more_rows] %s' % locator)
+        if settings.SALESFORCE_OFFLINE:
+            return decoder.project(self.salesforce_client.query_more(locator), columns)
+        response = call_salesforce(self.salesforce_client, 'GET',
+                                   '%squery/%s' % (self.salesforce_client.base_url, locator),
+                                   name='query_more', stream=True)
+        return decoder.decode_response(response, columns)
+
+    def query_all_rows(self, sql, columns):
+        """every page of `sql` decoded into rows, as query_all()"""
+        data = self.query_rows(sql, columns)
+        records = data['records']
+        while not data['done'] and data.get('nextRecordsUrl'):
+            data = self.query_more_rows(data['nextRecordsUrl'].rsplit('/', 1)[-1], columns)
+            records += data['records']
+        return {'totalSize': data.get('totalSize', len(records)), 'done': True, 'records': records}
+
     @reconnect_decorator
     def query_all(self, sql):
         log.debug('[SF.query_all] %s' % sql)
         return self.salesforce_client.query_all(sql)
 
+    def describe(self, use_cache=True):
+        """describe of the table, from the describe cache unless use_cache is False"""
+        if not use_cache:
+            return self.call_describe()
+        return get_describe_cache().get(self.using, 'describe', self.table_name, self.call_describe)
+
     @reconnect_decorator
-    def describe(self):
-        return self.model_client.describe()
+    def call_describe(self, headers=None):
+        return self.model_client.describe(headers=headers)
+
+    def export(self, sql, path, format='parquet', **kwargs):
+        """stream query results into a Parquet or Arrow IPC file, sql None for all fields, return rows"""
+        from . import export
+
+        return export.export(self, sql, path, format, **kwargs)
+
+    def metadata(self, use_cache=True):
+        """metadata of the table, from the describe cache unless use_cache is False"""
+        if not use_cache:
+            return self.call_metadata()
+        return get_describe_cache().get(self.using, 'metadata', self.table_name, self.call_metadata)
 
     @reconnect_decorator
-    def metadata(self):
-        return self.model_client.metadata()
+    def call_metadata(self, headers=None):
+        return self.model_client.metadata(headers=headers)
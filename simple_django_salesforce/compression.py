@@ -0,0 +1,126 @@
+"""http adapter of the connection sessions: gzip request bodies, count bytes before and after compression
+
+enabled per connection with `'GZIP': True` (or settings.SALESFORCE_GZIP for the legacy settings),
+responses are asked with `Accept-Encoding: gzip`, request bodies of at least `GZIP_MIN_SIZE` bytes are sent
+with `Content-Encoding: gzip`, streamed bodies (files, generators) are compressed chunk by chunk
+"""
+import logging
+import zlib
+
+from requests.adapters import HTTPAdapter
+
+from . import metrics
+
+log = logging.getLogger(__name__)
+log.setLevel(logging.INFO)
+
+DEFAULT_MIN_SIZE = 1024  # smaller bodies do not shrink enough to pay for the compression
+CHUNK_SIZE = 64 * 1024
+GZIP_WBITS = 16 + zlib.MAX_WBITS
+
+
+def iter_chunks(body):
+    if hasattr(body, 'read'):
+        while True:
+            chunk = body.read(CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk.encode('utf-8') if isinstance(chunk, str) else chunk
+    else:
+        for chunk in body:
+            yield chunk.encode('utf-8') if isinstance(chunk, str) else chunk
+
+
+class GzipStream(object):
+    """compress a streamed body while requests sends it, counting bytes before and after compression"""
+
+    def __init__(self, body, level=6):
+        self.body = body
+        self.level = level
+        self.size = 0
+        self.compressed_size = 0
+
+    def __iter__(self):
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, GZIP_WBITS)
+        for chunk in iter_chunks(self.body):
+            self.size += len(chunk)
+            data = compressor.compress(chunk)
+            if data:
+                self.compressed_size += len(data)
+                yield data
+        data = compressor.flush()
+        self.compressed_size += len(data)
+        yield data
+
+
+class TransferAdapter(HTTPAdapter):
+    """pooled adapter reporting transferred bytes to metrics.track_transfer(), optionally gzipping bodies"""
+
+    def __init__(self, gzip=False, min_size=DEFAULT_MIN_SIZE, level=6, **kwargs):
+        self.gzip = gzip
+        self.min_size = min_size
+        self.level = level
+        super(TransferAdapter, self).__init__(**kwargs)
+
+    def compress(self, request):
+        """replace the body when worth it, return (bytes sent, uncompressed bytes) or the GzipStream"""
+        body = request.body
+        if body is None:
+            return 0, 0
+        if isinstance(body, str):
+            body = request.body = body.encode('utf-8')
+        if isinstance(body, bytes):
+            if not self.gzip or len(body) < self.min_size or 'Content-Encoding' in request.headers:
+                return len(body), len(body)
+            compressor = zlib.compressobj(self.level, zlib.DEFLATED, GZIP_WBITS)
+            request.body = compressor.compress(body) + compressor.flush()
+            request.headers['Content-Encoding'] = 'gzip'
+            request.headers['Content-Length'] = str(len(request.body))
+            return len(request.body), len(body)
+        if not self.gzip or 'Content-Encoding' in request.headers:
+            return 0, 0  # size of a stream is unknown
+        request.body = GzipStream(body, self.level)
+        request.headers['Content-Encoding'] = 'gzip'
+        request.headers.pop('Content-Length', None)  # sent chunked
+        return request.body
+
+    def send(self, request, stream=False, **kwargs):
+        sizes = self.compress(request)
+        response = super(TransferAdapter, self).send(request, stream=stream, **kwargs)
+
+        sent, uncompressed = (sizes.compressed_size, sizes.size) if isinstance(sizes, GzipStream) else sizes
+        received = decoded = 0
+        if not stream:
+            decoded = len(response.content)  # read now, requests would right after the response hooks
+            received = response.raw.tell() if response.raw is not None else decoded
+        else:
+            response.count_received = True  # by track_received() once the caller consumed the body
+        metrics.track_transfer(sent, uncompressed, received, decoded)
+        return response
+
+
+def mount_client_adapter(session, pool_size, gzip=False, min_size=DEFAULT_MIN_SIZE):
+    """mount_adapter() on the session of a client created elsewhere, eg. settings.SALESFORCE_CLIENT, once,
+    adapters the application mounted itself are kept and their calls report no transfer"""
+    if session is None or getattr(session, '_sf_transfer_adapter', False):
+        return
+    session._sf_transfer_adapter = True
+    if all(type(session.get_adapter(prefix)) is HTTPAdapter for prefix in ('https://', 'http://')):
+        mount_adapter(session, pool_size, gzip=gzip, min_size=min_size)
+
+
+def track_received(response, decoded):
+    """count the bytes of a `stream=True` response sent through a TransferAdapter, after its body was read"""
+    if getattr(response, 'count_received', False):
+        received = response.raw.tell() if response.raw is not None else decoded
+        metrics.track_transfer(0, 0, received, decoded)
+
+
+def mount_adapter(session, pool_size, gzip=False, min_size=DEFAULT_MIN_SIZE):
+    """pooled TransferAdapter for http and https of `session`"""
+    adapter = TransferAdapter(gzip=gzip, min_size=min_size, pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    if gzip:
+        session.headers['Accept-Encoding'] = 'gzip'
+    return adapter
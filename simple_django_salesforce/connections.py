@@ -0,0 +1,218 @@
+"""named salesforce connections configured like DATABASES
+
+    SALESFORCE_CONNECTIONS = {
+        'default': {'USERNAME': '...', 'PASSWORD': '...', 'SECURITY_TOKEN': '...', 'SANDBOX': False},
+        'partner': {'USERNAME': '...', 'PASSWORD': '...', 'SECURITY_TOKEN': '...',
+                    'CHATTER_OAUTH_CLIENT_ID': '...', 'CHATTER_OAUTH_CLIENT_SECRET': '...',
+                    'CHATTER_API_URL': 'https://login.salesforce.com', 'POOL_SIZE': 20, 'GZIP': True},
+    }
+
+without SALESFORCE_CONNECTIONS the `default` connection uses settings.SALESFORCE_CLIENT and the
+SALESFORCE_API_* / CHATTER_* settings
+"""
+import contextlib
+import logging
+import threading
+
+import requests
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from simple_salesforce import Salesforce
+
+from . import compression, metrics, offline, ratelimit, sessions
+
+log = logging.getLogger(__name__)
+log.setLevel(logging.INFO)
+
+DEFAULT_CONNECTION = 'default'
+DEFAULT_POOL_SIZE = 10
+LOGIN_OPTIONS = ('username', 'password', 'security_token', 'organizationId', 'consumer_key', 'consumer_secret',
+                 'privatekey_file', 'privatekey', 'session_id', 'instance', 'instance_url')
+
+
+class Connection(object):
+    """login, pooled http session, chatter token and rate limiter of one org, shared by all threads"""
+
+    def __init__(self, alias, config, legacy=False):
+        self.alias = alias
+        self.config = config
+        self.legacy = legacy  # client kept in settings.SALESFORCE_CLIENT
+        self.lock = threading.RLock()
+        self._client = None
+        self._session = None
+        self._chatter = None
+
+    @property
+    def session(self):
+        if self._session is None:
+            with self.lock:
+                if self._session is None:
+                    session = requests.Session()
+                    compression.mount_adapter(session, **self.get_adapter_options())
+                    self._session = session
+        return self._session
+
+    def get_adapter_options(self):
+        return {'pool_size': self.config.get('POOL_SIZE', DEFAULT_POOL_SIZE), 'gzip': self.config.get('GZIP', False),
+                'min_size': self.config.get('GZIP_MIN_SIZE', compression.DEFAULT_MIN_SIZE)}
+
+    def get_client(self):
+        if self.legacy:
+            return getattr(settings, 'SALESFORCE_CLIENT', None)
+        return self._client
+
+    def set_client(self, client):
+        if self.legacy:
+            settings.SALESFORCE_CLIENT = client
+        self._client = client
+
+    @property
+    def client(self):
+        """simple_salesforce client, or the in-memory one when SALESFORCE_OFFLINE"""
+        if getattr(settings, 'SALESFORCE_OFFLINE', False):
+            return offline.client
+        client = self.get_client() or self.reconnect()
+        metrics.track_limit_info(client)
+        if self.legacy:
+            # settings.SALESFORCE_CLIENT may come with its own session
+            compression.mount_client_adapter(getattr(client, 'session', None), **self.get_adapter_options())
+        return client
+
+    def get_session_identity(self, kind):
+        """what a shared session of `kind` depends on, None when this connection does not log in"""
+        config = self.config
+        if not config.get('USERNAME'):
+            return None
+        if kind == 'chatter':
+            return config['USERNAME'], config.get('CHATTER_API_URL'), config.get('CHATTER_OAUTH_CLIENT_ID')
+        return config['USERNAME'], config.get('SANDBOX', False), config.get('OPTIONS', {}).get('domain')
+
+    def login(self):
+        """Salesforce client, its session is shared through settings.SALESFORCE_SESSION_CACHE when set"""
+        cache = sessions.get_session_cache()
+        identity = self.get_session_identity('api')
+        if cache is None or identity is None:
+            return self.call_login()
+
+        def login():
+            client = self.call_login()
+            return {'session_id': client.session_id, 'instance': client.sf_instance}
+
+        session = cache.get(self.alias, 'api', identity, login)
+        kwargs = dict((k, v) for k, v in self.config.get('OPTIONS', {}).items() if k not in LOGIN_OPTIONS)
+        kwargs.setdefault('session', self.session)
+        return Salesforce(session_id=session['session_id'], instance=session['instance'], **kwargs)
+
+    def invalidate_session(self, client):
+        """forget the shared session of a client rejected as expired"""
+        cache = sessions.get_session_cache()
+        identity = self.get_session_identity('api')
+        if cache is not None and identity is not None and client is not None:
+            cache.invalidate(self.alias, 'api', identity, client.session_id, 'session_id')
+
+    def call_login(self):
+        config = self.config
+        kwargs = {'session': self.session}
+        if config.get('USERNAME'):
+            kwargs.update(username=config['USERNAME'], password=config.get('PASSWORD', ''),
+                          security_token=config.get('SECURITY_TOKEN', ''))
+        if config.get('SANDBOX'):
+            kwargs['domain'] = 'test'
+        kwargs.update(config.get('OPTIONS', {}))  # other Salesforce() arguments, eg. domain, version
+        return Salesforce(**kwargs)
+
+    def reconnect(self, expired=None):
+        """login again, threads failing with the same `expired` client only login once"""
+        with self.lock:
+            client = self.get_client()
+            if client is None or client is expired or expired is None:
+                log.info('[Connection.%s] login' % self.alias)
+                if expired is not None:
+                    self.invalidate_session(expired)
+                client = self.login()
+                self.set_client(client)
+            return client
+
+    @property
+    def chatter(self):
+        if self._chatter is None:
+            from .chatter import Chatter
+
+            with self.lock:
+                if self._chatter is None:
+                    self._chatter = Chatter(using=self.alias)
+        return self._chatter
+
+    @property
+    def rate_limiter(self):
+        return ratelimit.get_rate_limiter(self.alias)
+
+
+class ConnectionHandler(object):
+    def __init__(self):
+        self._connections = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def get_config(self, alias):
+        """return (config, legacy)"""
+        configs = getattr(settings, 'SALESFORCE_CONNECTIONS', None)
+        if configs is not None:
+            if alias not in configs:
+                raise ImproperlyConfigured('Salesforce connection `%s` is not in SALESFORCE_CONNECTIONS.' % alias)
+            return configs[alias], False
+        if alias != DEFAULT_CONNECTION:
+            raise ImproperlyConfigured('Set SALESFORCE_CONNECTIONS to use salesforce connection `%s`.' % alias)
+        return {
+            'USERNAME': getattr(settings, 'SALESFORCE_API_USER', None),
+            'PASSWORD': getattr(settings, 'SALESFORCE_API_PASSWORD', ''),
+            'SECURITY_TOKEN': getattr(settings, 'SALESFORCE_API_TOKEN', ''),
+            'SANDBOX': getattr(settings, 'SALESFORCE_SANDBOX', False),
+            'CHATTER_OAUTH_CLIENT_ID': getattr(settings, 'CHATTER_OAUTH_CLIENT_ID', None),
+            'CHATTER_OAUTH_CLIENT_SECRET': getattr(settings, 'CHATTER_OAUTH_CLIENT_SECRET', None),
+            'CHATTER_API_URL': getattr(settings, 'CHATTER_API_URL', None),
+            'GZIP': getattr(settings, 'SALESFORCE_GZIP', False),
+        }, True
+
+    def __getitem__(self, alias):
+        alias = alias or self.get_alias()
+        connection = self._connections.get(alias)
+        if connection is None:
+            with self._lock:
+                connection = self._connections.get(alias)
+                if connection is None:
+                    config, legacy = self.get_config(alias)
+                    connection = self._connections[alias] = Connection(alias, config, legacy)
+        return connection
+
+    def all(self):
+        aliases = getattr(settings, 'SALESFORCE_CONNECTIONS', None) or [DEFAULT_CONNECTION]
+        return [self[alias] for alias in aliases]
+
+    def reset(self):
+        """forget connections, eg. after changing settings in tests"""
+        with self._lock:
+            self._connections.clear()
+
+    @contextlib.contextmanager
+    def using(self, alias):
+        """send calls of this thread to `alias`, unless a call passes its own `using`"""
+        if not alias:
+            yield
+            return
+        stack = self._local.__dict__.setdefault('stack', [])
+        stack.append(alias)
+        try:
+            yield
+        finally:
+            stack.pop()
+
+    def get_alias(self, default=None):
+        """alias of the innermost using() block of this thread, else default"""
+        stack = getattr(self._local, 'stack', None)
+        if stack:
+            return stack[-1]
+        return default or DEFAULT_CONNECTION
+
+
+connections = ConnectionHandler()
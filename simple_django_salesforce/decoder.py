@@ -0,0 +1,165 @@
+"""query pages decoded into compact rows instead of a dict tree per record
+
+    columns = Columns(['Id', 'IsDeleted', 'Name'])
+    page = client.query_rows('SELECT Id, IsDeleted, Name, Phone FROM Account', columns)
+    page['records'][0]['Name']  # Row, `attributes` and columns not listed are dropped
+
+with `pip install ijson` the response is parsed while it streams in and records are built as rows directly,
+else the page is parsed by json into plain dicts and projected right after
+"""
+import json
+import logging
+from collections.abc import Mapping
+
+from . import compression
+
+try:
+    import ijson
+    from ijson.common import ObjectBuilder
+except ImportError:
+    ijson = None
+
+log = logging.getLogger(__name__)
+log.setLevel(logging.INFO)
+
+PAGE_KEYS = ('totalSize', 'done', 'nextRecordsUrl')
+
+
+class CountingReader(object):
+    """file-like counting the bytes read"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.size = 0
+
+    def read(self, size=-1):
+        data = self.stream.read(size)
+        self.size += len(data)
+        return data
+
+
+class Missing(object):
+    """column absent from the record, the class itself is the marker so it stays identical once unpickled"""
+
+
+class Columns(object):
+    """column names shared by the rows of a pull, in projection order"""
+    __slots__ = ('names', 'positions')
+
+    def __init__(self, names):
+        self.names = tuple(dict.fromkeys(names))  # without duplicates, first position kept
+        self.positions = dict((name, i) for i, name in enumerate(self.names))
+
+    def __getstate__(self):
+        return self.names
+
+    def __setstate__(self, names):
+        self.names = names
+        self.positions = dict((name, i) for i, name in enumerate(names))
+
+    def __len__(self):
+        return len(self.names)
+
+    def make_row(self, record):
+        """Row of a record dict, columns absent from the record are left out of the row"""
+        return Row(self, tuple(record.get(name, Missing) for name in self.names))
+
+
+class Row(Mapping):
+    """read only mapping of one record over shared Columns, deserialize() and the pull paths read it as
+    the record dict"""
+    __slots__ = ('columns', 'values')
+
+    def __init__(self, columns, values):
+        self.columns = columns
+        self.values = values
+
+    def __getstate__(self):
+        return self.columns, self.values
+
+    def __setstate__(self, state):
+        self.columns, self.values = state
+
+    def __getitem__(self, key):
+        position = self.columns.positions.get(key)
+        value = Missing if position is None else self.values[position]
+        if value is Missing:
+            raise KeyError(key)
+        return value
+
+    def __iter__(self):
+        return (name for name, value in zip(self.columns.names, self.values) if value is not Missing)
+
+    def __len__(self):
+        return sum(1 for value in self.values if value is not Missing)
+
+    def items(self):
+        return [(name, value) for name, value in zip(self.columns.names, self.values) if value is not Missing]
+
+    def __repr__(self):
+        return '<Row %s>' % dict(self.items())
+
+
+def project(data, columns):
+    """page dict with its records turned into rows"""
+    data = dict(data)
+    data['records'] = [columns.make_row(x) for x in data.get('records', ())]
+    return data
+
+
+def parse_stream(stream, columns):
+    """page of a file-like json response, values of columns not kept and `attributes` are never built,
+    depth 1 is the page, 2 the records array, 3 a record, 4 and more a nested value"""
+    page = {'records': []}
+    records = page['records']
+    positions, width = columns.positions, len(columns)
+    depth = 0
+    page_key = position = values = builder = None
+    for event, value in ijson.basic_parse(stream, use_float=True):
+        if builder is not None:  # relationship or subquery of a kept column
+            builder.event(event, value)
+            if event == 'start_map' or event == 'start_array':
+                depth += 1
+            elif event == 'end_map' or event == 'end_array':
+                depth -= 1
+                if depth == 3:
+                    values[position] = builder.value
+                    builder = None
+        elif event == 'map_key':
+            if depth == 1:
+                page_key = value
+            elif depth == 3:
+                position = positions.get(value)
+        elif event == 'start_map' or event == 'start_array':
+            depth += 1
+            if depth == 3 and page_key == 'records':
+                values, position = [Missing] * width, None
+            elif depth == 4 and values is not None and position is not None:
+                builder = ObjectBuilder()
+                builder.event(event, value)
+        elif event == 'end_map' or event == 'end_array':
+            if depth == 3 and values is not None:
+                records.append(Row(columns, tuple(values)))
+                values = None
+            depth -= 1
+        elif depth == 3:
+            if values is not None and position is not None:
+                values[position] = value
+        elif depth == 1 and page_key in PAGE_KEYS:
+            page[page_key] = value
+    return page
+
+
+def decode_response(response, columns):
+    """page of a `stream=True` requests response, its bytes are counted in the call metric"""
+    if ijson is None:
+        content = response.content
+        compression.track_received(response, len(content))
+        return project(json.loads(content), columns)
+    response.raw.decode_content = True  # gzip
+    stream = CountingReader(response.raw)
+    try:
+        return parse_stream(stream, columns)
+    finally:
+        compression.track_received(response, stream.size)
+        response.close()
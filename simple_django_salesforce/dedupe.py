@@ -0,0 +1,58 @@
+"""find and merge rows sharing a salesforce_id, before making salesforce_id unique
+
+in a migration of its own, before the one altering salesforce_id:
+
+    operations = [
+        dedupe_operation('crm', 'Account'),
+    ]
+
+only uses `_meta` and the default manager, so it runs with the historical models of migrations
+"""
+import logging
+
+from django.db import migrations, transaction
+from django.db.models import Count, F
+
+log = logging.getLogger(__name__)
+log.setLevel(logging.INFO)
+
+
+def find_duplicates(model):
+    """{salesforce id: number of rows} of the ids used by more than one row"""
+    queryset = model._default_manager.exclude(salesforce_id__isnull=True).exclude(salesforce_id='') \
+        .values('salesforce_id').annotate(rows=Count('pk')).filter(rows__gt=1)
+    return dict((x['salesforce_id'], x['rows']) for x in queryset)
+
+
+def merge_rows(model, salesforce_id):
+    """keep the last synced row of the id, point foreign keys of the others to it and delete them,
+    return number of deleted rows"""
+    manager = model._default_manager
+    rows = list(manager.filter(salesforce_id=salesforce_id).order_by(
+        F('sync_at').desc(nulls_last=True), F('modify_at').desc(nulls_last=True), '-pk'))
+    keep, others = rows[0], [x.pk for x in rows[1:]]
+
+    with transaction.atomic():
+        for relation in model._meta.related_objects:
+            if relation.many_to_many:
+                continue  # rows of a through table are deleted with the duplicates
+            relation.related_model._default_manager.filter(**{'%s__in' % relation.field.name: others}) \
+                .update(**{relation.field.name: keep})
+        manager.filter(pk__in=others).delete()
+    log.info('[dedupe.merge_rows] %s %s: kept #%s, merged %s' % (model.__name__, salesforce_id, keep.pk, others))
+    return len(others)
+
+
+def merge_duplicates(model):
+    """merge every duplicated salesforce id, blank ids become NULL, return number of deleted rows"""
+    model._default_manager.filter(salesforce_id='').update(salesforce_id=None)
+    return sum(merge_rows(model, x) for x in find_duplicates(model))
+
+
+def dedupe_operation(app_label, model_name):
+    """RunPython operation merging duplicates of a model"""
+
+    def forward(apps, schema_editor):
+        merge_duplicates(apps.get_model(app_label, model_name))
+
+    return migrations.RunPython(forward, migrations.RunPython.noop)
@@ -0,0 +1,189 @@
+"""stream salesforce query results into Parquet or Arrow IPC files, typed from describe(), without django models
+
+    client = SalesforceClient(salesforce_table_name='Account')
+    rows = client.export('SELECT Id, Name, AnnualRevenue FROM Account', '/tmp/account.parquet')
+
+needs `pip install pyarrow`
+"""
+import json
+import logging
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .offline import parse_soql
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+log = logging.getLogger(__name__)
+log.setLevel(logging.INFO)
+
+PARQUET = 'parquet'
+ARROW = 'arrow'
+FORMATS = (PARQUET, ARROW)
+DEFAULT_BATCH_SIZE = 10000  # rows kept in memory before a batch is written
+
+STRING, BOOLEAN, INTEGER, FLOAT, DATE, DATETIME = 'string', 'boolean', 'integer', 'float', 'date', 'datetime'
+DECIMAL = 'decimal'  # column type (DECIMAL, precision, scale)
+MAX_DECIMAL_PRECISION = 38  # decimal128
+FIELD_TYPES = {
+    'boolean': BOOLEAN,
+    'int': INTEGER,
+    'double': FLOAT,
+    'currency': DECIMAL, 'percent': DECIMAL,  # exact, with precision and scale of describe
+    'date': DATE,
+    'datetime': DATETIME,
+}  # other salesforce types (id, reference, picklist, textarea, address, ...) are exported as strings
+COMPOUND_TYPES = ('address', 'location')  # not selectable as a whole in bulk, nested json in rest
+
+
+class ExportError(Exception):
+    pass
+
+
+def get_column_type(field):
+    """column type of a describe field, decimals without a usable precision are floats"""
+    column_type = FIELD_TYPES.get(field['type'], STRING)
+    if column_type == DECIMAL:
+        precision, scale = field.get('precision') or 0, field.get('scale') or 0
+        if not 0 < precision <= MAX_DECIMAL_PRECISION or not 0 <= scale <= precision:
+            return FLOAT
+        return DECIMAL, precision, scale
+    return column_type
+
+
+def get_arrow_type(column_type):
+    if isinstance(column_type, tuple):
+        _decimal, precision, scale = column_type
+        return pyarrow.decimal128(precision, scale)
+    return {
+        STRING: pyarrow.string(),
+        BOOLEAN: pyarrow.bool_(),
+        INTEGER: pyarrow.int64(),
+        FLOAT: pyarrow.float64(),
+        DATE: pyarrow.date32(),
+        DATETIME: pyarrow.timestamp('ms', tz='UTC'),
+    }[column_type]
+
+
+def convert(value, column_type):
+    """json value of the rest api to the python value of a column"""
+    if value is None:
+        return None
+    if isinstance(column_type, tuple):
+        # str() keeps the digits salesforce sent, a float would round them
+        return Decimal(str(value)).quantize(Decimal(1).scaleb(-column_type[2]), rounding=ROUND_HALF_UP)
+    if column_type == STRING:
+        return value if isinstance(value, str) else json.dumps(value)
+    if column_type == INTEGER:
+        return int(value)
+    if column_type == FLOAT:
+        return float(value)
+    if column_type == DATE:
+        return parse_date(value)
+    if column_type == DATETIME:
+        return parse_datetime(value)
+    return value
+
+
+def get_value(record, path):
+    """value of `Name` or `Account.Owner.Name` in a query record, names are case insensitive in soql"""
+    value = record
+    for name in path:
+        if value is None:
+            return None
+        if name in value:
+            value = value[name]
+            continue
+        lower = name.lower()
+        value = next((v for k, v in value.items() if k.lower() == lower), None)
+    return value
+
+
+def get_columns(sql, describe):
+    """[(column name, type)] of the selected fields, relationship fields are strings, currency and percent
+    fields are (DECIMAL, precision, scale)"""
+    fields = dict((x['name'].lower(), x) for x in describe.get('fields', []))
+    query = parse_soql(sql)
+    if query['subqueries']:
+        raise ExportError('child relationship subqueries can not be exported as columns')
+    columns = []
+    for name in query['fields']:
+        field = fields.get(name.lower())
+        if field is None:
+            columns.append((name, STRING))
+        else:
+            columns.append((field['name'], get_column_type(field)))
+    return columns
+
+
+def get_export_sql(table_name, describe):
+    """select every non compound field of the table"""
+    fields = [x['name'] for x in describe.get('fields', []) if x['type'] not in COMPOUND_TYPES]
+    if not fields:
+        raise ExportError('no fields to export in %s' % table_name)
+    return 'SELECT %s FROM %s' % (', '.join(fields), table_name)
+
+
+class ExportWriter(object):
+    """write record batches of a fixed schema to one file"""
+
+    def __init__(self, path, columns, format=PARQUET, compression='snappy'):
+        if pyarrow is None:
+            raise ImproperlyConfigured('pyarrow is required for export, `pip install pyarrow`')
+        if format not in FORMATS:
+            raise ExportError('unknown export format `%s`, use one of %s' % (format, ', '.join(FORMATS)))
+        self.columns = columns
+        self.paths = [x.split('.') for x, _type in columns]
+        self.schema = pyarrow.schema([(name, get_arrow_type(column_type)) for name, column_type in columns])
+        if format == PARQUET:
+            self.writer = pyarrow.parquet.ParquetWriter(path, self.schema, compression=compression)
+        else:
+            self.writer = pyarrow.ipc.new_file(path, self.schema)
+        self.rows = 0
+
+    def write(self, records):
+        """write records of the rest api as one batch, column by column"""
+        if not records:
+            return
+        arrays = []
+        for (name, column_type), path in zip(self.columns, self.paths):
+            values = [convert(get_value(x, path), column_type) for x in records]
+            arrays.append(pyarrow.array(values, type=get_arrow_type(column_type)))
+        self.writer.write_batch(pyarrow.RecordBatch.from_arrays(arrays, schema=self.schema))
+        self.rows += len(records)
+
+    def close(self):
+        self.writer.close()
+
+
+def export(client, sql, path, format=PARQUET, batch_size=DEFAULT_BATCH_SIZE, compression='snappy'):
+    """run `sql` with SalesforceClient `client` page by page into `path`, return number of rows
+
+        at most `batch_size` rows (plus one query page) are held in memory
+    """
+    describe = client.describe()
+    sql = sql or get_export_sql(client.table_name, describe)
+    writer = ExportWriter(path, get_columns(sql, describe), format, compression)
+    try:
+        pending = []
+        result = client.query(sql, use_cache=False)
+        while True:
+            pending.extend(result['records'])
+            if len(pending) >= batch_size:
+                writer.write(pending)
+                pending = []
+            if result['done'] or not result.get('nextRecordsUrl'):
+                break
+            result = client.query_more(result['nextRecordsUrl'].rsplit('/', 1)[-1])
+        writer.write(pending)
+    finally:
+        writer.close()
+    log.info('[export] %s rows of %s written to %s' % (writer.rows, client.table_name, path))
+    return writer.rows
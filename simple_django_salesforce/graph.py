@@ -0,0 +1,142 @@
+"""push related rows in one composite graph request, new parents are referenced with `@{ref.id}`
+
+    account = Account.objects.create(name='ACME')
+    contact = Contact.objects.create(account=account, last_name='Doe')  # fields_map: 'account.salesforce_id'
+    opportunity = Opportunity.objects.create(account=account, name='Deal')
+    push_graph([opportunity, contact])  # creates account, then contact and opportunity, in one call
+
+parents reached by `fk.salesforce_id` paths of fields_map are pushed when they have no salesforce id yet,
+returned ids and sync_at are written back with one bulk update per model
+"""
+import logging
+from collections import OrderedDict
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import helpers, metrics, read_cache, tracing
+from .client import SalesforceClient
+from .connections import connections
+
+log = logging.getLogger(__name__)
+log.setLevel(logging.INFO)
+
+
+class PushGraphError(Exception):
+    def __init__(self, message, errors=None):
+        super(PushGraphError, self).__init__(message)
+        self.errors = errors or []
+
+
+def get_parents(obj):
+    """[(salesforce field, parent object or None)] of the `fk.salesforce_id` fields"""
+    parents = []
+    for local_field, salesforce_field in obj.fields_map.items():
+        if local_field in obj.salesforce_read_only:
+            continue
+        if local_field.count('.') == 1 and local_field.endswith('.salesforce_id'):
+            parent = getattr(obj, local_field.split('.')[0])
+            if parent is not None and hasattr(parent, 'fields_map'):
+                parents.append((salesforce_field, parent))
+    return parents
+
+
+def get_key(obj):
+    return type(obj), obj.pk
+
+
+def collect_nodes(objects):
+    """objects and their parents without salesforce id, parents first"""
+    nodes = OrderedDict()
+
+    def visit(obj, path):
+        key = get_key(obj)
+        if key in nodes:
+            return
+        if obj.pk is None:
+            raise PushGraphError('%s must be saved before push_graph()' % obj.__class__.__name__)
+        if key in path:
+            raise PushGraphError('%s#%s references itself' % (obj.__class__.__name__, obj.pk))
+        path.add(key)
+        for salesforce_field, parent in get_parents(obj):
+            if not parent.salesforce_id:
+                visit(parent, path)
+        path.discard(key)
+        nodes[key] = obj
+
+    for obj in objects:
+        visit(obj, set())
+    return nodes
+
+
+def get_request(client, obj, reference_ids):
+    """composite subrequest creating, updating or upserting obj"""
+    fields = obj.serialize()
+    fields.pop(SalesforceClient.DEFAULT_SALESFORCE_KEY_NAME, None)
+    for salesforce_field, parent in get_parents(obj):
+        if not parent.salesforce_id and get_key(parent) in reference_ids:
+            fields[salesforce_field] = '@{%s.id}' % reference_ids[get_key(parent)]
+
+    if obj.salesforce_key_name != SalesforceClient.DEFAULT_SALESFORCE_KEY_NAME:
+        fields.pop(obj.salesforce_key_name, None)
+        method, url = 'PATCH', client.get_sobject_url(obj.salesforce_table_name, obj.salesforce_key_name,
+                                                      str(obj.get_salesforce_pk_value()))
+    elif obj.salesforce_id:
+        method, url = 'PATCH', client.get_sobject_url(obj.salesforce_table_name, obj.salesforce_id)
+    else:
+        method, url = 'POST', client.get_sobject_url(obj.salesforce_table_name)
+    return {'method': method, 'url': url, 'referenceId': reference_ids[get_key(obj)], 'body': fields}
+
+
+def push_graph(objects, using=None):
+    """push objects and their new parents in one composite graph, all or nothing, return pushed objects"""
+    objects = list(objects)
+    if not objects:
+        return []
+    with connections.using(using), metrics.collect('push_graph') as stats, \
+            tracing.span('push_graph', table=objects[0].__class__.__name__) as stage:
+        pushed = _push_graph(objects)
+        stage.set(count=len(pushed))
+    log.debug(stats.summary())
+    return pushed
+
+
+def _push_graph(objects):
+    nodes = collect_nodes(objects)
+    if len(nodes) > SalesforceClient.GRAPH_SIZE:
+        raise PushGraphError('%s records exceed the %s nodes of a graph' % (len(nodes), SalesforceClient.GRAPH_SIZE))
+
+    client = objects[0].get_salesforce_client()
+    reference_ids = dict((key, 'ref%s' % i) for i, key in enumerate(nodes))
+    with tracing.span('serialize', table='graph', count=len(nodes)):
+        requests = [get_request(client, obj, reference_ids) for obj in nodes.values()]
+    try:
+        result = client.composite_graph([{'graphId': 'graph', 'compositeRequest': requests}])[0]
+    finally:
+        for table_name in set(x.salesforce_table_name for x in nodes.values()):
+            read_cache.invalidate(table_name)
+
+    responses = result['graphResponse']['compositeResponse']
+    if not result['isSuccessful']:
+        errors = [x for x in responses if x['httpStatusCode'] >= 300]
+        log.error('[push_graph] %s records failed >> %s' % (len(nodes), errors))
+        raise PushGraphError('push_graph failed: %s' % errors, errors)
+
+    ids = dict((x['referenceId'], (x['body'] or {}).get('id')) for x in responses)
+    now = timezone.now()
+    by_model, created = OrderedDict(), OrderedDict()
+    for key, obj in nodes.items():
+        if not obj.salesforce_id:
+            obj.salesforce_id = ids.get(reference_ids[key])
+            created.setdefault(type(obj), []).append(obj.salesforce_id)
+        obj.sync_at = now
+        by_model.setdefault(type(obj), []).append(obj)
+
+    with transaction.atomic(), tracing.span('sync_at', table='graph', count=len(nodes)):
+        for model, objs in by_model.items():
+            helpers.bulk_update(model, objs, ['salesforce_id', 'sync_at'])
+    for model, salesforce_ids in created.items():
+        if model.pull_after_create:
+            model.pull_by_ids(salesforce_ids)
+    log.info('[push_graph] %s records pushed, %s created' % (len(nodes), sum(len(x) for x in created.values())))
+    return list(nodes.values())
@@ -1,6 +1,8 @@
 import json
-from decimal import Decimal
-from django.db import models
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from django.core.exceptions import ValidationError
+from django.db import connections, models, transaction
 from django.conf import settings
 from django.utils.dateparse import parse_datetime, parse_date
 
@@ -40,6 +42,17 @@ def get_serialized_data(obj, field_name, field_type):
     return data
 
 
+def get_push_value(value):
+    """value of a python object as sent to salesforce, formatted as get_serialized_data()"""
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.__format__('%Y-%m-%dT%H:%M:%SZ')
+    if isinstance(value, date):
+        return value.__format__('%Y-%m-%d')
+    return value
+
+
 def get_deserialized_data(data, field_type):
     if data is None or data == 'None':
         return None
@@ -60,6 +73,19 @@ def get_deserialized_data(data, field_type):
     return data
 
 
+def get_stored_value(field, value):
+    """value as the database returns it, decimals rounded to decimal_places, to compare pulled and stored values"""
+    if value is None:
+        return None
+    try:
+        value = field.to_python(value)
+        if isinstance(field, models.DecimalField):
+            value = value.quantize(Decimal(1).scaleb(-field.decimal_places))
+    except (ValidationError, InvalidOperation):
+        pass
+    return value
+
+
 def get_nested_object(obj, field_str):
     for obj_ref in field_str.split('.')[:-1]:
         if hasattr(obj, obj_ref):
@@ -109,3 +135,46 @@ def get_object_to_salesforce_mapping_key(object, field_name):
 def get_salesforce_to_object_mapping_key(obj, field_name):
     inverse_map = {v: k for k, v in obj.fields_map.items()}
     return inverse_map.get(field_name)
+
+
+def bulk_update(model, objs, fields, batch_size=None):
+    """QuerySet.bulk_update() on django 2.2+, save(update_fields) one by one before"""
+    if not objs:
+        return
+    if hasattr(model.objects, 'bulk_update'):
+        model.objects.bulk_update(objs, fields, batch_size=batch_size)
+    else:
+        for obj in objs:
+            obj.save(update_fields=fields)
+
+
+def is_push_on_commit(on_commit=None):
+    """whether pushes wait for transaction.on_commit, default `settings.SALESFORCE_PUSH_ON_COMMIT`"""
+    if on_commit is None:
+        return getattr(settings, 'SALESFORCE_PUSH_ON_COMMIT', False)
+    return on_commit
+
+
+def push_on_commit(model, operation, func, payload=None, object_pk='', using=None):
+    """call func() after the current transaction committed, record a PushFailure if it raises"""
+    from .models import PushFailure
+
+    using = model.get_salesforce_using(using)  # resolved now, the callback runs outside connections.using()
+
+    def push():
+        try:
+            func()
+        except Exception as ex:
+            PushFailure.record(model, operation, payload, object_pk, ex, using=using)
+
+    transaction.on_commit(push)
+
+
+def get_upsert_options(model, unique_field):
+    """bulk_create() options for INSERT ... ON CONFLICT DO UPDATE on the unique field, None if not supported"""
+    features = connections[model.objects.db].features
+    if getattr(features, 'supports_update_conflicts_with_target', False):
+        return {'update_conflicts': True, 'unique_fields': [unique_field]}
+    if getattr(features, 'supports_update_conflicts', False):
+        return {'update_conflicts': True}  # mysql, conflicts on any unique key
+    return None
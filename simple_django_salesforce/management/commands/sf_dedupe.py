@@ -0,0 +1,36 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+
+from simple_django_salesforce.dedupe import find_duplicates, merge_duplicates
+from simple_django_salesforce.model import get_salesforce_models
+
+
+class Command(BaseCommand):
+    help = '''Find rows sharing a salesforce_id and merge them into the last synced one
+        Usage: ./manage.py sf_dedupe [<app_label.Model> ...] [--dry-run]
+    '''
+
+    def add_arguments(self, parser):
+        parser.add_argument('models', nargs='*', type=str,
+                            help='app_label.Model, default all SalesforceModel subclasses')
+        parser.add_argument('--dry-run', action='store_true', help='only list duplicated salesforce ids')
+
+    def handle(self, *args, **options):
+        if options['models']:
+            try:
+                models = [apps.get_model(x) for x in options['models']]
+            except (LookupError, ValueError) as ex:
+                raise CommandError(ex)
+        else:
+            models = get_salesforce_models()
+
+        for model in models:
+            duplicates = find_duplicates(model)
+            if options['dry_run']:
+                for salesforce_id, rows in sorted(duplicates.items()):
+                    self.stdout.write('%s %s: %s rows' % (model.__name__, salesforce_id, rows))
+                self.stdout.write('%s: %s duplicated salesforce ids' % (model.__name__, len(duplicates)))
+                continue
+            deleted = merge_duplicates(model) if duplicates else 0
+            self.stdout.write('%s: %s duplicated salesforce ids, %s rows merged' % (
+                model.__name__, len(duplicates), deleted))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from simple_django_salesforce import export
+from simple_django_salesforce.client import SalesforceClient
+
+
+class Command(BaseCommand):
+    help = '''Export a salesforce table or query into a Parquet or Arrow IPC file, no local models involved
+        Usage: ./manage.py sf_export <SF_table_name> <path> [--soql "SELECT ..."] [--format parquet|arrow] [--using <alias>]
+    '''
+
+    def add_arguments(self, parser):
+        parser.add_argument('sf_table_name', type=str)
+        parser.add_argument('path', type=str)
+        parser.add_argument('--soql', default=None, help='query to export, default all fields of the table')
+        parser.add_argument('--format', default=export.PARQUET, choices=export.FORMATS)
+        parser.add_argument('--batch-size', type=int, default=export.DEFAULT_BATCH_SIZE,
+                            help='rows held in memory before writing a batch')
+        parser.add_argument('--compression', default='snappy', help='parquet compression codec')
+        parser.add_argument('--using', default=None, help='salesforce connection alias, default `default`')
+
+    def handle(self, *args, **options):
+        client = SalesforceClient(salesforce_table_name=options['sf_table_name'], using=options['using'])
+        try:
+            rows = client.export(options['soql'], options['path'], options['format'],
+                                 batch_size=options['batch_size'], compression=options['compression'])
+        except export.ExportError as ex:
+            raise CommandError(ex)
+        self.stdout.write('%s rows written to %s' % (rows, options['path']))
@@ -1,10 +1,23 @@
-from django.core.management.base import BaseCommand
-from django.conf import settings
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand, CommandError
+
+from simple_django_salesforce.cache import DescribeCache, FileStorage, get_describe_cache
+from simple_django_salesforce.client import SalesforceClient, get_salesforce_connection
+from simple_django_salesforce.connections import connections
+
+MODULE_HEADER = '''from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+from simple_django_salesforce.model import SalesforceModel
+
+'''
 
 
 class Command(BaseCommand):
-    help = '''Creates django model, input SF table name
-        Usage: ./manage.py sf_model <SF_table_name>
+    help = '''Creates django models, input SF table names or --all custom objects, describes are fetched concurrently
+        Usage: ./manage.py sf_model <SF_table_name> [<SF_table_name> ...] [--all] [--output-dir <dir>] [--cache-dir <dir>] [--workers 8] [--using <alias>]
     '''
 
     ignore_fields = []
@@ -17,7 +30,7 @@ class Command(BaseCommand):
         '''    %s = models.BooleanField(_('%s'), default=%s)\n''',
         ('name', 'label', 'defaultValue')),
         'NullBooleanField': (
-        '''    %s = models.NullBooleanField(_('%s'), blank=True, null=True)\n''',
+        '''    %s = models.BooleanField(_('%s'), blank=True, null=True)\n''',
         ('name', 'label')),
         'CharField': (
         '''    %s = models.CharField(_('%s'), max_length=%s, blank=True)\n''',
@@ -26,8 +39,8 @@ class Command(BaseCommand):
         '''    %s = models.TextField(_('%s'), max_length=500, blank=True)\n''',
         ('name', 'label')),
         'IntegerField': (
-        '''    %s = models.IntegerField(_('%s'), max_length=%s, blank=True, null=True)\n''',
-        ('name', 'label', 'precision')),
+        '''    %s = models.IntegerField(_('%s'), blank=True, null=True)\n''',
+        ('name', 'label')),
         'DateTimeField': (
             '''    %s = models.DateTimeField(_('%s'), auto_now=False, auto_now_add=False, blank=True, null=True)\n''',
             ('name', 'label')),
@@ -40,15 +53,75 @@ class Command(BaseCommand):
     }
 
     def add_arguments(self, parser):
-        parser.add_argument('sf_table_name', nargs='+', type=str)
+        parser.add_argument('sf_table_name', nargs='*', type=str)
+        parser.add_argument('--all', action='store_true', help='all custom objects of the org, from describeGlobal')
+        parser.add_argument('--output-dir', default=None, help='write one module per table, default print them')
+        parser.add_argument('--cache-dir', default=None,
+                            help='keep describes in this directory for re-runs, default SALESFORCE_DESCRIBE_CACHE')
+        parser.add_argument('--workers', type=int, default=8, help='concurrent describe calls')
+        parser.add_argument('--using', default=None, help='salesforce connection alias, default `default`')
 
     def handle(self, *args, **options):
         """"""
-        sf_name = options['sf_table_name'][0]
-        client = settings.SALESFORCE_CLIENT
-        model_client = getattr(client, sf_name)
+        using = connections.get_alias(options['using'])
+        if options['cache_dir']:
+            self.describe_cache = DescribeCache(FileStorage(options['cache_dir']), ttl=24 * 3600)
+        else:
+            self.describe_cache = get_describe_cache()
+
+        table_names = list(options['sf_table_name'])
+        if options['all']:
+            table_names += [x for x in self.describe_global(using) if x not in table_names]
+        if not table_names:
+            raise CommandError('Input SF table names or --all.')
+
+        describes, failed = {}, []
+        with ThreadPoolExecutor(max_workers=max(1, options['workers'])) as executor:
+            futures = dict((executor.submit(self.describe, using, x), x) for x in table_names)
+            for future in as_completed(futures):
+                try:
+                    describes[futures[future]] = future.result()
+                except Exception as ex:
+                    failed.append(futures[future])
+                    self.stderr.write('%s: describe failed >> %s' % (futures[future], ex))
+
+        class_names = dict((x, self.get_choice_value_name(describes[x]['label'])) for x in describes)
+        for sf_name in table_names:
+            if sf_name not in describes:
+                continue
+            module = self.render_module(describes[sf_name], class_names)
+            if options['output_dir']:
+                os.makedirs(options['output_dir'], exist_ok=True)
+                path = os.path.join(options['output_dir'], '%s.py' % self.gen_module_name(sf_name))
+                with open(path, 'w') as f:
+                    f.write(module)
+                self.stdout.write('%s: %s written' % (sf_name, path))
+            else:
+                self.stdout.write(module)
+
+        if failed:
+            raise CommandError('%s tables failed: %s' % (len(failed), ', '.join(sorted(failed))))
+
+    def describe_global(self, using):
+        """names of the custom objects of the org"""
+
+        def fetch(headers):
+            return get_salesforce_connection(using).describe(headers=headers or {})
+
+        sobjects = self.describe_cache.get(using, 'global', None, fetch)['sobjects']
+        return [x['name'] for x in sobjects if x.get('custom') and x.get('queryable', True)]
+
+    def describe(self, using, sf_name):
+        client = SalesforceClient(salesforce_table_name=sf_name, using=using)
+        return self.describe_cache.get(using, 'describe', sf_name, client.call_describe)
+
+    def gen_module_name(self, sf_name):
+        if sf_name.endswith('__c'):
+            sf_name = sf_name[:-3]
+        return self.gen_field_name(sf_name.replace('__', '_'))
 
-        sf_meta = model_client.describe()
+    def render_module(self, sf_meta, class_names):
+        """model module of a table, references to tables of `class_names` become foreign keys"""
         fields = sf_meta['fields']
         result = '''class %s(SalesforceModel):\n''' % self.get_choice_value_name(
             sf_meta['label'])
@@ -56,15 +129,31 @@ class Command(BaseCommand):
 
         for field_data in fields:
             field_name = self.gen_field_name(field_data['name'])
-            definition = self.get_field_define(field_data)
+            if field_data['type'] == 'id':
+                # salesforce_id of SalesforceModel
+                fields_name_map += '''        'salesforce_id': '%s',\n''' % field_data['name']
+                continue
+            if field_data['type'] == 'reference':
+                reference = (field_data.get('referenceTo') or [None])[0]
+                if reference in class_names and field_data.get('relationshipName'):
+                    field_name = self.gen_field_name(field_data['relationshipName'])
+                    result += '''    %s = models.ForeignKey('%s', blank=True, null=True, on_delete=models.SET_NULL)\n''' % (
+                        field_name, class_names[reference])
+                    fields_name_map += '''        '%s.salesforce_id': '%s',\n''' % (field_name, field_data['name'])
+                    continue
+                field_data = dict(field_data, type='string')  # keep the id of a table not generated
+            try:
+                definition = self.get_field_define(field_data)
+            except NotImplementedError as ex:
+                result += '    # %s: %s\n' % (field_data['name'], ex)
+                continue
             result += definition
             fields_name_map += '''        '%s': '%s',\n''' % (
             field_name, field_data['name'])
 
-        choice_def = self.extract_choice(fields)
-        print(choice_def)
-        print(result)
-        print('''    fields_map = {\n%s    }''' % fields_name_map)
+        result += '''\n    salesforce_table_name = '%s'\n''' % sf_meta['name']
+        result += '''    fields_map = {\n%s    }\n''' % fields_name_map
+        return MODULE_HEADER + self.extract_choice(fields) + '\n' + result
 
     def gen_field_name(self, value):
         if len(value) > 2:
@@ -157,6 +246,10 @@ class Command(BaseCommand):
                 return self.get_django_filed('IntegerField', field_data)
             else:
                 return self.get_django_filed('DecimalField', field_data)
+        elif field_data['type'] == 'int':
+            return self.get_django_filed('IntegerField', field_data)
+        elif field_data['type'] in ('email', 'phone'):
+            return self.get_django_filed('CharField', field_data)
         elif field_data['type'] == 'currency':
             return self.get_django_filed('DecimalField', field_data)
         elif field_data['type'] == 'textarea':
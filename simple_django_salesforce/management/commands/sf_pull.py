@@ -0,0 +1,33 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+
+from simple_django_salesforce.model import get_salesforce_models
+
+
+class Command(BaseCommand):
+    help = '''Pull whole salesforce tables into local db, checkpointed page by page in SyncRun
+        Usage: ./manage.py sf_pull [<app_label.Model> ...] [--resume] [--no-create] [--using <alias>]
+    '''
+
+    def add_arguments(self, parser):
+        parser.add_argument('models', nargs='*', type=str,
+                            help='app_label.Model, default all SalesforceModel subclasses')
+        parser.add_argument('--resume', action='store_true',
+                            help='continue the last unfinished run from its last committed page')
+        parser.add_argument('--no-create', action='store_true', help='only update existing rows')
+        parser.add_argument('--using', default=None, help='salesforce connection alias, default `default`')
+
+    def handle(self, *args, **options):
+        if options['models']:
+            try:
+                models = [apps.get_model(x) for x in options['models']]
+            except (LookupError, ValueError) as ex:
+                raise CommandError(ex)
+        else:
+            models = get_salesforce_models()
+
+        for model in models:
+            existed, new, deleted = model.pull_all(create_new=not options['no_create'], checkpoint=True,
+                                                   resume=options['resume'], using=options['using'])
+            self.stdout.write('%s: %s updated, %s created, %s deleted' % (
+                model.__name__, len(existed), len(new), len(deleted)))
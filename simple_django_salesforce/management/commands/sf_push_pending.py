@@ -0,0 +1,42 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+
+from simple_django_salesforce.client import SalesforceClient
+from simple_django_salesforce.model import get_salesforce_models
+
+
+class Command(BaseCommand):
+    help = '''Push rows never synced or modified after last sync to salesforce
+        Usage: ./manage.py sf_push_pending [<app_label.Model> ...] [--chunk-size 200] [--bulk] [--dry-run] [--using <alias>]
+    '''
+
+    def add_arguments(self, parser):
+        parser.add_argument('models', nargs='*', type=str,
+                            help='app_label.Model, default all SalesforceModel subclasses')
+        parser.add_argument('--chunk-size', type=int, default=SalesforceClient.COLLECTION_SIZE,
+                            help='rows per salesforce call, sObject collections take max 200')
+        parser.add_argument('--bulk', action='store_true', help='use bulk api instead of sObject collections')
+        parser.add_argument('--dry-run', action='store_true', help='only count pending rows')
+        parser.add_argument('--using', default=None, help='salesforce connection alias, default `default`')
+
+    def handle(self, *args, **options):
+        if options['models']:
+            try:
+                models = [apps.get_model(x) for x in options['models']]
+            except (LookupError, ValueError) as ex:
+                raise CommandError(ex)
+        else:
+            models = get_salesforce_models()
+
+        total_failed = 0
+        for model in models:
+            if options['dry_run']:
+                self.stdout.write('%s: %s pending' % (model.__name__, model.objects.pending_push().count()))
+                continue
+            pushed, failed = model.objects.push_pending(chunk_size=options['chunk_size'], use_bulk=options['bulk'],
+                                                        using=options['using'])
+            total_failed += failed
+            self.stdout.write('%s: %s pushed, %s failed' % (model.__name__, pushed, failed))
+
+        if total_failed:
+            raise CommandError('%s rows failed to push' % total_failed)
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from simple_django_salesforce.models import PushFailure
+
+
+class Command(BaseCommand):
+    help = '''Retry pushes deferred to transaction.on_commit and pulls of webhook notifications that failed
+        Usage: ./manage.py sf_retry_push [--max-attempts 10]
+    '''
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-attempts', type=int, default=None,
+                            help='skip failures already tried this many times')
+
+    def handle(self, *args, **options):
+        failures = PushFailure.objects.order_by('pk')
+        if options['max_attempts']:
+            failures = failures.filter(attempts__lt=options['max_attempts'])
+
+        succeeded = failed = 0
+        for failure in failures.iterator():
+            if failure.retry():
+                succeeded += 1
+            else:
+                failed += 1
+        self.stdout.write('%s pushes retried, %s failed again' % (succeeded, failed))
@@ -0,0 +1,39 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+
+from simple_django_salesforce.model import get_salesforce_models
+from simple_django_salesforce.streaming import ChangeEventConsumer, REPLAY_NEW, REPLAY_ALL
+
+
+class Command(BaseCommand):
+    help = '''Apply Change Data Capture events of salesforce models to local db, resume from saved replay ids
+        Usage: ./manage.py sf_stream [<app_label.Model> ...] [--replay-all] [--using <alias>]
+    '''
+
+    def add_arguments(self, parser):
+        parser.add_argument('models', nargs='*', type=str,
+                            help='app_label.Model, default all SalesforceModel subclasses')
+        parser.add_argument('--replay-all', action='store_true',
+                            help='replay retained events of channels without saved replay id')
+        parser.add_argument('--bursts', type=int, default=None, help='stop after applying N event bursts')
+        parser.add_argument('--using', default=None, help='salesforce connection alias, default `default`')
+
+    def handle(self, *args, **options):
+        if options['models']:
+            try:
+                models = [apps.get_model(x) for x in options['models']]
+            except (LookupError, ValueError) as ex:
+                raise CommandError(ex)
+        else:
+            models = get_salesforce_models()
+        if not models:
+            raise CommandError('No salesforce model to stream.')
+
+        consumer = ChangeEventConsumer(models, replay=REPLAY_ALL if options['replay_all'] else REPLAY_NEW,
+                                       using=options['using'])
+        try:
+            bursts = consumer.run(max_bursts=options['bursts'])
+        except KeyboardInterrupt:
+            consumer.stop()
+            return
+        self.stdout.write('%s event bursts applied' % bursts)
@@ -1,18 +1,52 @@
+import functools
 import logging
 from django.db import transaction
 from django.db import models
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .client import SalesforceClient
+from . import helpers
 
 log = logging.getLogger(__name__)
 log.setLevel(logging.INFO)
 
 
+def get_pending_push_condition():
+    """rows never pushed or modified after last sync"""
+    return Q(sync_at__isnull=True) | Q(sync_at__lt=F('modify_at'))
+
+
+def pending_push_index(name):
+    """partial index on the pk of pending rows, for the Meta.indexes of a concrete model:
+
+        class Meta:
+            indexes = [pending_push_index('product_pending_push')]
+
+    only databases with partial indexes (postgresql, sqlite) create it, synced rows are not in it
+    """
+    return models.Index(fields=['id'], name=name, condition=get_pending_push_condition())
+
+
 class SalesforceQuerySet(models.query.QuerySet):
-    def delete_and_push(self, hard_delete=False):
+    def delete_and_push(self, hard_delete=False, on_commit=None, using=None):
+        """on_commit: push after the transaction committed, default settings.SALESFORCE_PUSH_ON_COMMIT
+            using: salesforce connection alias
+        """
+        if helpers.is_push_on_commit(on_commit):
+            sf_data = [{'Id': obj.salesforce_id} for obj in self]
+            deleted, _rows_count = super(SalesforceQuerySet, self).delete()
+            client = self.model.get_salesforce_client(using)
+            operation = 'bulk_hard_delete' if hard_delete else 'bulk_delete'
+            helpers.push_on_commit(self.model, operation, functools.partial(getattr(client, operation), sf_data),
+                                   payload=sf_data, using=using)
+            return deleted, _rows_count
+
         with transaction.atomic():
             sf_data = [{'Id': obj.salesforce_id} for obj in self]
 
             deleted, _rows_count = super(SalesforceQuerySet, self).delete()
-            client = self.model.get_salesforce_client()
+            client = self.model.get_salesforce_client(using)
             if hard_delete:
                 result = client.bulk_hard_delete(sf_data)
             else:
@@ -25,22 +59,150 @@ class SalesforceQuerySet(models.query.QuerySet):
     delete_and_push.alters_data = True
     delete_and_push.queryset_only = True
 
-    def update_and_push(self, **kwargs):
+    def update_and_push(self, on_commit=None, using=None, **kwargs):
+        """on_commit: push after the transaction committed, default settings.SALESFORCE_PUSH_ON_COMMIT
+            using: salesforce connection alias
+        """
+        push_fields = self.get_push_fields(kwargs)
+        if helpers.is_push_on_commit(on_commit):
+            # ids first, the update may change what the queryset matches
+            sf_data = []
+            for salesforce_id in self.values_list('salesforce_id', flat=True):
+                data = {'Id': salesforce_id}
+                data.update(push_fields)
+                sf_data.append(data)
+            rows = super(SalesforceQuerySet, self).update(**kwargs)
+            client = self.model.get_salesforce_client(using)
+            helpers.push_on_commit(self.model, 'bulk_update', functools.partial(client.bulk_update, sf_data),
+                                   payload=sf_data, using=using)
+            return rows
+
         with transaction.atomic():
             rows = super(SalesforceQuerySet, self).update(**kwargs)
             sf_data = []
             for obj in self:
                 data = {'Id': obj.salesforce_id}
-                data.update(kwargs)
+                data.update(push_fields)
                 sf_data.append(data)
 
-            client = self.model.get_salesforce_client()
+            client = self.model.get_salesforce_client(using)
             result = client.bulk_update(sf_data)
             # todo check result
         return rows
 
     update_and_push.alters_data = True
 
+    def get_push_fields(self, kwargs):
+        """update() kwargs as salesforce fields and json values, read only fields are not pushed"""
+        push_fields = {}
+        for field_name, value in kwargs.items():
+            if hasattr(value, 'resolve_expression'):
+                # F('x') + 1 has no value until the database computed it
+                raise ValueError('update_and_push() can not push the expression of `%s`, pass a value' % field_name)
+            if field_name in self.model.salesforce_read_only:
+                continue
+            push_fields[self.model.fields_map.get(field_name, field_name)] = helpers.get_push_value(value)
+        return push_fields
+
+    def pending_push(self):
+        """rows never pushed or modified after last sync, backed by `pending_push_index()` when declared"""
+        return self.filter(get_pending_push_condition())
+
+    def push_pending(self, chunk_size=SalesforceClient.COLLECTION_SIZE, use_bulk=False, using=None):
+        """push pending rows chunk by chunk with sObject collections or bulk api,
+        write back salesforce ids and sync_at with one bulk update per chunk, return (pushed, failed)"""
+        model = self.model
+        client = model.get_salesforce_client(using)
+        if not use_bulk:
+            chunk_size = min(chunk_size, SalesforceClient.COLLECTION_SIZE)
+        fk_names = set(x.split('.')[0] for x in model.fields_map if '.' in x)
+        queryset = self.pending_push().select_related(*fk_names).order_by('pk')
+
+        pushed = failed = 0
+        last_pk = None
+        while True:
+            chunk_queryset = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+            # rows changed after this point stay pending as their modify_at > sync_at
+            read_at = timezone.now()
+            chunk = list(chunk_queryset[:chunk_size])
+            if not chunk:
+                break
+            last_pk = chunk[-1].pk
+
+            synced, chunk_failed = self._push_chunk(client, chunk, use_bulk)
+            for obj in synced:
+                obj.sync_at = read_at
+            helpers.bulk_update(model, synced, ['salesforce_id', 'sync_at'])
+            pushed += len(synced)
+            failed += chunk_failed
+            log.info('[%s.push_pending] %s pushed, %s failed' % (model.__name__, pushed, failed))
+        return pushed, failed
+
+    push_pending.alters_data = True
+    push_pending.queryset_only = True
+
+    def _push_chunk(self, client, chunk, use_bulk):
+        """return (synced objects, failed count)"""
+        model = self.model
+        key_name = SalesforceClient.DEFAULT_SALESFORCE_KEY_NAME
+        custom_key = model.salesforce_key_name != key_name
+        to_create, to_update, failed = [], [], 0
+        for obj in chunk:
+            try:
+                fields = obj.serialize()
+            except Exception as ex:
+                log.error('[%s#%s.serialize] %s' % (model.__name__, obj.pk, ex))
+                failed += 1
+                continue
+
+            fields.pop(key_name, None)
+            if custom_key:
+                fields[model.salesforce_key_name] = obj.get_salesforce_pk_value()
+                to_update.append((obj, fields))
+            elif obj.salesforce_id:
+                fields[key_name] = obj.salesforce_id
+                to_update.append((obj, fields))
+            else:
+                to_create.append((obj, fields))
+
+        if use_bulk:
+            create, update = client.bulk_create, client.bulk_update
+            upsert = client.bulk_upsert
+        else:
+            create, update = client.collection_create, client.collection_update
+            upsert = client.collection_upsert
+
+        synced = []
+        for items, call in ((to_create, create), (to_update, upsert if custom_key else update)):
+            if not items:
+                continue
+            data = [fields for obj, fields in items]
+            try:
+                results = call(data, model.salesforce_key_name) if call is upsert else call(data)
+            except Exception as ex:
+                log.error('[%s.push_pending] %s records failed >> %s' % (model.__name__, len(items), ex))
+                failed += len(items)
+                continue
+
+            for (obj, fields), result in zip(items, results or []):
+                if not result.get('success'):
+                    log.error('[%s#%s.push_pending] %s' % (model.__name__, obj.pk, result.get('errors')))
+                    failed += 1
+                    continue
+                if not obj.salesforce_id:
+                    obj.salesforce_id = result.get('id')
+                synced.append(obj)
+        return synced, failed
+
+    def refresh(self, chunk_size=200, using=None):
+        """pull the rows changed in salesforce since their sync_at, see SalesforceModel.refresh_by_ids"""
+        salesforce_ids = self.exclude(salesforce_id__isnull=True).exclude(salesforce_id='') \
+            .values_list('salesforce_id', flat=True)
+        return self.model.refresh_by_ids(list(salesforce_ids), chunk_size, using)
+
+    refresh.alters_data = True
+    refresh.queryset_only = True
+
     def sf_exists(self):
         # TODO
         raise NotImplementedError
@@ -53,3 +215,9 @@ class SalesforceManager(models.Manager):
     def get_queryset(self):
         # this is to use your custom queryset methods
         return SalesforceQuerySet(self.model, using=self._db)
+
+    def pending_push(self):
+        return self.get_queryset().pending_push()
+
+    def push_pending(self, *args, **kwargs):
+        return self.get_queryset().push_pending(*args, **kwargs)
@@ -0,0 +1,257 @@
+import contextlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.dispatch import Signal
+
+log = logging.getLogger(__name__)
+
+LIMIT_INFO_HEADER = 'Sforce-Limit-Info'
+
+# sent after every Salesforce call, kwargs: metric (CallMetric)
+salesforce_call = Signal()
+
+_callbacks = []
+_local = threading.local()
+
+
+class CallMetric(object):
+    """one finished call to Salesforce"""
+    __slots__ = ('operation', 'table', 'latency', 'payload_size', 'retries',
+                 'api_usage', 'success', 'error', 'transfer', 'extra')
+
+    def __init__(self, operation, table=None, latency=0.0, payload_size=0,
+                 retries=0, api_usage=None, success=True, error=None,
+                 transfer=None, **extra):
+        self.operation = operation
+        self.table = table
+        self.latency = latency
+        self.payload_size = payload_size
+        self.retries = retries
+        self.api_usage = api_usage  # (used, limit) from `Sforce-Limit-Info`
+        self.success = success
+        self.error = error
+        # (bytes sent, before compression, bytes received, after decompression) on the wire
+        self.transfer = transfer
+        self.extra = extra
+
+    def __repr__(self):
+        return '<CallMetric %s.%s %.3fs>' % (self.table, self.operation,
+                                             self.latency)
+
+
+def register_callback(callback):
+    """register `callback(metric)` to be called after every Salesforce call"""
+    if callback not in _callbacks:
+        _callbacks.append(callback)
+
+
+def unregister_callback(callback):
+    if callback in _callbacks:
+        _callbacks.remove(callback)
+
+
+def parse_limit_info(value):
+    """`api-usage=25/15000` -> (25, 15000)"""
+    if not value:
+        return None
+    for part in value.split(','):
+        name, _, usage = part.strip().partition('=')
+        if name == 'api-usage' and '/' in usage:
+            used, limit = usage.split('/', 1)
+            try:
+                return int(used), int(limit)
+            except ValueError:
+                return None
+    return None
+
+
+def get_payload_size(value):
+    """approximate size in bytes of the data sent to Salesforce"""
+    if value is None:
+        return 0
+    if isinstance(value, bytes):
+        return len(value)
+    if isinstance(value, str):
+        return len(value.encode('utf-8'))
+    if isinstance(value, dict):
+        return sum(get_payload_size(k) + get_payload_size(v)
+                   for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sum(get_payload_size(x) for x in value)
+    if isinstance(value, (int, float)):
+        return len(str(value))
+    return 0  # streams, querysets etc, size unknown
+
+
+def _track_response(response, *args, **kwargs):
+    _local.response_at = time.time()
+    value = response.headers.get(LIMIT_INFO_HEADER)
+    if value:
+        _local.limit_info = value
+
+
+def track_limit_info(salesforce_client):
+    """hook the requests session of a simple_salesforce client to catch the api usage header"""
+    session = getattr(salesforce_client, 'session', None)
+    if session is None or getattr(session, '_sf_limit_tracked', False):
+        return
+    session.hooks.setdefault('response', [])
+    if not isinstance(session.hooks['response'], list):
+        session.hooks['response'] = [session.hooks['response']]
+    session.hooks['response'].append(_track_response)
+    session._sf_limit_tracked = True
+
+
+def reset_limit_info():
+    _local.limit_info = None
+    _local.response_at = None
+    reset_transfer()
+
+
+def reset_transfer():
+    _local.transfer = None
+
+
+def track_transfer(sent, uncompressed, received, decoded):
+    """add the bytes of a http request to the current call of this thread"""
+    transfer = getattr(_local, 'transfer', None) or (0, 0, 0, 0)
+    _local.transfer = (transfer[0] + sent, transfer[1] + uncompressed,
+                       transfer[2] + received, transfer[3] + decoded)
+
+
+def get_transfer():
+    """(sent, uncompressed, received, decoded) bytes since the last reset, None without a tracked request"""
+    return getattr(_local, 'transfer', None)
+
+
+def get_response_at():
+    """time the last response of this thread arrived, None for offline calls"""
+    return getattr(_local, 'response_at', None)
+
+
+def get_limit_info():
+    """api usage (used, limit) of the last response received in this thread"""
+    return parse_limit_info(getattr(_local, 'limit_info', None))
+
+
+class MetricsCollector(object):
+    """aggregate call metrics of a sync run"""
+
+    def __init__(self, name=None):
+        self.name = name
+        self.started_at = time.time()
+        self.finished_at = None
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        self.latency = 0.0
+        self.payload_size = 0
+        self.api_usage = None
+        self.transfer = [0, 0, 0, 0]
+        self.operations = OrderedDict()
+        self.lock = threading.Lock()  # pipelined pulls report from a fetcher thread too
+
+    def add(self, metric):
+        with self.lock:
+            self._add(metric)
+
+    def _add(self, metric):
+        self.calls += 1
+        self.errors += 0 if metric.success else 1
+        self.retries += metric.retries
+        self.latency += metric.latency
+        self.payload_size += metric.payload_size
+        if metric.api_usage:
+            self.api_usage = metric.api_usage
+        if metric.transfer:
+            self.transfer = [x + y for x, y in zip(self.transfer, metric.transfer)]
+
+        key = '%s.%s' % (metric.table, metric.operation) if metric.table else metric.operation
+        stat = self.operations.setdefault(key, {'calls': 0, 'errors': 0, 'latency': 0.0})
+        stat['calls'] += 1
+        stat['errors'] += 0 if metric.success else 1
+        stat['latency'] += metric.latency
+
+    def finish(self):
+        self.finished_at = time.time()
+
+    @property
+    def duration(self):
+        return (self.finished_at or time.time()) - self.started_at
+
+    def as_dict(self):
+        return {
+            'name': self.name,
+            'duration': self.duration,
+            'calls': self.calls,
+            'errors': self.errors,
+            'retries': self.retries,
+            'latency': self.latency,
+            'payload_size': self.payload_size,
+            'api_usage': self.api_usage,
+            'bytes_sent': self.transfer[0],
+            'bytes_sent_uncompressed': self.transfer[1],
+            'bytes_received': self.transfer[2],
+            'bytes_received_decoded': self.transfer[3],
+            'operations': dict(self.operations),
+        }
+
+    def summary(self):
+        usage = '%s/%s' % self.api_usage if self.api_usage else 'unknown'
+        return '[%s] %s calls, %s errors, %s retries, %.3fs in Salesforce, %s bytes sent, api usage %s, ' \
+               'wire %s/%s bytes sent, %s/%s bytes received' % (
+                   self.name, self.calls, self.errors, self.retries, self.latency,
+                   self.payload_size, usage, self.transfer[0], self.transfer[1], self.transfer[2], self.transfer[3])
+
+
+class collect(object):
+    """collect metrics of all calls made by current thread within the block
+
+        with metrics.collect('Product.pull_all') as stats:
+            Product.pull_all()
+        print(stats.summary())
+    """
+
+    def __init__(self, name=None):
+        self.collector = MetricsCollector(name)
+
+    def __enter__(self):
+        if not hasattr(_local, 'collectors'):
+            _local.collectors = []
+        _local.collectors.append(self.collector)
+        return self.collector
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        _local.collectors.remove(self.collector)
+        self.collector.finish()
+
+
+def get_collectors():
+    return list(getattr(_local, 'collectors', ()))
+
+
+@contextlib.contextmanager
+def attach(collectors):
+    """report calls of this thread to collectors of another thread"""
+    previous = getattr(_local, 'collectors', [])
+    _local.collectors = previous + list(collectors)
+    try:
+        yield
+    finally:
+        _local.collectors = previous
+
+
+def record(metric, sender=None):
+    """dispatch a finished call to signal receivers, callbacks and active collectors"""
+    for collector in getattr(_local, 'collectors', ()):
+        collector.add(metric)
+
+    salesforce_call.send(sender=sender, metric=metric)
+    for callback in list(_callbacks):
+        try:
+            callback(metric)
+        except Exception as ex:
+            log.error('[metrics] callback %s failed >> %s' % (callback, ex))
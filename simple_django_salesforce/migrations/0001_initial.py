@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StreamReplayId',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('channel', models.CharField(max_length=255, unique=True, verbose_name='channel')),
+                ('replay_id', models.BigIntegerField(verbose_name='replay id')),
+                ('update_at', models.DateTimeField(auto_now=True, verbose_name='last update date')),
+            ],
+        ),
+    ]
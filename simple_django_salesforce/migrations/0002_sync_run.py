@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('simple_django_salesforce', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncRun',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(db_index=True, max_length=255, verbose_name='model')),
+                ('soql', models.TextField(verbose_name='soql')),
+                ('status', models.CharField(choices=[('running', 'running'), ('done', 'done'), ('failed', 'failed')], default='running', max_length=20, verbose_name='status')),
+                ('next_records_url', models.CharField(blank=True, max_length=255, null=True, verbose_name='next records url')),
+                ('last_id', models.CharField(blank=True, max_length=18, null=True, verbose_name='last processed id')),
+                ('total_size', models.IntegerField(default=0, verbose_name='total size')),
+                ('processed', models.IntegerField(default=0, verbose_name='processed')),
+                ('created', models.IntegerField(default=0, verbose_name='created')),
+                ('updated', models.IntegerField(default=0, verbose_name='updated')),
+                ('deleted', models.IntegerField(default=0, verbose_name='deleted')),
+                ('error', models.TextField(blank=True, verbose_name='error')),
+                ('start_at', models.DateTimeField(auto_now_add=True, verbose_name='start date')),
+                ('update_at', models.DateTimeField(auto_now=True, verbose_name='last update date')),
+                ('finish_at', models.DateTimeField(blank=True, null=True, verbose_name='finish date')),
+            ],
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('simple_django_salesforce', '0002_sync_run'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PushFailure',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=255, verbose_name='model')),
+                ('object_pk', models.CharField(blank=True, max_length=255, verbose_name='object pk')),
+                ('operation', models.CharField(choices=[('push', 'push'), ('delete', 'delete'), ('bulk_update', 'bulk update'), ('bulk_delete', 'bulk delete'), ('bulk_hard_delete', 'bulk hard delete')], max_length=20, verbose_name='operation')),
+                ('payload', models.TextField(blank=True, verbose_name='payload')),
+                ('error', models.TextField(blank=True, verbose_name='error')),
+                ('attempts', models.IntegerField(default=1, verbose_name='attempts')),
+                ('create_at', models.DateTimeField(auto_now_add=True, verbose_name='create date')),
+                ('update_at', models.DateTimeField(auto_now=True, verbose_name='last update date')),
+            ],
+        ),
+    ]
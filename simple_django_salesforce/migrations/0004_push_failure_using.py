@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('simple_django_salesforce', '0003_push_failure'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pushfailure',
+            name='using',
+            field=models.CharField(default='default', max_length=100, verbose_name='salesforce connection'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('simple_django_salesforce', '0004_push_failure_using'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='pushfailure',
+            name='operation',
+            field=models.CharField(choices=[('push', 'push'), ('delete', 'delete'), ('bulk_update', 'bulk update'), ('bulk_delete', 'bulk delete'), ('bulk_hard_delete', 'bulk hard delete'), ('pull', 'pull')], max_length=20, verbose_name='operation'),
+        ),
+    ]
@@ -1,16 +1,21 @@
+import functools
 import logging
+from datetime import timedelta
+
 from django.core.exceptions import ImproperlyConfigured, SuspiciousOperation
 from django.db import models, transaction
 from django.conf import settings
 from django.utils import timezone
-from django.utils.translation import ugettext_lazy as _
+from django.utils.dateparse import parse_datetime
+from django.utils.http import http_date
+from django.utils.translation import gettext_lazy as _
 
 from simple_salesforce.exceptions import SalesforceError, \
     SalesforceResourceNotFound
-from .client import SalesforceClient
-from .chatter import chatter
+from .client import SalesforceClient, is_not_modified
+from .connections import DEFAULT_CONNECTION, connections
 from .manager import SalesforceManager
-from . import helpers
+from . import decoder, helpers, metrics, parallel, pipeline, read_cache, tracing
 
 log = logging.getLogger(__name__)
 log.setLevel(logging.INFO)
@@ -37,16 +42,25 @@ class SalesforceModel(models.Model):
     salesforce_read_only = ()
     pull_after_create = False
     fields_map = dict()
+    salesforce_parents = dict()  # local fk name -> parent relationship name, eg. {'account': 'Account'}
+    salesforce_children = dict()  # child relationship name -> 'app_label.Model', eg. {'Contacts': 'crm.Contact'}
+    salesforce_using = None  # alias in settings.SALESFORCE_CONNECTIONS, None for `default`
     objects = SalesforceManager()
 
     class Meta:
         abstract = True
 
     @classmethod
-    def get_salesforce_client(cls):
+    def get_salesforce_using(cls, using=None):
+        """connection alias: `using`, else the current connections.using() block, else salesforce_using"""
+        return using or connections.get_alias(cls.salesforce_using)
+
+    @classmethod
+    def get_salesforce_client(cls, using=None):
         """get salesforce client for model"""
         return SalesforceClient(salesforce_table_name=cls.salesforce_table_name,
-                                salesforce_key_name=cls.salesforce_key_name)
+                                salesforce_key_name=cls.salesforce_key_name,
+                                using=cls.get_salesforce_using(using))
 
     def get_salesforce_pk_value(self):
         if self.salesforce_django_key_name == SalesforceClient.DEFAULT_KEY_FIELD_NAME_IN_DJANGO:
@@ -137,21 +151,22 @@ class SalesforceModel(models.Model):
                     '.salesforce_id'):
                 if not value is None:
                     fk_name = local_field.split('.')[:1][0]
-                    fk_model = self._meta.get_field(fk_name).rel.to
-                    objects = fk_model.objects.filter(salesforce_id=value).order_by('id')
-                    if objects.count() > 1:
-                        log.error(
-                            '[%s.deserialize] multiple object have same salesforce_id `%s`' % (
-                                fk_model.__name__, value))
-                        # todo not raise here, do we need report to master?
-                    fk_obj = objects.first()
-                    if fk_obj is None:
-                        fk_obj = fk_model(
-                            salesforce_id=value)  # pull the fk object from salesforce
-                        try:
-                            fk_obj.pull()
-                        except SalesforceError:
-                            fk_obj = None
+                    fk_model = self._meta.get_field(fk_name).remote_field.model
+                    with tracing.span('fk_resolve', table=fk_model.__name__, count=1):
+                        objects = fk_model.objects.filter(salesforce_id=value).order_by('id')
+                        if objects.count() > 1:
+                            log.error(
+                                '[%s.deserialize] multiple object have same salesforce_id `%s`' % (
+                                    fk_model.__name__, value))
+                            # todo not raise here, do we need report to master?
+                        fk_obj = objects.first()
+                        if fk_obj is None:
+                            fk_obj = fk_model(
+                                salesforce_id=value)  # pull the fk object from salesforce
+                            try:
+                                fk_obj.pull()
+                            except SalesforceError:
+                                fk_obj = None
 
                     if fk_obj:
                         setattr(self, '%s_id' % fk_name, fk_obj.id)
@@ -177,9 +192,20 @@ class SalesforceModel(models.Model):
 
             self.field_deserialize(value, local_field, field_type)
 
-    def push(self, update_fields=None):
-        if settings.SALESFORCE_OFFLINE:
-            return self.serialize()
+    @tracing.profiled
+    def push(self, update_fields=None, using=None):
+        with connections.using(using), metrics.collect('%s.push' % self.__class__.__name__) as stats, \
+                tracing.span('push', table=self.__class__.__name__, count=1):
+            result = self._push(update_fields)
+        log.debug(stats.summary())
+        return result
+
+    def push_graph(self, related=(), using=None):
+        """push this row, `related` rows and their parents without salesforce id in one composite graph request"""
+        from .graph import push_graph
+        return push_graph([self] + list(related), using=using)
+
+    def _push(self, update_fields=None):
 
         # get salesforce client, update_fields for salesforce field name
         if not self.salesforce_table_name:
@@ -189,7 +215,8 @@ class SalesforceModel(models.Model):
         salesforce_client = self.get_salesforce_client()
 
         try:
-            fields = self.serialize()
+            with tracing.span('serialize', table=self.__class__.__name__, count=1):
+                fields = self.serialize()
         except Exception as ex:
             log.error('[%s.serialize] id=%s, %s' % (
                 self.__class__.__name__, self.id, ex))
@@ -218,7 +245,8 @@ class SalesforceModel(models.Model):
                 # Save Salesforce ID back into local DB
                 self.salesforce_id = result.get('id')
                 self.sync_at = timezone.now()
-                self.save(update_fields=['salesforce_id', 'sync_at'])
+                with tracing.span('sync_at', table=self.__class__.__name__, count=1):
+                    self.save(update_fields=['salesforce_id', 'sync_at'])
                 if self.pull_after_create:
                     self.pull()
                 log.info('Salesforce data %s[%s]-%s[%s] created' % (
@@ -230,22 +258,36 @@ class SalesforceModel(models.Model):
 
         return result
 
-    def pull(self):
-        """pull a local existed obj"""
-        if settings.SALESFORCE_OFFLINE:
-            return self
+    def get_modified_since(self):
+        """sync_at minus `settings.SALESFORCE_PULL_CLOCK_SKEW` seconds for rows without local changes,
+        remote changes after it are pulled, None to pull anyway"""
+        if not self.is_sync:
+            return None  # local changes are overwritten by pull
+        return self.sync_at - timedelta(seconds=getattr(settings, 'SALESFORCE_PULL_CLOCK_SKEW', 60))
 
+    def pull(self, using=None, force=False):
+        """pull a local existed obj, a synced row unchanged in salesforce is left untouched unless force"""
         if not hasattr(self, 'fields_map'):
             raise ImproperlyConfigured(
                 'Set fields_map for salesforce model %s' % self.__class__.__name__)
 
-        if not self.salesforce_django_key_name == SalesforceClient.DEFAULT_KEY_FIELD_NAME_IN_DJANGO:
-            salesforce_obj = self.get_salesforce_client().get_by_custom_id(
-                self.salesforce_django_key_name,
-                self.get_salesforce_pk_value())
-        else:
-            salesforce_obj = self.get_salesforce_client().get(
-                self.get_salesforce_pk_value())
+        pull_fields = self.get_pull_attnames()
+        values = self.get_pull_values(pull_fields)
+        modified_since = None if force else self.get_modified_since()
+        headers = {'If-Modified-Since': http_date(modified_since.timestamp())} if modified_since else None
+        try:
+            if not self.salesforce_django_key_name == SalesforceClient.DEFAULT_KEY_FIELD_NAME_IN_DJANGO:
+                salesforce_obj = self.get_salesforce_client(using).get_by_custom_id(
+                    self.salesforce_django_key_name,
+                    self.get_salesforce_pk_value(), headers=headers, use_cache=not force)
+            else:
+                salesforce_obj = self.get_salesforce_client(using).get(
+                    self.get_salesforce_pk_value(), headers=headers, use_cache=not force)
+        except SalesforceError as ex:
+            if not is_not_modified(ex):
+                raise
+            log.debug('[%s#%s.pull] not modified since %s' % (self.__class__.__name__, self.id, modified_since))
+            return self
 
         if not salesforce_obj:
             # todo how to deal with remote deleting
@@ -258,46 +300,77 @@ class SalesforceModel(models.Model):
                 self.__class__.__name__, self.id, ex, salesforce_obj))
             raise ex
 
-        self.save()
+        if self.pk is None:
+            self.save()
+        else:
+            changed_fields = self.get_changed_fields(pull_fields, values)
+            if changed_fields:
+                self.save(update_fields=changed_fields + ['modify_at'])
         # make sync_at later than modify_at, so is_sync return True
         self.sync_at = timezone.now()
         self.save(update_fields=['sync_at'])
         return self
 
+    def get_salesforce_update_fields(self, update_fields):
+        """salesforce field names of local update_fields, None for all fields"""
+        if update_fields is None:
+            return None
+        update_fields_for_sf = []
+        for field_name in update_fields:
+            if field_name in self.fields_map:
+                update_fields_for_sf.append(self.fields_map[field_name])
+
+            # foreignkey's property
+            fk_name = '%s.' % field_name
+            for local_name, sf_name in self.fields_map.items():
+                if fk_name in local_name:
+                    update_fields_for_sf.append(sf_name)
+        return update_fields_for_sf
+
     def save_and_push(self, *args, **kwargs):
+        """on_commit: push after the transaction committed, default settings.SALESFORCE_PUSH_ON_COMMIT
+            using: salesforce connection alias
+        """
         # update_fields for local field name
-        with transaction.atomic():
-            self.save(*args, **kwargs)
+        on_commit = helpers.is_push_on_commit(kwargs.pop('on_commit', None))
+        using = self.get_salesforce_using(kwargs.pop('using', None))
+        update_fields_for_sf = self.get_salesforce_update_fields(kwargs.get('update_fields', None))
 
-            update_fields = kwargs.get('update_fields', None)
-            if update_fields is None:
-                # no update_fields provided, push all fields as default
-                result = self.push()
-            else:
-                update_fields_for_sf = []
-                if update_fields:
-                    for field_name in update_fields:
-                        if field_name in self.fields_map:
-                            update_fields_for_sf.append(self.fields_map[field_name])
-
-                        # foreignkey's property
-                        fk_name = '%s.' % field_name
-                        for local_name, sf_name in self.fields_map.items():
-                            if fk_name in local_name:
-                                update_fields_for_sf.append(sf_name)
+        if on_commit:
+            # no db transaction or row lock held during the salesforce call
+            self.save(*args, **kwargs)
+            helpers.push_on_commit(type(self), 'push', functools.partial(self.push, update_fields=update_fields_for_sf,
+                                                                         using=using),
+                                   payload=update_fields_for_sf, object_pk=self.pk, using=using)
+            return None
 
-                result = self.push(update_fields=update_fields_for_sf)
+        with transaction.atomic():
+            self.save(*args, **kwargs)
+            # no update_fields provided, push all fields as default
+            result = self.push(update_fields=update_fields_for_sf, using=using)
         return result
 
     def delete_and_push(self, *args, **kwargs):
+        on_commit = helpers.is_push_on_commit(kwargs.pop('on_commit', None))
+        using = kwargs.pop('using', None)
         salesforce_key = self.get_salesforce_pk_value()
+
+        if on_commit:
+            pk = self.pk
+            self.delete(*args, **kwargs)
+            if salesforce_key:
+                client = self.get_salesforce_client(using)
+                helpers.push_on_commit(type(self), 'delete', functools.partial(client.delete, salesforce_key),
+                                       payload=salesforce_key, object_pk=pk, using=using)
+            return
+
         with transaction.atomic():
             self.delete(*args, **kwargs)
-            self.get_salesforce_client().delete(salesforce_key)
+            self.get_salesforce_client(using).delete(salesforce_key)
 
     @classmethod
-    def get_pull_all_sql(cls):
-        """ sql to get whole table """
+    def get_pull_fields(cls):
+        """remote fields of fields_map, always with Id and IsDeleted"""
         remote_update_fields = [x for x in cls.fields_map.values()]
         # always need salesforce id to identify exist or not
         if SalesforceClient.DEFAULT_SALESFORCE_KEY_NAME not in remote_update_fields:
@@ -305,22 +378,115 @@ class SalesforceModel(models.Model):
                 SalesforceClient.DEFAULT_SALESFORCE_KEY_NAME)
         remote_update_fields.append(
             'IsDeleted')  # fake delete field, builtin on all salesforce table
+        return remote_update_fields
+
+    @classmethod
+    def get_pull_all_sql(cls):
+        """ sql to get whole table, with parent relationship fields and child subqueries """
+        remote_update_fields = cls.get_pull_fields()
+        for fk_name, relationship in cls.salesforce_parents.items():
+            parent_fields = cls.get_parent_model(fk_name).get_pull_fields()[:-1]
+            remote_update_fields += ['%s.%s' % (relationship, x) for x in parent_fields]
+        for relationship, child_model in cls.get_child_models().items():
+            child_fields = child_model.get_pull_fields()[:-1]
+            remote_update_fields.append('(SELECT %s FROM %s)' % (','.join(child_fields), relationship))
         sql = 'SELECT %s FROM %s' % (
             ','.join(remote_update_fields), cls.salesforce_table_name)
         return sql
 
     @classmethod
-    def pull_all(cls, sql=None, update_fields=None, create_new=True):
+    def get_page_columns(cls):
+        """decoder.Columns read by pull_all() from query pages, None to keep whole records
+        when the model overrides deserialize() and may read columns not in fields_map"""
+        if cls.deserialize is not SalesforceModel.deserialize:
+            return None
+        return decoder.Columns([SalesforceClient.DEFAULT_SALESFORCE_KEY_NAME, 'IsDeleted'] +
+                               list(cls.fields_map.values()) + list(cls.salesforce_parents.values()) +
+                               list(cls.salesforce_children.keys()))
+
+    @classmethod
+    def get_parent_model(cls, fk_name):
+        return cls._meta.get_field(fk_name).remote_field.model
+
+    @classmethod
+    def get_child_models(cls):
+        from django.apps import apps
+
+        return dict((name, apps.get_model(model) if isinstance(model, str) else model)
+                    for name, model in cls.salesforce_children.items())
+
+    @classmethod
+    def pull_parents(cls, records):
+        """upsert parents embedded by relationship fields, so deserialize finds them without pull()"""
+        for fk_name, relationship in cls.salesforce_parents.items():
+            parents = {}
+            for obj_data in records:
+                parent = obj_data.get(relationship)
+                if parent:
+                    parents[parent[SalesforceClient.DEFAULT_SALESFORCE_KEY_NAME]] = parent
+            if parents:
+                cls.get_parent_model(fk_name).apply_remote_changes(list(parents.values()))
+
+    @classmethod
+    def pull_children(cls, records):
+        """upsert children of subqueries, after the records themselves are saved"""
+        salesforce_client = None
+        for relationship, child_model in cls.get_child_models().items():
+            children = []
+            for obj_data in records:
+                result = obj_data.get(relationship)
+                while result:
+                    children += result['records']
+                    if result.get('done', True):
+                        break
+                    # more than one page of children
+                    salesforce_client = salesforce_client or cls.get_salesforce_client()
+                    result = salesforce_client.query_more(result['nextRecordsUrl'].rsplit('/', 1)[-1])
+            if children:
+                child_model.apply_remote_changes(children)
+
+    @classmethod
+    @tracing.profiled
+    def pull_all(cls, sql=None, update_fields=None, create_new=True,
+                 return_stats=False, checkpoint=False, resume=False, using=None, pipelined=None, workers=None):
         """ update_fields:local filed name need to be updated
             create_new: whether create new if not existed in local
+            return_stats: append the MetricsCollector of this run to the result
+            checkpoint: record the run in SyncRun, committed page by page
+            resume: continue the last unfinished run of the same sql, implies checkpoint
+            using: salesforce connection alias, parents and children are pulled from the same org
+            pipelined: fetch the next pages in a thread while the current one is written, committed page by page,
+                default settings.SALESFORCE_PULL_PIPELINED, not used with checkpoint
+            workers: processes deserializing pages while they are fetched and written, implies pipelined,
+                default settings.SALESFORCE_PULL_WORKERS, not used with checkpoint
         """
         if not isinstance(cls, type):
             raise ImproperlyConfigured(
                 'pull_all() can only be called from class not object.')
 
-        if settings.SALESFORCE_OFFLINE:
-            return [x for x in cls.objects.all()], [], []
+        with connections.using(using), metrics.collect('%s.pull_all' % cls.__name__) as stats, \
+                tracing.span('pull_all', table=cls.__name__) as stage:
+            if pipelined is None:
+                pipelined = getattr(settings, 'SALESFORCE_PULL_PIPELINED', False)
+            if workers is None:
+                workers = getattr(settings, 'SALESFORCE_PULL_WORKERS', None)
+            if checkpoint or resume:
+                result = cls._pull_all_checkpointed(sql, update_fields, create_new, resume)
+            elif workers:
+                result = cls._pull_all_parallel(sql, update_fields, create_new, workers)
+            elif pipelined:
+                result = cls._pull_all_pipelined(sql, update_fields, create_new)
+            else:
+                result = cls._pull_all(sql, update_fields, create_new)
+            stage.set(count=len(result[0]) + len(result[1]))
+        log.info(stats.summary())
 
+        if return_stats:
+            return result + (stats,)
+        return result
+
+    @classmethod
+    def _pull_all(cls, sql=None, update_fields=None, create_new=True):
         existed_items = []
         new_items = []
         deleted_items = []
@@ -328,15 +494,109 @@ class SalesforceModel(models.Model):
         should_delete = True if not sql else False
         sql = sql if sql else cls.get_pull_all_sql()  # customized sql
         salesforce_client = cls.get_salesforce_client()
-        data = salesforce_client.query_all(sql)
+        columns = cls.get_page_columns()
+        if columns is None:
+            data = salesforce_client.query_all(sql)
+        else:
+            data = salesforce_client.query_all_rows(sql, columns)
         if data['totalSize'] and data['done']:
-            for obj_data in data['records']:
-                if obj_data['IsDeleted']:
-                    # skip fake deleted item from salesforce
-                    continue
+            existed_items, new_items = cls._pull_records(data['records'], update_fields, create_new)
+
+            # clean stale data if pull whole table
+            if should_delete:
+                deleted_items = cls._delete_stale_items(existed_items + new_items)
+
+        return existed_items, new_items, deleted_items
+
+    @classmethod
+    def _pull_all_pipelined(cls, sql=None, update_fields=None, create_new=True):
+        """write each page in its own transaction while a thread prefetches the next pages,
+        at most settings.SALESFORCE_PULL_PREFETCH pages wait in memory"""
+        existed_items, new_items, deleted_items = [], [], []
+        should_delete = True if not sql else False
+        sql = sql if sql else cls.get_pull_all_sql()
+        prefetch = getattr(settings, 'SALESFORCE_PULL_PREFETCH', pipeline.DEFAULT_PREFETCH)
+
+        total_size = 0
+        for data in pipeline.PagePrefetcher(cls.get_salesforce_client(), sql, prefetch, cls.get_page_columns()):
+            total_size = total_size or data['totalSize']
+            with transaction.atomic():
+                existed, new = cls._pull_records(data['records'], update_fields, create_new)
+            existed_items += existed
+            new_items += new
+
+        # clean stale data if pull whole table
+        if should_delete and total_size:
+            deleted_items = cls._delete_stale_items(existed_items + new_items)
+        return existed_items, new_items, deleted_items
+
+    @classmethod
+    def _pull_all_parallel(cls, sql=None, update_fields=None, create_new=True, workers=1):
+        """_pull_all_pipelined() with pages deserialized by `workers` processes, see parallel.py"""
+        plan = parallel.get_plan(cls)
+        if plan is None:
+            log.info('[%s.pull_all] custom deserialize, pulled without workers' % cls.__name__)
+            return cls._pull_all_pipelined(sql, update_fields, create_new)
+
+        existed_items, new_items, deleted_items = [], [], []
+        should_delete = True if not sql else False
+        sql = sql if sql else cls.get_pull_all_sql()
+        prefetch = getattr(settings, 'SALESFORCE_PULL_PREFETCH', pipeline.DEFAULT_PREFETCH)
+
+        total_size = 0
+        pages = pipeline.PagePrefetcher(cls.get_salesforce_client(), sql, prefetch, cls.get_page_columns())
+        for data, records, decoded in parallel.iter_decoded(pages, plan, workers):
+            total_size = total_size or data['totalSize']
+            deserialize = parallel.Deserializer(cls, plan, records, decoded)
+            with transaction.atomic():
+                existed, new = cls._pull_records(records, update_fields, create_new, deserialize)
+            existed_items += existed
+            new_items += new
+
+        # clean stale data if pull whole table
+        if should_delete and total_size:
+            deleted_items = cls._delete_stale_items(existed_items + new_items)
+        return existed_items, new_items, deleted_items
+
+    @classmethod
+    def _delete_stale_items(cls, pulled_items):
+        """delete rows not in the pulled items, return them"""
+        delete_items = cls.objects.exclude(id__in=[x.id for x in pulled_items])
+        with tracing.span('db_delete', table=cls.__name__) as stage:
+            deleted_items = [x for x in delete_items]
+            delete_items.delete()
+            stage.set(count=len(deleted_items))
+        return deleted_items
+
+    @classmethod
+    def _pull_records(cls, records, update_fields=None, create_new=True, deserialize=None):
+        """save a page of remote records, return (existed items, new items),
+        `deserialize(instance, obj_data)` replaces instance.deserialize(obj_data)"""
+        records = [x for x in records if not x['IsDeleted']]
+        cls.pull_parents(records)
+        if cls.has_unique_salesforce_id() and helpers.get_upsert_options(cls, 'salesforce_id') is not None:
+            existed_items, new_items = cls._upsert_records(records, update_fields, create_new, deserialize)
+        else:
+            existed_items, new_items = cls._save_records(records, update_fields, create_new, deserialize)
+        cls.pull_children(records)
+        return existed_items, new_items
+
+    @classmethod
+    def _save_records(cls, records, update_fields=None, create_new=True, deserialize=None):
+        """read and save row by row, only changed fields are written, sync_at of the page in one update"""
+        deserialize = deserialize or cls.deserialize
+        pull_fields = cls.get_pull_attnames()
+        existed_items = []
+        new_items = []
+        synced = []
+        for obj_data in records:
+            if obj_data['IsDeleted']:
+                # skip fake deleted item from salesforce
+                continue
 
-                salesforce_id = obj_data[
-                    SalesforceClient.DEFAULT_SALESFORCE_KEY_NAME]
+            salesforce_id = obj_data[
+                SalesforceClient.DEFAULT_SALESFORCE_KEY_NAME]
+            with tracing.span('db_read', table=cls.__name__, count=1):
                 objects = cls.objects.filter(salesforce_id=salesforce_id)
                 if objects.count() > 1:
                     log.error(
@@ -344,53 +604,361 @@ class SalesforceModel(models.Model):
                             cls.__name__, salesforce_id))
                     # todo not raise here, do we need report to master?
                 instance = objects.first()
-                is_new = not bool(instance)
-                if not instance:
-                    instance = cls(salesforce_id=salesforce_id)
+            is_new = not bool(instance)
+            if not instance:
+                instance = cls(salesforce_id=salesforce_id)
+            values = None if is_new else instance.get_pull_values(pull_fields)
+
+            # check all fields if creating new else only check update fields
+            try:
+                with tracing.span('deserialize', table=cls.__name__, count=1):
+                    deserialize(instance, obj_data)
+            except Exception as ex:
+                log.error('[%s#%s.deserialize] %s, data=%s' % (
+                    cls.__name__, instance.id, ex, obj_data))
+                continue
+
+            if not is_new:
+                changed_fields = instance.get_changed_fields(pull_fields, values)
+                if update_fields:
+                    fields = [x for x in update_fields if x in changed_fields or x not in dict(pull_fields)]
+                    if fields:
+                        with tracing.span('db_write', table=cls.__name__, count=1):
+                            instance.save(update_fields=fields)
+                else:
+                    try:
+                        # savepoint, a failed row must not break the transaction of the page
+                        with transaction.atomic():
+                            if changed_fields:
+                                with tracing.span('db_write', table=cls.__name__, count=1):
+                                    instance.save(update_fields=changed_fields + ['modify_at'])
+                        synced.append(instance)
+                    except Exception as ex:
+                        log.error('[%s#.pull_all.save] %s, data=%s' % (
+                            cls.__name__, ex, obj_data))
+                existed_items.append(instance)
+            else:
+                if create_new:
+                    # create_new, update_fields not applied
+                    try:
+                        with transaction.atomic():
+                            with tracing.span('db_write', table=cls.__name__, count=1):
+                                instance.save()
+                        synced.append(instance)
+                    except Exception as ex:
+                        log.error('[%s#.pull_all.save] %s, data=%s' % (cls.__name__, ex, obj_data))
+                # new instances may need further FK field assignment before save, let subclass handle it
+                new_items.append(instance)
+        cls._mark_synced(synced)
+        return existed_items, new_items
 
-                # check all fields if creating new else only check update fields
+    @classmethod
+    def _mark_synced(cls, instances, key='pk'):
+        """advance sync_at of a page with one update, after its writes so sync_at >= modify_at"""
+        if not instances:
+            return
+        now = timezone.now()
+        with tracing.span('sync_at', table=cls.__name__, count=len(instances)):
+            cls.objects.filter(**{'%s__in' % key: [getattr(x, key) for x in instances]}).update(sync_at=now)
+        for instance in instances:
+            instance.sync_at = now
+
+    @classmethod
+    def has_unique_salesforce_id(cls):
+        return cls._meta.get_field('salesforce_id').unique
+
+    @classmethod
+    def _upsert_records(cls, records, update_fields=None, create_new=True, deserialize=None):
+        """write the page with one INSERT ... ON CONFLICT (salesforce_id) DO UPDATE, existing rows are read
+        by the indexed salesforce ids and only the changed ones, with the changed columns, are written"""
+        deserialize = deserialize or cls.deserialize
+        key_name = SalesforceClient.DEFAULT_SALESFORCE_KEY_NAME
+        pull_fields = cls.get_pull_attnames()
+        with tracing.span('db_read', table=cls.__name__, count=len(records)):
+            existing = dict((x[0], x[1:]) for x in cls.objects.filter(
+                salesforce_id__in=[x[key_name] for x in records]).values_list(
+                'salesforce_id', 'pk', *[attname for name, attname in pull_fields]))
+
+        fields = [x for x in (update_fields or cls.get_pull_update_fields()) if x != 'salesforce_id']
+        existed_items, new_items, changed_items, unchanged_items, changed_fields = [], [], [], [], set()
+        with tracing.span('deserialize', table=cls.__name__, count=len(records)):
+            for obj_data in records:
+                instance = cls(salesforce_id=obj_data[key_name])
+                if instance.salesforce_id in existing:
+                    # fields absent from the record or unresolved fks keep their stored values, not defaults
+                    instance.set_pull_values(pull_fields, existing[instance.salesforce_id][1:])
                 try:
-                    instance.deserialize(obj_data)
+                    deserialize(instance, obj_data)
                 except Exception as ex:
-                    log.error('[%s#%s.deserialize] %s, data=%s' % (
-                        cls.__name__, instance.id, ex, obj_data))
+                    log.error('[%s#.deserialize] %s, data=%s' % (cls.__name__, ex, obj_data))
                     continue
-
-                if not is_new:
-                    if update_fields:
-                        instance.save(update_fields=update_fields)
-                    else:
-                        try:
-                            instance.save()
-                            # make sync_at later than modify_at, so is_sync return True
-                            instance.sync_at = timezone.now()
-                            instance.save(update_fields=['sync_at'])
-                        except Exception as ex:
-                            log.error('[%s#.pull_all.save] %s, data=%s' % (
-                                cls.__name__, ex, obj_data))
+                if instance.salesforce_id in existing:
                     existed_items.append(instance)
+                    changed = set(instance.get_changed_fields(pull_fields, existing[instance.salesforce_id][1:]))
+                    if changed.intersection(fields):
+                        changed_items.append(instance)
+                        changed_fields.update(changed)
+                    else:
+                        unchanged_items.append(instance)
                 else:
-                    if create_new:
-                        # create_new, update_fields not applied
-                        try:
-                            instance.save()
-                            instance.sync_at = timezone.now()
-                            instance.save(update_fields=['sync_at'])
-                        except Exception as ex:
-                            log.error('[%s#.pull_all.save] %s, data=%s' % (cls.__name__, ex, obj_data))
-                    # new instances may need further FK field assignment before save, let subclass handle it
                     new_items.append(instance)
 
-            # clean stale data if pull whole table
-            if should_delete:
-                existing_ids = [x.id for x in existed_items]
-                existing_ids += [x.id for x in new_items]
-                delete_items = cls.objects.exclude(id__in=existing_ids)
-                deleted_items = [x for x in delete_items]
-                delete_items.delete()
+        items = changed_items + new_items if create_new else changed_items
+        # rows partially updated by update_fields are not synced
+        synced = (new_items if create_new else []) if update_fields else items + unchanged_items
+        with transaction.atomic():
+            if items:
+                with tracing.span('db_write', table=cls.__name__, count=len(items)):
+                    cls.objects.bulk_create(items, update_fields=[x for x in fields if x in changed_fields] +
+                                            ['modify_at'], **helpers.get_upsert_options(cls, 'salesforce_id'))
+            cls._mark_synced(synced, 'salesforce_id')
+        # primary keys are not returned by every database
+        for instance in existed_items:
+            instance.pk = existing[instance.salesforce_id][0]
+        missing = [x.salesforce_id for x in items if x.pk is None]
+        if missing:
+            pks = dict(cls.objects.filter(salesforce_id__in=missing).values_list('salesforce_id', 'pk'))
+            for instance in new_items:
+                if instance.pk is None:
+                    instance.pk = pks.get(instance.salesforce_id)
+        return existed_items, new_items
+
+    @classmethod
+    def get_resume_sql(cls, last_id):
+        """continue the default ordered sql after the last committed record"""
+        return "%s WHERE %s > '%s' ORDER BY %s" % (
+            cls.get_pull_all_sql(), SalesforceClient.DEFAULT_SALESFORCE_KEY_NAME, last_id,
+            SalesforceClient.DEFAULT_SALESFORCE_KEY_NAME)
+
+    @classmethod
+    def _pull_all_checkpointed(cls, sql=None, update_fields=None, create_new=True, resume=False):
+        """pull page by page, each page and its SyncRun checkpoint committed in one transaction"""
+        from .models import SyncRun
+
+        should_delete = True if not sql else False
+        # ordered by Id so an expired query locator can be continued from the last committed Id
+        sql = sql if sql else '%s ORDER BY %s' % (cls.get_pull_all_sql(),
+                                                  SalesforceClient.DEFAULT_SALESFORCE_KEY_NAME)
+        label = '%s.%s' % (cls._meta.app_label, cls.__name__)
+        using = cls.get_salesforce_using()
+        if using != DEFAULT_CONNECTION:
+            label = '%s@%s' % (label, using)  # runs of each org resume separately
+        run = SyncRun.get_resumable(label, sql) if resume else None
+        if run is None:
+            run = SyncRun.objects.create(model=label, soql=sql)
+        else:
+            log.info('[%s.pull_all] resume %s' % (cls.__name__, run))
+        resumed = run.processed > 0
+        salesforce_client = cls.get_salesforce_client()
+
+        existed_items, new_items, deleted_items = [], [], []
+        try:
+            data = None
+            if run.next_records_url:
+                try:
+                    data = salesforce_client.query_more(run.next_records_url.rsplit('/', 1)[-1])
+                except SalesforceError as ex:
+                    log.warning('[%s.pull_all] query locator expired >> %s' % (cls.__name__, ex))
+            if data is None:
+                if run.last_id and should_delete:
+                    data = salesforce_client.query(cls.get_resume_sql(run.last_id), use_cache=False)
+                else:
+                    if run.last_id:
+                        log.warning('[%s.pull_all] customized sql can not resume by Id, start over' % cls.__name__)
+                    data = salesforce_client.query(sql, use_cache=False)
+                    run.total_size = data['totalSize']
+
+            while True:
+                records = data['records']
+                with transaction.atomic():
+                    existed, new = cls._pull_records(records, update_fields, create_new)
+                    run.checkpoint(data.get('nextRecordsUrl'),
+                                   records[-1][SalesforceClient.DEFAULT_SALESFORCE_KEY_NAME] if records else None,
+                                   len(records), len(new), len(existed))
+                existed_items += existed
+                new_items += new
+                if data['done']:
+                    break
+                data = salesforce_client.query_more(data['nextRecordsUrl'].rsplit('/', 1)[-1])
+
+            # clean stale data if pull whole table, rows pulled by the interrupted runs are synced after start_at
+            if should_delete and run.processed:
+                if resumed and update_fields:
+                    # update_fields do not touch sync_at, rows pulled before the interruption are unknown
+                    log.warning('[%s.pull_all] skip cleaning stale rows of a resumed run with update_fields' %
+                                cls.__name__)
+                else:
+                    delete_items = cls.objects.exclude(id__in=[x.id for x in existed_items + new_items])
+                    if resumed:
+                        delete_items = delete_items.exclude(sync_at__gte=run.start_at)
+                    with tracing.span('db_delete', table=cls.__name__) as stage:
+                        deleted_items = [x for x in delete_items]
+                        delete_items.delete()
+                        stage.set(count=len(deleted_items))
+            run.finish(deleted=len(deleted_items))
+        except BaseException as ex:
+            run.fail(ex)
+            raise
 
         return existed_items, new_items, deleted_items
 
+    @classmethod
+    def get_pull_update_fields(cls):
+        """local field names written when applying remote records"""
+        update_fields = []
+        for local_field in cls.fields_map:
+            field_name = local_field.split('.')[0]
+            if isinstance(getattr(cls, field_name, None), property) or field_name in update_fields:
+                continue
+            update_fields.append(field_name)
+        return update_fields
+
+    @classmethod
+    def get_pull_attnames(cls):
+        """[(field name, attname)] of get_pull_update_fields(), foreign keys are compared by their id column"""
+        return [(x, cls._meta.get_field(x).attname) for x in cls.get_pull_update_fields()]
+
+    def get_pull_values(self, pull_fields):
+        """values of the pulled fields, taken before deserialize() to tell which ones a pull changes"""
+        return tuple(getattr(self, attname) for name, attname in pull_fields)
+
+    def set_pull_values(self, pull_fields, values):
+        """restore values taken by get_pull_values(), eg. of a row read with values_list()"""
+        for (name, attname), value in zip(pull_fields, values):
+            setattr(self, attname, value)
+
+    def get_changed_fields(self, pull_fields, values):
+        """names of the pulled fields whose value differs from get_pull_values() once stored,
+        eg. Decimal(0.1) of a float is not a change of Decimal('0.10')"""
+        changed_fields = []
+        for (name, attname), value in zip(pull_fields, values):
+            new_value = getattr(self, attname)
+            if new_value != value:
+                field = self._meta.get_field(name)
+                if helpers.get_stored_value(field, new_value) != helpers.get_stored_value(field, value):
+                    changed_fields.append(name)
+        return changed_fields
+
+    @classmethod
+    def apply_remote_changes(cls, records, deleted_ids=()):
+        """apply a batch of changed remote records and deleted salesforce ids with set based writes,
+        rows whose values did not change only get their sync_at advanced"""
+        key_name = SalesforceClient.DEFAULT_SALESFORCE_KEY_NAME
+        cls.pull_parents(records)
+        salesforce_ids = [x[key_name] for x in records]
+        pull_fields = cls.get_pull_attnames()
+        with tracing.span('db_read', table=cls.__name__, count=len(records)):
+            existing = dict((x.salesforce_id, x) for x in cls.objects.filter(salesforce_id__in=salesforce_ids))
+            values = dict((key, x.get_pull_values(pull_fields)) for key, x in existing.items())
+
+        new_items, changed_items = {}, {}
+        with tracing.span('deserialize', table=cls.__name__, count=len(records)):
+            for obj_data in records:
+                salesforce_id = obj_data[key_name]
+                instance = existing.get(salesforce_id) or new_items.get(salesforce_id)
+                if instance is None:
+                    instance = new_items[salesforce_id] = cls(salesforce_id=salesforce_id)
+                elif salesforce_id in existing:
+                    changed_items[salesforce_id] = instance
+
+                try:
+                    instance.deserialize(obj_data)
+                except Exception as ex:
+                    log.error('[%s#%s.deserialize] %s, data=%s' % (cls.__name__, instance.id, ex, obj_data))
+                    new_items.pop(salesforce_id, None)
+                    changed_items.pop(salesforce_id, None)
+
+        synced = list(new_items.values()) + list(changed_items.values())
+        changed_fields = set()
+        for salesforce_id, instance in list(changed_items.items()):
+            changed = instance.get_changed_fields(pull_fields, values[salesforce_id])
+            if changed:
+                changed_fields.update(changed)
+            else:
+                del changed_items[salesforce_id]
+
+        now = timezone.now()
+        with transaction.atomic():
+            with tracing.span('db_write', table=cls.__name__, count=len(new_items) + len(changed_items)):
+                if new_items:
+                    cls.objects.bulk_create(list(new_items.values()))
+                if changed_items:
+                    for instance in changed_items.values():
+                        instance.modify_at = now
+                    helpers.bulk_update(cls, list(changed_items.values()),
+                                        [x for x in cls.get_pull_update_fields() if x in changed_fields] +
+                                        ['modify_at'])
+            # after writes, so sync_at >= modify_at
+            cls._mark_synced(synced, 'salesforce_id')
+            if deleted_ids:
+                with tracing.span('db_delete', table=cls.__name__, count=len(deleted_ids)):
+                    cls.objects.filter(salesforce_id__in=list(deleted_ids)).delete()
+        cls.pull_children(records)
+
+        return list(changed_items.values()), list(new_items.values())
+
+    @classmethod
+    def pull_by_ids(cls, salesforce_ids, chunk_size=200, using=None):
+        """pull only the given records, return (changed, new, deleted salesforce ids)"""
+        with connections.using(using):
+            return cls._pull_by_ids(list(salesforce_ids), chunk_size)
+
+    @classmethod
+    def _pull_by_ids(cls, salesforce_ids, chunk_size):
+        changed_items, new_items, deleted_ids = [], [], []
+        salesforce_client = cls.get_salesforce_client()
+        key_name = SalesforceClient.DEFAULT_SALESFORCE_KEY_NAME
+
+        for i in range(0, len(salesforce_ids), chunk_size):
+            chunk = salesforce_ids[i:i + chunk_size]
+            sql = '%s WHERE %s IN (%s)' % (cls.get_pull_all_sql(), key_name,
+                                           ','.join("'%s'" % x for x in chunk))
+            records = salesforce_client.query_all(sql)['records']
+            found = set(x[key_name] for x in records)
+            removed = [x[key_name] for x in records if x['IsDeleted']]
+            removed += [x for x in chunk if x not in found]  # hard deleted
+            changed, new = cls.apply_remote_changes([x for x in records if not x['IsDeleted']], removed)
+            changed_items += changed
+            new_items += new
+            deleted_ids += removed
+
+        return changed_items, new_items, deleted_ids
+
+    @classmethod
+    def refresh_by_ids(cls, salesforce_ids, chunk_size=200, using=None):
+        """pull the records changed in salesforce since their sync_at, found by a `SystemModstamp` query,
+        return (changed, new, deleted salesforce ids) like pull_by_ids"""
+        with connections.using(using):
+            salesforce_ids = cls._get_modified_ids(list(salesforce_ids), chunk_size)
+            if not salesforce_ids:
+                return [], [], []
+            return cls._pull_by_ids(salesforce_ids, chunk_size)
+
+    @classmethod
+    def _get_modified_ids(cls, salesforce_ids, chunk_size):
+        """ids changed remotely, unknown or deleted on either side, or with local changes"""
+        key_name = SalesforceClient.DEFAULT_SALESFORCE_KEY_NAME
+        salesforce_client = cls.get_salesforce_client()
+        modified_since = {}
+        for instance in cls.objects.filter(salesforce_id__in=salesforce_ids).only('salesforce_id', 'sync_at',
+                                                                                 'modify_at'):
+            modified_since[instance.salesforce_id] = instance.get_modified_since()
+
+        modified_ids = []
+        for i in range(0, len(salesforce_ids), chunk_size):
+            chunk = salesforce_ids[i:i + chunk_size]
+            sql = 'SELECT %s, SystemModstamp FROM %s WHERE %s IN (%s)' % (
+                key_name, cls.salesforce_table_name, key_name, ','.join("'%s'" % x for x in chunk))
+            modstamps = dict((x[key_name], x['SystemModstamp'])
+                             for x in salesforce_client.query_all(sql)['records'])
+            for salesforce_id in chunk:
+                since = modified_since.get(salesforce_id)
+                modstamp = modstamps.get(salesforce_id)
+                if since is None or modstamp is None or parse_datetime(modstamp) >= since:
+                    modified_ids.append(salesforce_id)
+        log.debug('[%s.refresh_by_ids] %s of %s modified' % (cls.__name__, len(modified_ids), len(salesforce_ids)))
+        return modified_ids
+
     @classmethod
     def delete_and_push_multiple(cls, queryset):
         """Bulk deletion of objects"""
@@ -427,26 +995,32 @@ class SalesforceModel(models.Model):
 
     def update_file_obj(self, title, file_obj, file_salesforce_id):
         # update existed attach file by file object
+        chatter = connections[self.get_salesforce_using()].chatter
         success, file_salesforce_id, download_url_or_err = chatter.upload_file_obj(
             title, file_obj, file_salesforce_id)
         if success:
+            read_cache.invalidate('ContentDocumentLink', self.get_salesforce_using())  # title may change
             self.link_to_files(file_salesforce_id)
             return file_salesforce_id, download_url_or_err
         else:
             raise SuspiciousOperation(
                 '[simple_django_salesforce.attach_new_file] error: %s' % download_url_or_err)
 
+    def get_file_link_client(self):
+        """ContentDocumentLink client of the connection, reads go through the read cache"""
+        return SalesforceClient(salesforce_table_name='ContentDocumentLink', using=self.get_salesforce_using())
+
     def link_to_files(self, file_salesforce_id):
         """link self to a uploaded file, it can be seen in `RELATED` on salesforce"""
         if settings.SALESFORCE_OFFLINE:
-            return True, None
+            return True, None  # files are chatter uploads, not in the offline store
 
         # check exist
         is_existed = False
         try:
             sql = "SELECT Id FROM ContentDocumentLink WHERE ContentDocumentId='%s' and LinkedEntityId='%s' and IsDeleted=false"
             sql = sql % (file_salesforce_id, self.salesforce_id)
-            link_record = settings.SALESFORCE_CLIENT.query(sql)
+            link_record = self.get_file_link_client().query(sql)
             if link_record['totalSize']:
                 return True, link_record['records'][0]['Id']
         except SalesforceResourceNotFound:
@@ -456,8 +1030,7 @@ class SalesforceModel(models.Model):
             data = {'LinkedEntityId': self.salesforce_id,
                     'ContentDocumentId': file_salesforce_id, 'ShareType': 'V'}
             try:
-                result = settings.SALESFORCE_CLIENT.ContentDocumentLink.create(
-                    data)
+                result = self.get_file_link_client().create(data)
                 return True, result.get('id')
             except SalesforceError as ex:
                 return False, ex
@@ -469,7 +1042,7 @@ class SalesforceModel(models.Model):
 
         sql = "SELECT Id, ContentDocumentId FROM ContentDocumentLink WHERE ContentDocument.title = '%s' AND LinkedEntityId = '%s' AND IsDeleted=false"
         sql = sql % (title, self.salesforce_id)
-        records = settings.SALESFORCE_CLIENT.query(sql)
+        records = self.get_file_link_client().query(sql)
         if records['totalSize']:
             return records['records'][0]['ContentDocumentId']
         return None
@@ -481,11 +1054,35 @@ class SalesforceModel(models.Model):
 
         sql = "SELECT Id, ContentDocumentId FROM ContentDocumentLink WHERE LinkedEntityId = '%s' AND IsDeleted=false"
         sql = sql % self.salesforce_id
-        records = settings.SALESFORCE_CLIENT.query(sql)
+        records = self.get_file_link_client().query(sql)
 
         if records['totalSize']:
             first_document_id = records['records'][0]['ContentDocumentId']
+            chatter = connections[self.get_salesforce_using()].chatter
             success, sf_id, download_url = chatter.get_download_url_by_document_id(
                 first_document_id)
             return download_url
         return None
+
+
+class UniqueSalesforceModel(SalesforceModel):
+    """salesforce_id unique and indexed, pull_all writes pages with INSERT ... ON CONFLICT (salesforce_id) DO UPDATE
+
+        clean up duplicates before migrating an existing model, see `simple_django_salesforce.dedupe`
+    """
+    salesforce_id = models.CharField(_('salesforce id'), max_length=254, null=True, unique=True)
+
+    class Meta:
+        abstract = True
+
+
+def get_salesforce_models():
+    """all installed SalesforceModel subclasses with a salesforce table"""
+    from django.apps import apps
+
+    return [x for x in apps.get_models()
+            if issubclass(x, SalesforceModel) and x.salesforce_table_name]
+
+
+def get_salesforce_models_by_table(table_name):
+    return [x for x in get_salesforce_models() if x.salesforce_table_name == table_name]
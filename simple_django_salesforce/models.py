@@ -0,0 +1,137 @@
+import json
+import logging
+
+from django.apps import apps
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+log = logging.getLogger(__name__)
+
+
+class StreamReplayId(models.Model):
+    """replay id of the last applied event of a streaming api channel"""
+    channel = models.CharField(_('channel'), max_length=255, unique=True)
+    replay_id = models.BigIntegerField(_('replay id'))
+    update_at = models.DateTimeField(_('last update date'), auto_now=True)
+
+    def __str__(self):
+        return '%s@%s' % (self.channel, self.replay_id)
+
+
+class SyncRun(models.Model):
+    """a pull_all run, checkpointed after each committed page so it can be resumed"""
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = ((RUNNING, _('running')), (DONE, _('done')), (FAILED, _('failed')))
+
+    model = models.CharField(_('model'), max_length=255, db_index=True)  # app_label.Model
+    soql = models.TextField(_('soql'))
+    status = models.CharField(_('status'), max_length=20, choices=STATUS_CHOICES, default=RUNNING)
+    next_records_url = models.CharField(_('next records url'), max_length=255, null=True, blank=True)
+    last_id = models.CharField(_('last processed id'), max_length=18, null=True, blank=True)
+    total_size = models.IntegerField(_('total size'), default=0)
+    processed = models.IntegerField(_('processed'), default=0)
+    created = models.IntegerField(_('created'), default=0)
+    updated = models.IntegerField(_('updated'), default=0)
+    deleted = models.IntegerField(_('deleted'), default=0)
+    error = models.TextField(_('error'), blank=True)
+    start_at = models.DateTimeField(_('start date'), auto_now_add=True)
+    update_at = models.DateTimeField(_('last update date'), auto_now=True)
+    finish_at = models.DateTimeField(_('finish date'), null=True, blank=True)
+
+    def __str__(self):
+        return '%s#%s %s %s/%s' % (self.model, self.pk, self.status, self.processed, self.total_size)
+
+    @classmethod
+    def get_resumable(cls, model, soql):
+        """the last unfinished run of the same model and soql"""
+        return cls.objects.filter(model=model, soql=soql).exclude(status=cls.DONE).order_by('-pk').first()
+
+    def checkpoint(self, next_records_url, last_id, processed, created, updated):
+        """call inside the transaction of the page"""
+        self.next_records_url = next_records_url
+        self.last_id = last_id or self.last_id
+        self.processed += processed
+        self.created += created
+        self.updated += updated
+        self.save()
+
+    def finish(self, deleted=0):
+        self.status = self.DONE
+        self.deleted = deleted
+        self.next_records_url = None
+        self.finish_at = timezone.now()
+        self.save()
+
+    def fail(self, error):
+        self.status = self.FAILED
+        self.error = str(error)
+        self.save(update_fields=['status', 'error', 'update_at'])
+
+
+class PushFailure(models.Model):
+    """a push deferred to transaction.on_commit, or a webhook notification applied in the background,
+    that failed, retried by `./manage.py sf_retry_push`"""
+    PUSH = 'push'
+    DELETE = 'delete'
+    BULK_UPDATE = 'bulk_update'
+    BULK_DELETE = 'bulk_delete'
+    BULK_HARD_DELETE = 'bulk_hard_delete'
+    PULL = 'pull'  # salesforce ids of a notification
+    OPERATION_CHOICES = ((PUSH, _('push')), (DELETE, _('delete')), (BULK_UPDATE, _('bulk update')),
+                         (BULK_DELETE, _('bulk delete')), (BULK_HARD_DELETE, _('bulk hard delete')),
+                         (PULL, _('pull')))
+
+    model = models.CharField(_('model'), max_length=255)  # app_label.Model
+    object_pk = models.CharField(_('object pk'), max_length=255, blank=True)
+    operation = models.CharField(_('operation'), max_length=20, choices=OPERATION_CHOICES)
+    using = models.CharField(_('salesforce connection'), max_length=100, default='default')
+    payload = models.TextField(_('payload'), blank=True)  # json
+    error = models.TextField(_('error'), blank=True)
+    attempts = models.IntegerField(_('attempts'), default=1)
+    create_at = models.DateTimeField(_('create date'), auto_now_add=True)
+    update_at = models.DateTimeField(_('last update date'), auto_now=True)
+
+    def __str__(self):
+        return '%s %s#%s' % (self.operation, self.model, self.object_pk)
+
+    @classmethod
+    def record(cls, model, operation, payload=None, object_pk='', error='', using=None):
+        log.error('[PushFailure] %s %s#%s >> %s' % (operation, model.__name__, object_pk, error))
+        try:
+            payload = json.dumps(payload, cls=DjangoJSONEncoder)
+        except (TypeError, ValueError) as ex:
+            # kept for inspection, retry() would send something else than the failed push
+            log.error('[PushFailure] %s %s#%s payload not recorded >> %s' % (operation, model.__name__, object_pk, ex))
+            error, payload = '%s (payload not recorded: %s)' % (error, ex), ''
+        return cls.objects.create(model='%s.%s' % (model._meta.app_label, model.__name__), operation=operation,
+                                  using=model.get_salesforce_using(using), object_pk=str(object_pk),
+                                  payload=payload, error=str(error))
+
+    def retry(self):
+        """run the operation again, delete self on success"""
+        model = apps.get_model(self.model)
+        payload = json.loads(self.payload) if self.payload else None
+        try:
+            if payload is None and self.operation != self.PUSH:
+                raise ValueError('payload was not recorded, push the rows again')
+            if self.operation == self.PUSH:
+                obj = model.objects.filter(pk=self.object_pk).first()
+                if obj is not None:  # deleted locally meanwhile, nothing to push
+                    obj.push(update_fields=payload, using=self.using)
+            elif self.operation == self.PULL:
+                model.pull_by_ids(payload, using=self.using)
+            elif self.operation == self.DELETE:
+                model.get_salesforce_client(self.using).delete(payload)
+            else:
+                getattr(model.get_salesforce_client(self.using), self.operation)(payload)
+        except Exception as ex:
+            self.attempts += 1
+            self.error = str(ex)
+            self.save(update_fields=['attempts', 'error', 'update_at'])
+            return False
+        self.delete()
+        return True
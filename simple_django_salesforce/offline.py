@@ -0,0 +1,639 @@
+"""In-memory Salesforce used when `settings.SALESFORCE_OFFLINE` is True"""
+import copy
+import itertools
+import re
+import threading
+from collections import OrderedDict, defaultdict
+from datetime import datetime, timezone as dt_timezone
+from email.utils import parsedate_to_datetime
+
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime, parse_date
+from simple_salesforce.exceptions import SalesforceResourceNotFound, SalesforceMalformedRequest, \
+    SalesforceGeneralError
+
+SOQL_RE = re.compile(
+    r'^\s*SELECT\s+(?P<fields>.+?)\s+FROM\s+(?P<table>\w+)'
+    r'(?:\s+WHERE\s+(?P<where>.+?))?'
+    r'(?:\s+ORDER\s+BY\s+(?P<order>[\w.]+)(?:\s+(?P<direction>ASC|DESC))?)?'
+    r'(?:\s+LIMIT\s+(?P<limit>\d+))?\s*$',
+    re.IGNORECASE | re.DOTALL)
+CONDITION_RE = re.compile(
+    r'^\s*(?P<field>[\w.]+)\s*(?P<op>=|!=|<=|>=|<|>|\bNOT\s+IN\b|\bIN\b)\s*(?P<value>.+?)\s*$',
+    re.IGNORECASE | re.DOTALL)
+AND_RE = re.compile(r'\s+AND\s+', re.IGNORECASE)
+REFERENCE_RE = re.compile(r'@\{(\w+)\.(\w+)\}')  # `@{refAccount.id}` of composite graph requests
+DATETIME_FORMAT = '%Y-%m-%dT%H:%M:%S.000+0000'
+
+
+class SOQLError(ValueError):
+    pass
+
+
+def format_datetime(value):
+    return value.astimezone(dt_timezone.utc).strftime(DATETIME_FORMAT)
+
+
+def parse_literal(value):
+    value = value.strip()
+    if value.startswith("'") and value.endswith("'"):
+        return value[1:-1].replace("\\'", "'")
+    if value.lower() in ('true', 'false'):
+        return value.lower() == 'true'
+    if value.lower() == 'null':
+        return None
+    if value.startswith('(') and value.endswith(')'):
+        return [parse_literal(x) for x in split_list(value[1:-1])]
+    try:
+        return float(value) if '.' in value else int(value)
+    except ValueError:
+        pass
+    dt = parse_datetime(value)
+    if dt is not None:
+        return dt
+    raise SOQLError('unsupported literal %s' % value)
+
+
+def split_list(value):
+    """split `'a', 'b,c', 'd'` or `Id, (SELECT Id, Name FROM Contacts)`"""
+    items, current, quoted, depth = [], '', False, 0
+    for char in value:
+        if char == "'":
+            quoted = not quoted
+        elif not quoted and char in '()':
+            depth += 1 if char == '(' else -1
+        if char == ',' and not quoted and not depth:
+            items.append(current)
+            current = ''
+        else:
+            current += char
+    if current.strip():
+        items.append(current)
+    return items
+
+
+def comparable(value):
+    """make datetime strings of salesforce comparable with datetime literals"""
+    if isinstance(value, str) and len(value) >= 10 and value[4:5] == '-':
+        dt = parse_datetime(value)
+        if dt is not None:
+            return dt
+        d = parse_date(value)
+        if d is not None:
+            return datetime(d.year, d.month, d.day, tzinfo=dt_timezone.utc)
+    return value
+
+
+def matches(record, conditions):
+    for field, op, expected in conditions:
+        value = record.get(field)
+        if op in ('IN', 'NOT IN'):
+            found = value in expected
+            if found != (op == 'IN'):
+                return False
+            continue
+        if op in ('=', '!='):
+            if (value == expected) != (op == '='):
+                return False
+            continue
+
+        value, expected = comparable(value), comparable(expected)
+        if value is None or expected is None:
+            return False
+        try:
+            if op == '<' and not value < expected:
+                return False
+            if op == '>' and not value > expected:
+                return False
+            if op == '<=' and not value <= expected:
+                return False
+            if op == '>=' and not value >= expected:
+                return False
+        except TypeError:
+            return False
+    return True
+
+
+def mask_nested(soql):
+    """blank out everything inside parentheses, so the clauses of subqueries are not matched"""
+    masked, depth, quoted = [], 0, False
+    for char in soql:
+        if char == "'":
+            quoted = not quoted
+        elif not quoted and char == ')':
+            depth -= 1
+        masked.append('_' if depth > 0 else char)
+        if not quoted and char == '(':
+            depth += 1
+    return ''.join(masked)
+
+
+def parse_soql(soql):
+    """parse a subset of SOQL: plain and parent relationship fields, child subqueries,
+    AND conditions, ORDER BY one field and LIMIT"""
+    match = SOQL_RE.match(mask_nested(soql))
+    if not match:
+        raise SOQLError('unsupported query %s' % soql)
+
+    def group(name):
+        # slice the original query, the match is on the masked one
+        start, end = match.span(name)
+        return soql[start:end] if start >= 0 else None
+
+    fields, subqueries = [], []
+    for field in (x.strip() for x in split_list(group('fields'))):
+        if field.startswith('(') and field.endswith(')'):
+            subqueries.append(parse_soql(field[1:-1]))
+        elif field:
+            fields.append(field)
+    conditions = []
+    if group('where'):
+        for condition in AND_RE.split(group('where').strip()):
+            parts = CONDITION_RE.match(condition)
+            if not parts:
+                raise SOQLError('unsupported condition %s' % condition)
+            op = ' '.join(parts.group('op').upper().split())
+            conditions.append((parts.group('field'), op, parse_literal(parts.group('value'))))
+
+    return {
+        'fields': fields,
+        'subqueries': subqueries,  # `table` of a subquery is the child relationship name
+        'table': group('table'),
+        'conditions': conditions,
+        'order': group('order'),
+        'descending': (group('direction') or '').upper() == 'DESC',
+        'limit': int(group('limit')) if group('limit') else None,
+    }
+
+
+class SObjectStore(object):
+    """records of sObjects kept in memory, keyed by table and Id"""
+
+    ID_PREFIXES = {'Account': '001', 'Contact': '003', 'Opportunity': '006',
+                   'ContentDocument': '069', 'ContentDocumentLink': '06A'}
+    STANDARD_RELATIONSHIPS = (('Contact', 'AccountId', 'Account', 'Contacts'),
+                              ('Opportunity', 'AccountId', 'Account', 'Opportunities'))
+
+    def __init__(self, page_size=2000):
+        self.tables = defaultdict(OrderedDict)
+        self.lock = threading.RLock()
+        self.counter = 0
+        self.page_size = page_size
+        self.cursors = {}
+        self.cursor_ids = itertools.count(1)
+        self.listeners = []  # callable(table, change_type, record_id, fields)
+        self.relationships = {}  # (table, relationship name) -> (related table, reference field)
+        for relationship in self.STANDARD_RELATIONSHIPS:
+            self.add_relationship(*relationship)
+
+    def add_relationship(self, table, field, parent_table, child_relationship):
+        """`Contact.AccountId` references Account, listed as `Contacts` on Account"""
+        name = field[:-3] + '__r' if field.endswith('__c') else field[:-2]
+        self.relationships[(table, name)] = (parent_table, field)
+        self.relationships[(parent_table, child_relationship)] = (table, field)
+
+    def get_relationship(self, table, name):
+        if (table, name) in self.relationships:
+            return self.relationships[(table, name)]
+        if name.endswith('__r'):
+            raise SOQLError('unknown relationship %s.%s' % (table, name))
+        return name, '%sId' % name  # standard lookup like Contact.Account
+
+    def notify(self, table, change_type, record_id, fields):
+        for listener in self.listeners:
+            listener(table, change_type, record_id, fields)
+
+    def reset(self):
+        with self.lock:
+            self.tables.clear()
+            self.cursors.clear()
+
+    def new_id(self, table):
+        self.counter += 1
+        prefix = self.ID_PREFIXES.get(table, 'a0%s' % (table[0].upper() if table else 'X'))
+        return (prefix + ('%012X' % self.counter))[:15] + 'AAA'
+
+    def now(self):
+        return format_datetime(timezone.now())
+
+    def insert(self, table, fields):
+        with self.lock:
+            record_id = self.new_id(table)
+            record = OrderedDict(fields)
+            record.pop('Id', None)
+            now = self.now()
+            record.update({'Id': record_id, 'IsDeleted': False,
+                           'CreatedDate': now, 'SystemModstamp': now,
+                           'LastModifiedDate': now})
+            self.tables[table][record_id] = record
+        self.notify(table, 'CREATE', record_id, record)
+        return record_id
+
+    def get(self, table, record_id, include_deleted=False):
+        record = self.tables[table].get(record_id)
+        if record is None or (record['IsDeleted'] and not include_deleted):
+            return None
+        return record
+
+    def find(self, table, field, value):
+        if field == 'Id':
+            return self.get(table, value)
+        for record in self.tables[table].values():
+            if record.get(field) == value and not record['IsDeleted']:
+                return record
+        return None
+
+    def update(self, table, record_id, fields):
+        with self.lock:
+            record = self.get(table, record_id)
+            if record is None:
+                return False
+            fields = dict(fields)
+            fields.pop('Id', None)
+            record.update(fields)
+            record['SystemModstamp'] = record['LastModifiedDate'] = self.now()
+        self.notify(table, 'UPDATE', record_id, fields)
+        return True
+
+    def upsert(self, table, field, value, fields):
+        """return (id, created)"""
+        with self.lock:
+            record = self.find(table, field, value)
+            if record is not None:
+                self.update(table, record['Id'], fields)
+                return record['Id'], False
+            fields = dict(fields)
+            if field != 'Id':
+                fields[field] = value
+            return self.insert(table, fields), True
+
+    def delete(self, table, record_id, hard=False):
+        with self.lock:
+            record = self.get(table, record_id)
+            if record is None:
+                return False
+            if hard:
+                del self.tables[table][record_id]
+            else:
+                record['IsDeleted'] = True
+                record['SystemModstamp'] = self.now()
+        self.notify(table, 'DELETE', record_id, {})
+        return True
+
+    def project(self, table, record, fields):
+        data = OrderedDict()
+        data['attributes'] = {'type': table,
+                              'url': '/services/data/v38.0/sobjects/%s/%s' % (table, record['Id'])}
+        for field in fields:
+            if '.' in field:
+                name, parent_field = field.split('.', 1)
+                parent_table, reference_field = self.get_relationship(table, name)
+                parent = self.get(parent_table, record.get(reference_field) or '')
+                if parent is None:
+                    data[name] = None
+                elif data.get(name) is None:
+                    data[name] = self.project(parent_table, parent, [parent_field])
+                else:
+                    data[name][parent_field] = copy.copy(parent.get(parent_field))
+            else:
+                data[field] = copy.copy(record.get(field))
+        return data
+
+    def query_children(self, table, record, subquery):
+        child_table, reference_field = self.get_relationship(table, subquery['table'])
+        conditions = subquery['conditions'] + [(reference_field, '=', record['Id']), ('IsDeleted', '=', False)]
+        with self.lock:
+            children = [x for x in self.tables[child_table].values() if matches(x, conditions)]
+        if not children:
+            return None  # salesforce returns null for an empty child relationship
+        records = [self.project(child_table, x, subquery['fields']) for x in children]
+        return OrderedDict([('totalSize', len(records)), ('done', True), ('records', records)])
+
+    def query(self, soql, include_deleted=False):
+        """return records matching a SOQL query"""
+        parsed = parse_soql(soql)
+        table = parsed['table']
+        conditions = list(parsed['conditions'])
+        if not include_deleted and not any(x[0] == 'IsDeleted' for x in conditions):
+            conditions.append(('IsDeleted', '=', False))
+
+        with self.lock:
+            records = [x for x in self.tables[table].values() if matches(x, conditions)]
+
+        if parsed['order']:
+            order = parsed['order']
+            records.sort(key=lambda x: (x.get(order) is None, comparable(x.get(order))),
+                         reverse=parsed['descending'])
+        if parsed['limit'] is not None:
+            records = records[:parsed['limit']]
+        result = []
+        for record in records:
+            data = self.project(table, record, parsed['fields'])
+            for subquery in parsed['subqueries']:
+                data[subquery['table']] = self.query_children(table, record, subquery)
+            result.append(data)
+        return result
+
+    def query_page(self, soql, include_deleted=False):
+        """first page of a query result in REST format, with `nextRecordsUrl` if there are more"""
+        return self.page(self.query(soql, include_deleted=include_deleted))
+
+    def query_more(self, locator):
+        """next page of a query, locator can be the id or the `nextRecordsUrl`"""
+        with self.lock:
+            records = self.cursors.pop(locator.rstrip('/').rsplit('/', 1)[-1], None)
+        if records is None:
+            return None
+        return self.page(records)
+
+    def page(self, records):
+        result = OrderedDict([('totalSize', len(records)), ('done', True),
+                              ('records', records[:self.page_size])])
+        if len(records) > self.page_size:
+            with self.lock:
+                locator = '01gOFFLINE%08d-%s' % (next(self.cursor_ids), self.page_size)
+                self.cursors[locator] = records[self.page_size:]
+            result['done'] = False
+            result['nextRecordsUrl'] = '/services/data/v38.0/query/%s' % locator
+        return result
+
+    def bulk(self, table, operation, data, external_id_field='Id'):
+        """run a bulk api operation, return results in bulk api format"""
+        if operation in ('query', 'queryAll'):
+            return self.query(data, include_deleted=operation == 'queryAll')
+
+        results = []
+        for row in data:
+            record_id, created, success = row.get('Id'), False, True
+            if operation == 'insert':
+                record_id, created = self.insert(table, row), True
+            elif operation == 'update':
+                success = self.update(table, record_id, row)
+            elif operation == 'upsert':
+                record_id, created = self.upsert(table, external_id_field, row.get(external_id_field), row)
+            elif operation in ('delete', 'hardDelete'):
+                success = self.delete(table, record_id, hard=operation == 'hardDelete')
+            results.append({'success': success, 'created': created, 'id': record_id,
+                            'errors': [] if success else [{'statusCode': 'ENTITY_IS_DELETED',
+                                                           'message': 'entity is deleted'}]})
+        return results
+
+    def collection(self, method, parts, records):
+        """sObject collections, `parts` of the path after `composite/sobjects`"""
+        if parts:
+            operation, external_id_field = 'upsert', parts[1]
+        else:
+            operation, external_id_field = {'POST': 'insert', 'PATCH': 'update'}[method], 'Id'
+
+        results = []
+        for record in records:
+            row = dict(record)
+            table = row.pop('attributes', {}).get('type') or parts[0]
+            results.extend(self.bulk(table, operation, [row], external_id_field))
+        return results
+
+    def graph(self, graphs):
+        """composite graph requests, each graph is applied all or nothing"""
+        return {'graphs': [self.run_graph(x) for x in graphs]}
+
+    def run_graph(self, graph):
+        results, references, undo = [], {}, []
+
+        def resolve(value):
+            if not isinstance(value, str):
+                return value
+            return REFERENCE_RE.sub(lambda x: str((references.get(x.group(1)) or {}).get(x.group(2), '')), value)
+
+        with self.lock:
+            successful = True
+            for request in graph['compositeRequest']:
+                # /services/data/vXX.X/sobjects/Table[/Id | /Field/value]
+                parts = [x for x in resolve(request['url']).split('/') if x][4:]
+                body = dict((k, resolve(v)) for k, v in (request.get('body') or {}).items())
+                status, result = self.graph_request(request['method'], parts, body, undo)
+                results.append({'body': result, 'httpHeaders': {}, 'httpStatusCode': status,
+                                'referenceId': request['referenceId']})
+                if status >= 300:
+                    successful = False
+                    break
+                references[request['referenceId']] = result
+
+            if not successful:
+                for table, record_id, record in reversed(undo):
+                    if record is None:
+                        self.tables[table].pop(record_id, None)
+                    else:
+                        self.tables[table][record_id] = record
+        return {'graphId': graph['graphId'], 'graphResponse': {'compositeResponse': results},
+                'isSuccessful': successful}
+
+    def graph_request(self, method, parts, body, undo):
+        """one node of a graph, `undo` collects (table, id, previous record or None)"""
+        table = parts[0]
+        if method == 'POST' and len(parts) == 1:
+            record_id = self.insert(table, body)
+            undo.append((table, record_id, None))
+            return 201, {'id': record_id, 'success': True, 'errors': []}
+        if method == 'PATCH' and len(parts) == 2:
+            record = self.get(table, parts[1])
+            if record is None:
+                return 404, [{'errorCode': 'NOT_FOUND', 'message': 'The requested resource does not exist'}]
+            undo.append((table, parts[1], copy.deepcopy(record)))
+            self.update(table, parts[1], body)
+            return 204, None
+        if method == 'PATCH' and len(parts) == 3:
+            previous = copy.deepcopy(self.find(table, parts[1], parts[2]))
+            record_id, created = self.upsert(table, parts[1], parts[2], body)
+            undo.append((table, record_id, previous))
+            return 201 if created else 200, {'id': record_id, 'success': True, 'errors': [], 'created': created}
+        return 405, [{'errorCode': 'METHOD_NOT_ALLOWED', 'message': method}]
+
+
+class OfflineResponse(object):
+    """what `raw_response=True` calls of simple_salesforce return"""
+
+    def __init__(self, status_code, body=None):
+        self.status_code = status_code
+        self.body = body
+        self.headers = {}
+
+    def json(self):
+        return self.body
+
+    @property
+    def text(self):
+        return '' if self.body is None else str(self.body)
+
+
+def not_found(table, record_id):
+    return SalesforceResourceNotFound(
+        'offline://sobjects/%s/%s' % (table, record_id), 404, table,
+        [{'errorCode': 'NOT_FOUND', 'message': 'The requested resource does not exist'}])
+
+
+def not_modified(table, record_id):
+    return SalesforceGeneralError('offline://sobjects/%s/%s' % (table, record_id), 304, table, None)
+
+
+def is_modified_since(record, headers):
+    """False when `SystemModstamp` is before the `If-Modified-Since` header, which has second precision"""
+    since = headers.get('If-Modified-Since') if headers else None
+    if not since:
+        return True
+    return parse_datetime(record['SystemModstamp']).timestamp() >= parsedate_to_datetime(since).timestamp()
+
+
+class OfflineSFType(object):
+    """in-memory version of `simple_salesforce.SFType`"""
+
+    def __init__(self, store, name):
+        self.store = store
+        self.name = name
+
+    def find(self, record_id):
+        # `Field__c/value` for custom keys
+        if '/' in record_id:
+            field, value = record_id.split('/', 1)
+            return self.store.find(self.name, field, value)
+        return self.store.get(self.name, record_id)
+
+    def get(self, record_id, headers=None):
+        record = self.find(record_id)
+        if record is None:
+            raise not_found(self.name, record_id)
+        if not is_modified_since(record, headers):
+            raise not_modified(self.name, record_id)
+        return self.store.project(self.name, record, record.keys())
+
+    def get_by_custom_id(self, custom_id_field, custom_id, headers=None):
+        return self.get('%s/%s' % (custom_id_field, custom_id), headers=headers)
+
+    def create(self, data, headers=None):
+        return OrderedDict([('id', self.store.insert(self.name, data)), ('success', True), ('errors', [])])
+
+    def update(self, record_id, data, raw_response=False, headers=None):
+        record = self.find(record_id)
+        if record is None:
+            raise not_found(self.name, record_id)
+        self.store.update(self.name, record['Id'], data)
+        return OfflineResponse(204) if raw_response else 204
+
+    def upsert(self, record_id, data, raw_response=False, headers=None):
+        if '/' in record_id:
+            field, value = record_id.split('/', 1)
+        else:
+            field, value = 'Id', record_id
+        new_id, created = self.store.upsert(self.name, field, value, data)
+        response = OfflineResponse(201, {'id': new_id, 'success': True, 'errors': []}) if created \
+            else OfflineResponse(204)
+        return response if raw_response else response.status_code
+
+    def delete(self, record_id, raw_response=False, headers=None):
+        record = self.find(record_id)
+        if record is None:
+            raise not_found(self.name, record_id)
+        self.store.delete(self.name, record['Id'])
+        return OfflineResponse(204) if raw_response else 204
+
+    def describe(self, headers=None):
+        return {'name': self.name, 'label': self.name, 'custom': self.name.endswith('__c'), 'fields': []}
+
+    def metadata(self, headers=None):
+        return {'objectDescribe': self.describe(), 'recentItems': []}
+
+
+class OfflineBulkType(object):
+    """in-memory version of `simple_salesforce.bulk.SFBulkType`"""
+
+    def __init__(self, store, name):
+        self.store = store
+        self.name = name
+
+    def insert(self, data, **kwargs):
+        return self.store.bulk(self.name, 'insert', data)
+
+    def update(self, data, **kwargs):
+        return self.store.bulk(self.name, 'update', data)
+
+    def upsert(self, data, external_id_field, **kwargs):
+        return self.store.bulk(self.name, 'upsert', data, external_id_field)
+
+    def delete(self, data, **kwargs):
+        return self.store.bulk(self.name, 'delete', data)
+
+    def hard_delete(self, data, **kwargs):
+        return self.store.bulk(self.name, 'hardDelete', data)
+
+    def query(self, data, **kwargs):
+        return self.store.bulk(self.name, 'query', data)
+
+    def query_all(self, data, **kwargs):
+        return self.store.bulk(self.name, 'queryAll', data)
+
+
+class OfflineBulkHandler(object):
+    def __init__(self, store):
+        self.store = store
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return OfflineBulkType(self.store, name)
+
+
+class OfflineSalesforce(object):
+    """in-memory replacement of `simple_salesforce.Salesforce`"""
+    session = None
+
+    def __init__(self, store=None):
+        self.store = store if store is not None else SObjectStore()
+        self.bulk = OfflineBulkHandler(self.store)
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return OfflineSFType(self.store, name)
+
+    def describe(self):
+        return {'sobjects': [{'name': x, 'label': x, 'custom': x.endswith('__c')} for x in self.store.tables]}
+
+    def query(self, query, include_deleted=False, **kwargs):
+        try:
+            return self.store.query_page(query, include_deleted=include_deleted)
+        except SOQLError as ex:
+            raise SalesforceMalformedRequest('offline://query', 400, 'query',
+                                             [{'errorCode': 'MALFORMED_QUERY', 'message': str(ex)}])
+
+    def query_more(self, next_records_identifier, identifier_is_url=False, include_deleted=False, **kwargs):
+        result = self.store.query_more(next_records_identifier)
+        if result is None:
+            raise SalesforceMalformedRequest('offline://query', 400, 'query',
+                                             [{'errorCode': 'INVALID_QUERY_LOCATOR',
+                                               'message': 'invalid query locator'}])
+        return result
+
+    def restful(self, path, params=None, method='GET', **kwargs):
+        parts = path.strip('/').split('/')
+        if parts[:2] == ['composite', 'graph']:
+            return self.store.graph(kwargs['json']['graphs'])
+        if parts[:2] != ['composite', 'sobjects']:
+            raise SalesforceResourceNotFound('offline://%s' % path, 404, path,
+                                             [{'errorCode': 'NOT_FOUND', 'message': 'not supported offline'}])
+        return self.store.collection(method, parts[2:], kwargs['json']['records'])
+
+    def query_all(self, query, include_deleted=False, **kwargs):
+        result = self.query(query, include_deleted=include_deleted)
+        records = list(result['records'])
+        while not result['done']:
+            result = self.query_more(result['nextRecordsUrl'], identifier_is_url=True)
+            records.extend(result['records'])
+        return OrderedDict([('totalSize', len(records)), ('done', True), ('records', records)])
+
+
+store = SObjectStore()
+client = OfflineSalesforce(store)
+
+
+def reset():
+    """clear all offline records, eg. in tearDown()"""
+    store.reset()
@@ -0,0 +1,168 @@
+"""deserialize query pages in worker processes, the parent only resolves foreign keys and writes
+
+    existed, new, deleted = Product.pull_all(workers=4)  # or settings.SALESFORCE_PULL_WORKERS
+
+workers get the values of the date, datetime, decimal and boolean fields of a page as one tuple per column
+and send the parsed columns back, other values need no parsing and are set by the parent, so only what is
+decoded crosses the process boundary. pages are fetched by a PagePrefetcher thread, decoded while earlier
+pages are written, and committed one by one.
+models overriding deserialize() or field_deserialize(), or mapping fields deserialize() can not handle,
+are pulled pipelined in the parent instead
+"""
+import logging
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import models
+
+from . import helpers, tracing
+from .decoder import Missing
+
+log = logging.getLogger(__name__)
+log.setLevel(logging.INFO)
+
+PARSED_FIELD_TYPES = (models.DateTimeField, models.DateField, models.DecimalField, models.BooleanField)
+
+
+def get_plan(model):
+    """picklable ([(remote field, local field, field type)], [(remote field, fk name)]) of the fields_map,
+    None when records of the model must go through its own deserialize()"""
+    from .model import SalesforceModel
+
+    if model.deserialize is not SalesforceModel.deserialize or \
+            model.field_deserialize is not SalesforceModel.field_deserialize:
+        return None
+
+    fields, fks = [], []
+    for remote_field, local_field in dict((v, k) for k, v in model.fields_map.items()).items():
+        if local_field.count('.') == 1 and local_field.endswith('.salesforce_id'):
+            fks.append((remote_field, local_field.split('.')[0]))
+        elif '.' in local_field:
+            return None
+        elif isinstance(getattr(model, local_field, None), property):
+            continue
+        else:
+            field_type = type(model._meta.get_field(local_field))
+            if field_type not in model.SERIALIZABLE_FIELDS:
+                return None
+            fields.append((remote_field, local_field, field_type))
+    return fields, fks
+
+
+def get_columns(plan, records):
+    """(field types, value tuple of each column) of the fields to parse, what a worker gets of a page"""
+    parsed = [(remote_field, field_type) for remote_field, local_field, field_type in plan[0]
+              if field_type in PARSED_FIELD_TYPES]
+    return (tuple(field_type for remote_field, field_type in parsed),
+            [tuple(x.get(remote_field, Missing) for x in records) for remote_field, field_type in parsed])
+
+
+def decode_columns(field_types, columns):
+    """(parsed columns, {row index: error}), run in a worker process"""
+    decoded, errors = [], {}
+    for field_type, values in zip(field_types, columns):
+        column = []
+        for i, value in enumerate(values):
+            if value is Missing:
+                column.append(Missing)
+                continue
+            try:
+                column.append(helpers.get_deserialized_data(value, field_type))
+            except Exception as ex:
+                errors.setdefault(i, repr(ex))
+                column.append(None)
+        decoded.append(tuple(column))
+    return decoded, errors
+
+
+class Deserializer(object):
+    """deserialize(instance, obj_data) setting the values parsed by a worker and the others as they are,
+    foreign keys are resolved with one query per fk on first use, after pull_parents() ran"""
+
+    def __init__(self, model, plan, records, decoded):
+        self.model = model
+        fields, self.fks = plan
+        self.parsed = [local_field for remote_field, local_field, field_type in fields
+                       if field_type in PARSED_FIELD_TYPES]
+        self.plain = [x for x in fields if x[2] not in PARSED_FIELD_TYPES]
+        self.columns, self.errors = decoded
+        self.positions = dict((id(x), i) for i, x in enumerate(records))  # records are kept alive by the caller
+        self.records = records
+        self.fk_ids = None
+
+    def resolve_fks(self):
+        from simple_salesforce.exceptions import SalesforceError
+
+        fk_ids = {}
+        for remote_field, fk_name in self.fks:
+            values = set(x[remote_field] for x in self.records if x.get(remote_field) is not None)
+            if not values:
+                continue
+            fk_model = self.model._meta.get_field(fk_name).remote_field.model
+            with tracing.span('fk_resolve', table=fk_model.__name__, count=len(values)):
+                # first row of duplicated salesforce ids, as deserialize()
+                for salesforce_id, pk in fk_model.objects.filter(salesforce_id__in=values) \
+                        .order_by('-id').values_list('salesforce_id', 'id'):
+                    fk_ids[(fk_name, salesforce_id)] = pk
+                for value in values:
+                    if (fk_name, value) in fk_ids:
+                        continue
+                    fk_obj = fk_model(salesforce_id=value)  # pull the fk object from salesforce
+                    try:
+                        fk_obj.pull()
+                    except SalesforceError:
+                        continue
+                    if fk_obj.id:
+                        fk_ids[(fk_name, value)] = fk_obj.id
+        return fk_ids
+
+    def __call__(self, instance, obj_data):
+        position = self.positions[id(obj_data)]
+        if position in self.errors:
+            raise ValueError(self.errors[position])
+        for remote_field, local_field, field_type in self.plain:
+            if remote_field in obj_data:
+                setattr(instance, local_field, helpers.get_deserialized_data(obj_data[remote_field], field_type))
+        for local_field, column in zip(self.parsed, self.columns):
+            value = column[position]
+            if value is not Missing:
+                setattr(instance, local_field, value)
+        if self.fks:
+            if self.fk_ids is None:
+                self.fk_ids = self.resolve_fks()
+            for remote_field, fk_name in self.fks:
+                pk = self.fk_ids.get((fk_name, obj_data.get(remote_field)))
+                if pk is not None:
+                    setattr(instance, '%s_id' % fk_name, pk)
+
+
+def get_executor(workers):
+    """spawned processes, forking next to the prefetch thread could copy its held locks"""
+    if workers < 1:
+        raise ImproperlyConfigured('SALESFORCE_PULL_WORKERS must be a positive number, got %s' % workers)
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+
+
+def iter_decoded(pages, plan, workers):
+    """(data, records, (parsed columns, errors)) of each page in order, up to `workers` pages are decoded while the caller writes"""
+    pending = deque()
+    pages = iter(pages)
+    try:
+        with get_executor(workers) as executor:
+            for data in pages:
+                records = [x for x in data['records'] if not x['IsDeleted']]
+                pending.append((data, records, executor.submit(decode_columns, *get_columns(plan, records))))
+                while len(pending) > workers:
+                    yield wait(*pending.popleft())
+            while pending:
+                yield wait(*pending.popleft())
+    finally:
+        if hasattr(pages, 'close'):
+            pages.close()  # stop the prefetch thread when the caller failed
+
+
+def wait(data, records, future):
+    with tracing.span('worker_wait', count=len(records)):
+        return data, records, future.result()
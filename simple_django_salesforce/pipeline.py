@@ -0,0 +1,81 @@
+"""query pages fetched by a background thread while the caller writes the previous ones
+
+    for data in PagePrefetcher(client, 'SELECT Id, Name FROM Account', prefetch=2):
+        save(data['records'])
+
+the fetcher blocks once `prefetch` pages wait, so memory stays bounded by the slowest consumer
+"""
+import logging
+import queue
+import threading
+
+from . import metrics, tracing
+
+log = logging.getLogger(__name__)
+log.setLevel(logging.INFO)
+
+DEFAULT_PREFETCH = 2
+_DONE = object()
+
+
+class PagePrefetcher(object):
+    """iterate the pages of `sql` run by SalesforceClient `client`, the next pages are fetched in a thread,
+    records are decoder.Row of `columns` when given"""
+
+    def __init__(self, client, sql, prefetch=DEFAULT_PREFETCH, columns=None):
+        self.client = client
+        self.sql = sql
+        self.columns = columns
+        self.queue = queue.Queue(maxsize=max(1, prefetch))
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def put(self, item):
+        """wait for room in the queue, False once the consumer stopped"""
+        while not self.stopped.is_set():
+            try:
+                self.queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def query(self):
+        if self.columns is None:
+            return self.client.query(self.sql, use_cache=False)
+        return self.client.query_rows(self.sql, self.columns)
+
+    def query_more(self, locator):
+        if self.columns is None:
+            return self.client.query_more(locator)
+        return self.client.query_more_rows(locator, self.columns)
+
+    def fetch(self, collectors, tracers):
+        # calls are reported to the metrics and traces of the consuming thread
+        with metrics.attach(collectors), tracing.attach(tracers):
+            try:
+                data = self.query()
+                while self.put(data):
+                    if data['done'] or not data.get('nextRecordsUrl'):
+                        self.put(_DONE)
+                        return
+                    data = self.query_more(data['nextRecordsUrl'].rsplit('/', 1)[-1])
+            except BaseException as ex:
+                self.put(ex)
+
+    def __iter__(self):
+        self.thread = threading.Thread(target=self.fetch, args=(metrics.get_collectors(), tracing.get_tracers()),
+                                       name='salesforce-prefetch-%s' % self.client.table_name)
+        self.thread.daemon = True
+        self.thread.start()
+        try:
+            while True:
+                item = self.queue.get()
+                if item is _DONE:
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            self.stopped.set()
+            self.thread.join()
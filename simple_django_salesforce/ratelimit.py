@@ -0,0 +1,176 @@
+import logging
+import random
+import threading
+import time
+
+from django.conf import settings
+from simple_salesforce.exceptions import SalesforceError
+
+log = logging.getLogger(__name__)
+
+DEFAULT_ORG = 'default'
+DEFAULT_CONFIG = {
+    'RATE': None,  # calls per second, None for unlimited
+    'BURST': None,  # bucket size, default to RATE
+    'CACHE': None,  # django cache alias to share the limit across processes
+    'MIN_REMAINING': 0.1,  # slow down when less than 10% of daily api calls left
+    'LOW_QUOTA_RATE': 5.0,  # start rate to scale down from when RATE is unlimited
+    'MAX_RETRIES': 5,  # retries on throttling responses
+    'BACKOFF_BASE': 0.5,  # seconds
+    'BACKOFF_MAX': 30,  # seconds
+}
+# refused before the call ran, so retrying can not apply a write twice
+REJECTED_ERROR_CODES = ('REQUEST_LIMIT_EXCEEDED', 'ConcurrentRequestLimitExceeded', 'ConcurrentPerOrgLongTxn',
+                        'TooManyRequests')
+THROTTLE_ERROR_CODES = REJECTED_ERROR_CODES + ('SERVER_UNAVAILABLE',)
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def is_throttled(ex=None, status=None, content=None, idempotent=True):
+    """whether a salesforce exception or response means `slow down` and the call can be sent again,
+    a 503 may answer a write salesforce applied anyway, so calls not idempotent only retry rejected ones"""
+    if ex is not None:
+        if not isinstance(ex, SalesforceError):
+            return False
+        status, content = ex.status, ex.content
+
+    if status == 429 or (status == 503 and idempotent):
+        return True
+    if status == 403 and content:
+        codes = THROTTLE_ERROR_CODES if idempotent else REJECTED_ERROR_CODES
+        return any(code in str(content) for code in codes)
+    return False
+
+
+class TokenBucket(object):
+    """in-process token bucket"""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def try_acquire(self):
+        """take a token, return seconds to wait if bucket is empty"""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0
+            return (1 - self.tokens) / self.rate
+
+
+class CacheWindowCounter(object):
+    """fixed window counter in django cache, shared by all processes using the same cache: `rate` calls per
+    window of max(1, 1 / rate) seconds, windows are aligned so up to twice that many can pass around a window
+    boundary, BURST does not apply. django caches have no atomic read-modify-write for a shared token bucket
+    """
+
+    def __init__(self, key, rate, cache_alias='default'):
+        from django.core.cache import caches
+
+        self.key = key
+        self.rate = rate
+        self.cache = caches[cache_alias]
+
+    def try_acquire(self):
+        window = max(1.0, 1.0 / self.rate)
+        allowed = max(1, int(self.rate * window))
+        now = time.time()
+        window_start = int(now / window) * window
+        key = 'sf_rate_limit:%s:%s' % (self.key, int(window_start))
+
+        self.cache.add(key, 0, timeout=int(window) + 5)
+        try:
+            count = self.cache.incr(key)
+        except ValueError:
+            # expired between add() and incr()
+            self.cache.add(key, 1, timeout=int(window) + 5)
+            count = 1
+
+        if count <= allowed:
+            return 0
+        return window_start + window - now
+
+
+CacheTokenBucket = CacheWindowCounter  # former name, it never was a token bucket
+
+
+class RateLimiter(object):
+    """token bucket in front of outbound calls, adapting to the remaining api calls of the org"""
+
+    def __init__(self, org=DEFAULT_ORG, **config):
+        self.org = org
+        self.config = dict(DEFAULT_CONFIG, **config)
+        self.base_rate = self.config['RATE']
+        self.rate = None
+        self.bucket = None
+        self.set_rate(self.base_rate)
+
+    def set_rate(self, rate):
+        if rate == self.rate:
+            return
+        self.rate = rate
+        if not rate:
+            self.bucket = None
+        elif self.bucket is not None:
+            with getattr(self.bucket, 'lock', _limiters_lock):
+                self.bucket.rate = rate
+        elif self.config['CACHE']:
+            self.bucket = CacheWindowCounter(self.org, rate, self.config['CACHE'])
+        else:
+            self.bucket = TokenBucket(rate, self.config['BURST'])
+
+    def acquire(self):
+        """block until a call is allowed"""
+        while self.bucket is not None:
+            wait = self.bucket.try_acquire()
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+    def adapt(self, api_usage):
+        """adjust rate from `Sforce-Limit-Info` api usage (used, limit)"""
+        if not api_usage or not api_usage[1]:
+            return
+        used, limit = api_usage
+        remaining = max(0.0, float(limit - used) / limit)
+        min_remaining = self.config['MIN_REMAINING']
+
+        if remaining >= min_remaining:
+            rate = self.base_rate
+        else:
+            # scale down linearly as the org runs out of api calls
+            rate = max(0.1, (self.base_rate or self.config['LOW_QUOTA_RATE']) * remaining / min_remaining)
+            if self.rate == self.base_rate:
+                log.warning('[RateLimiter.%s] %s/%s api calls used, slow down to %.2f calls/s' % (
+                    self.org, used, limit, rate))
+        self.set_rate(rate)
+
+    def should_retry(self, attempt):
+        return attempt <= self.config['MAX_RETRIES']
+
+    def backoff(self, attempt):
+        """exponential backoff with full jitter"""
+        cap = min(self.config['BACKOFF_MAX'], self.config['BACKOFF_BASE'] * 2 ** attempt)
+        wait = random.uniform(0, cap)
+        log.warning('[RateLimiter.%s] throttled by salesforce, retry #%s in %.2fs' % (self.org, attempt, wait))
+        time.sleep(wait)
+
+
+def get_rate_limiter(org=DEFAULT_ORG):
+    """get shared limiter of an org, configured by `settings.SALESFORCE_RATE_LIMITS[org]`"""
+    limiter = _limiters.get(org)
+    if limiter is None:
+        with _limiters_lock:
+            limiter = _limiters.get(org)
+            if limiter is None:
+                config = getattr(settings, 'SALESFORCE_RATE_LIMITS', {}).get(org, {})
+                limiter = _limiters[org] = RateLimiter(org, **config)
+    return limiter
@@ -0,0 +1,209 @@
+"""read-through cache of SalesforceClient.get(), get_by_custom_id() and query(), off unless configured
+
+    SALESFORCE_READ_CACHE = {
+        'BACKEND': 'locmem',  # LRU in this process, or 'django' for a django cache shared by processes
+        'LOCATION': 'default',  # django cache alias
+        'TTL': 30,  # seconds a response is served without asking salesforce
+        'MAX_ENTRIES': 1000,  # locmem only, least recently used entries are evicted
+    }
+
+writes of SalesforceClient forget every cached read of their table, queries are cached under the table
+after FROM, so a write to a parent does not refresh queries filtering on its relationship fields until TTL
+"""
+import copy
+import hashlib
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+log = logging.getLogger(__name__)
+log.setLevel(logging.INFO)
+
+DEFAULT_CONFIG = {
+    'BACKEND': 'locmem',
+    'LOCATION': 'default',
+    'TTL': 30,
+    'MAX_ENTRIES': 1000,
+}
+KEY_PREFIX = 'simple_django_salesforce:read'
+# the cache can not tell a 304 from its record, which may be older than the caller's copy
+CONDITIONAL_HEADERS = ('if-modified-since', 'if-none-match', 'if-match', 'if-unmodified-since')
+FROM_RE = re.compile(r'\bFROM\s+(\w+)', re.IGNORECASE)
+PARENTHESES_RE = re.compile(r'\([^()]*\)')
+SPACES_RE = re.compile(r'\s+')
+
+
+def normalize_soql(sql):
+    return SPACES_RE.sub(' ', sql).strip()
+
+
+def get_header_parts(headers):
+    """key parts of request headers changing the response"""
+    return tuple(sorted((k.lower(), v) for k, v in (headers or {}).items()))
+
+
+def is_conditional(headers):
+    """conditional reads are not cached, they go to salesforce"""
+    return any(k.lower() in CONDITIONAL_HEADERS for k in (headers or {}))
+
+
+def get_soql_table(sql):
+    """table of the outer FROM, subqueries in parentheses are skipped"""
+    previous = None
+    while previous != sql:
+        previous, sql = sql, PARENTHESES_RE.sub('', sql)
+    match = FROM_RE.search(sql)
+    return match.group(1) if match else None
+
+
+class LocMemStorage(object):
+    """LRU dict with expiring entries, values are copied in and out"""
+
+    def __init__(self, max_entries=DEFAULT_CONFIG['MAX_ENTRIES']):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.generations = {}
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expire_at, value = entry
+            if expire_at < time.time():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+        return copy.deepcopy(value)
+
+    def set(self, key, value, ttl):
+        value = copy.deepcopy(value)
+        with self.lock:
+            self.entries[key] = (time.time() + ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def get_generation(self, key):
+        return self.generations.get(key, 1)
+
+    def incr_generation(self, key):
+        with self.lock:
+            self.generations[key] = self.generations.get(key, 1) + 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+class DjangoCacheStorage(object):
+    """entries in a django cache, eviction is left to the cache backend"""
+
+    def __init__(self, alias='default'):
+        self.alias = alias
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def get(self, key):
+        return self.cache.get(key)
+
+    def set(self, key, value, ttl):
+        self.cache.set(key, value, ttl)
+
+    def get_generation(self, key):
+        generation = self.cache.get(key)
+        if generation is None:
+            self.cache.add(key, 1, None)
+            generation = self.cache.get(key, 1)
+        return generation
+
+    def incr_generation(self, key):
+        try:
+            self.cache.incr(key)
+        except ValueError:
+            self.cache.set(key, 2, None)
+
+    def clear(self):
+        self.incr_generation('%s:all' % KEY_PREFIX)
+
+
+class ReadCache(object):
+    """responses keyed by connection, table and a generation bumped by writes to the table"""
+
+    def __init__(self, storage, ttl=DEFAULT_CONFIG['TTL']):
+        self.storage = storage
+        self.ttl = ttl
+
+    def get_generation_key(self, using, table_name):
+        return '%s:%s:%s:generation' % (KEY_PREFIX, using, (table_name or '').lower())
+
+    def make_key(self, using, table_name, kind, *parts):
+        digest = hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()
+        return '%s:%s:%s:%s:%s:%s:%s' % (
+            KEY_PREFIX, self.storage.get_generation('%s:all' % KEY_PREFIX), using, (table_name or '').lower(),
+            self.storage.get_generation(self.get_generation_key(using, table_name)), kind, digest)
+
+    def get(self, using, table_name, kind, parts, fetch):
+        """cached result of `fetch()`, bypassed when offline"""
+        if getattr(settings, 'SALESFORCE_OFFLINE', False):
+            return fetch()
+        key = self.make_key(using, table_name, kind, *parts)
+        value = self.storage.get(key)
+        if value is not None:
+            log.debug('[ReadCache] hit %s.%s %s' % (table_name, kind, parts))
+            return value
+        value = fetch()
+        if value is not None:
+            self.storage.set(key, value, self.ttl)
+        return value
+
+    def get_query(self, using, sql, fetch):
+        sql = normalize_soql(sql)
+        return self.get(using, get_soql_table(sql), 'query', (sql,), fetch)
+
+    def invalidate(self, using, table_name=None):
+        """forget reads of a table, or everything without table_name"""
+        if table_name is None:
+            self.storage.clear()
+        else:
+            self.storage.incr_generation(self.get_generation_key(using, table_name))
+
+
+_read_cache = None
+_read_cache_lock = threading.Lock()
+
+
+def get_read_cache():
+    """shared cache configured by `settings.SALESFORCE_READ_CACHE`, None when not configured"""
+    global _read_cache
+    config = getattr(settings, 'SALESFORCE_READ_CACHE', None)
+    if not config:
+        return None
+    if _read_cache is None:
+        with _read_cache_lock:
+            if _read_cache is None:
+                config = dict(DEFAULT_CONFIG, **config)
+                if config['BACKEND'] == 'django':
+                    storage = DjangoCacheStorage(config['LOCATION'])
+                else:
+                    storage = LocMemStorage(config['MAX_ENTRIES'])
+                _read_cache = ReadCache(storage, config['TTL'])
+    return _read_cache
+
+
+def invalidate(table_name=None, using=None):
+    """forget cached reads of a table, or all of them"""
+    cache = get_read_cache()
+    if cache is None:
+        return
+    from .connections import connections
+
+    cache.invalidate(connections.get_alias(using), table_name)
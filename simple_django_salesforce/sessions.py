@@ -0,0 +1,114 @@
+"""login sessions shared by the processes of a deployment through a django cache, off unless configured
+
+    SALESFORCE_SESSION_CACHE = {
+        'LOCATION': 'default',  # django cache alias reachable by every process, eg. redis or memcached
+        'TTL': 6600,  # seconds a session is reused, below the session timeout of the org
+        'LOCK_TIMEOUT': 30,  # seconds other processes wait for the one logging in
+    }
+
+the first process missing a session logs in while holding a `cache.add()` lock, the others wait for its
+session; a session rejected as expired is dropped from the cache, so the next caller logs in again.
+django caches have no atomic compare and delete, so the lock is only deleted while it can not have expired
+yet and been taken by another process, a login slower than that leaves it to expire.
+sessions are bearer tokens, the cache must not be reachable by anything less trusted than the app
+"""
+import hashlib
+import logging
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+
+log = logging.getLogger(__name__)
+log.setLevel(logging.INFO)
+
+DEFAULT_CONFIG = {
+    'LOCATION': 'default',
+    'TTL': 110 * 60,  # salesforce's default session timeout is 2hr
+    'LOCK_TIMEOUT': 30,
+}
+KEY_PREFIX = 'simple_django_salesforce:session'
+POLL_INTERVAL = 0.2
+RELEASE_MARGIN = 2  # seconds, memcached expires on whole seconds and the release takes two calls
+
+
+class SessionCache(object):
+    """sessions keyed by connection alias, kind ('api' or 'chatter') and login identity"""
+
+    def __init__(self, alias='default', ttl=DEFAULT_CONFIG['TTL'], lock_timeout=DEFAULT_CONFIG['LOCK_TIMEOUT']):
+        self.alias = alias
+        self.ttl = ttl
+        self.lock_timeout = lock_timeout
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def make_key(self, using, kind, identity):
+        # a changed username or login url does not reuse the session of the previous one
+        digest = hashlib.sha1(repr(identity).encode('utf-8')).hexdigest()
+        return '%s:%s:%s:%s' % (KEY_PREFIX, using, kind, digest)
+
+    def get(self, using, kind, identity, login):
+        """cached session, else `login()` in one process while the others wait for its result"""
+        key = self.make_key(using, kind, identity)
+        session = self.cache.get(key)
+        if session is not None:
+            return session
+
+        lock_key, owner = '%s:lock' % key, uuid.uuid4().hex
+        deadline = time.time() + self.lock_timeout
+        locked_at = time.monotonic()  # before add(), the lock expires lock_timeout after it at the earliest
+        while not self.cache.add(lock_key, owner, self.lock_timeout):
+            time.sleep(POLL_INTERVAL)
+            locked_at = time.monotonic()
+            session = self.cache.get(key)
+            if session is not None:
+                return session
+            if time.time() >= deadline:
+                log.warning('[SessionCache] %s %s login lock not released, login without it' % (using, kind))
+                return login()
+        try:
+            session = self.cache.get(key)  # logged in by the previous lock holder
+            if session is None:
+                log.info('[SessionCache] %s %s login' % (using, kind))
+                session = login()
+                self.cache.set(key, session, self.ttl)
+            return session
+        finally:
+            self.release(lock_key, owner, locked_at)
+
+    def release(self, lock_key, owner, locked_at):
+        """delete the login lock while it is surely still ours"""
+        if time.monotonic() - locked_at > self.lock_timeout - RELEASE_MARGIN:
+            log.warning('[SessionCache] slow login, %s left to expire' % lock_key)
+            return
+        if self.cache.get(lock_key) == owner:
+            self.cache.delete(lock_key)
+
+    def invalidate(self, using, kind, identity, token, token_field):
+        """drop the cached session if it still holds the rejected `token`, a newer one is kept"""
+        key = self.make_key(using, kind, identity)
+        session = self.cache.get(key)
+        if session is not None and session.get(token_field) == token:
+            self.cache.delete(key)
+
+
+_session_cache = None
+_session_cache_lock = threading.Lock()
+
+
+def get_session_cache():
+    """shared cache configured by `settings.SALESFORCE_SESSION_CACHE`, None when not configured"""
+    global _session_cache
+    config = getattr(settings, 'SALESFORCE_SESSION_CACHE', None)
+    if not config:
+        return None
+    if _session_cache is None:
+        with _session_cache_lock:
+            if _session_cache is None:
+                config = dict(DEFAULT_CONFIG, **config)
+                _session_cache = SessionCache(config['LOCATION'], config['TTL'], config['LOCK_TIMEOUT'])
+    return _session_cache
@@ -0,0 +1,275 @@
+"""Change Data Capture consumer over the CometD streaming api"""
+import itertools
+import logging
+import time
+
+import requests
+from django.db import transaction
+
+from .client import SalesforceClient, get_salesforce_connection, reconnect
+from .connections import DEFAULT_CONNECTION, connections
+from .models import StreamReplayId
+
+log = logging.getLogger(__name__)
+log.setLevel(logging.INFO)
+
+DEFAULT_STREAMING_API_VERSION = '45.0'  # change data capture needs v44.0+
+REPLAY_NEW = -1  # only events after subscribing
+REPLAY_ALL = -2  # all events in the 72 hours retention window
+DELETE_CHANGE_TYPES = ('DELETE',)
+GAP_OVERFLOW = 'GAP_OVERFLOW'  # too many changes in one transaction, the table must be pulled again
+
+
+class StreamingError(Exception):
+    pass
+
+
+class StreamingClient(object):
+    """minimal long polling bayeux client for the salesforce streaming api"""
+
+    def __init__(self, instance_url, session_id, version=DEFAULT_STREAMING_API_VERSION, session=None,
+                 timeout=120):
+        self.url = '%s/cometd/%s/' % (instance_url.rstrip('/'), version)
+        self.session_id = session_id
+        self.session = session or requests.Session()
+        self.timeout = timeout
+        self.client_id = None
+        self.message_ids = itertools.count(1)
+
+    @classmethod
+    def from_salesforce(cls, salesforce_client, **kwargs):
+        """use the session of a simple_salesforce client"""
+        return cls('https://%s' % salesforce_client.sf_instance, salesforce_client.session_id,
+                   session=salesforce_client.session, **kwargs)
+
+    def send(self, *messages):
+        for message in messages:
+            message['id'] = str(next(self.message_ids))
+            if self.client_id:
+                message['clientId'] = self.client_id
+        headers = {'Authorization': 'OAuth %s' % self.session_id, 'Content-Type': 'application/json'}
+        r = self.session.post(self.url, json=list(messages), headers=headers, timeout=self.timeout)
+        if r.status_code == 401:
+            raise StreamingError('401 session expired')
+        if r.status_code > 299:
+            raise StreamingError('%s %s' % (r.status_code, r.text))
+        return r.json()
+
+    def handshake(self):
+        self.client_id = None
+        response = self.send({'channel': '/meta/handshake', 'version': '1.0', 'minimumVersion': '1.0',
+                              'supportedConnectionTypes': ['long-polling'], 'ext': {'replay': True}})[0]
+        if not response.get('successful'):
+            raise StreamingError('handshake failed: %s' % response.get('error'))
+        self.client_id = response['clientId']
+
+    def subscribe(self, channel, replay_id=REPLAY_NEW):
+        response = self.send({'channel': '/meta/subscribe', 'subscription': channel,
+                              'ext': {'replay': {channel: replay_id}}})[0]
+        if not response.get('successful'):
+            raise StreamingError('subscribe %s failed: %s' % (channel, response.get('error')))
+
+    def connect(self):
+        """long poll, return (events, need_handshake)"""
+        events, need_handshake = [], False
+        for message in self.send({'channel': '/meta/connect', 'connectionType': 'long-polling'}):
+            if message.get('channel') == '/meta/connect':
+                if not message.get('successful'):
+                    need_handshake = (message.get('advice') or {}).get('reconnect') in ('handshake', 'none') \
+                                     or '403' in str(message.get('error'))
+            elif 'data' in message:
+                events.append(message)
+        return events, need_handshake
+
+    def disconnect(self):
+        if self.client_id:
+            try:
+                self.send({'channel': '/meta/disconnect'})
+            except (StreamingError, requests.RequestException):
+                pass
+            self.client_id = None
+
+
+def get_change_event_channel(table_name):
+    """`Account` -> `/data/AccountChangeEvent`, `Product__c` -> `/data/Product__ChangeEvent`"""
+    if table_name.endswith('__c'):
+        table_name = table_name[:-1]
+    return '/data/%sChangeEvent' % table_name
+
+
+def flatten_change_payload(payload):
+    """move compound fields like Contact.Name{FirstName, LastName} to top level, only keep changed fields"""
+    header = payload.get('ChangeEventHeader', {})
+    record = {}
+    for key, value in payload.items():
+        if key == 'ChangeEventHeader':
+            continue
+        if isinstance(value, dict):
+            record.update(value)
+        else:
+            record[key] = value
+
+    changed_fields = header.get('changedFields')
+    if header.get('changeType') in ('UPDATE', 'GAP_UPDATE') and changed_fields:
+        changed_fields = set(x.split('.')[-1] for x in changed_fields)
+        record = dict((k, v) for k, v in record.items() if k in changed_fields)
+    return header, record
+
+
+class ChangeEventConsumer(object):
+    """apply change data capture events of SalesforceModel subclasses to the local db
+
+        consumer = ChangeEventConsumer([Product, Account])
+        consumer.run()
+
+    using: salesforce connection alias, one consumer per org
+
+    events of a channel are applied to every model of its table, gap events carry no field values so their
+    records are pulled by id, and a gap overflow pulls the whole table
+    """
+
+    def __init__(self, models, client=None, replay=REPLAY_NEW, reconnect_delay=5, using=None):
+        self.models = {}  # channel -> [model]
+        for model in models:
+            self.models.setdefault(get_change_event_channel(model.salesforce_table_name), []).append(model)
+        self.client = client
+        self.using = connections.get_alias(using)
+        self.replay = replay
+        self.reconnect_delay = reconnect_delay
+        self.running = False
+
+    def get_client(self):
+        return StreamingClient.from_salesforce(get_salesforce_connection(self.using))
+
+    def get_replay_key(self, channel):
+        """replay ids of other orgs are stored as `alias:channel`"""
+        if self.using == DEFAULT_CONNECTION:
+            return channel
+        return '%s:%s' % (self.using, channel)
+
+    def get_replay_ids(self):
+        replay_ids = dict((channel, self.replay) for channel in self.models)
+        keys = dict((self.get_replay_key(x), x) for x in self.models)
+        for replay in StreamReplayId.objects.filter(channel__in=list(keys)):
+            replay_ids[keys[replay.channel]] = replay.replay_id
+        return replay_ids
+
+    def start(self):
+        if self.client is None:
+            self.client = self.get_client()
+        self.client.handshake()
+        for channel, replay_id in self.get_replay_ids().items():
+            self.client.subscribe(channel, replay_id)
+            log.info('[ChangeEventConsumer] subscribed %s from replay id %s' % (channel, replay_id))
+
+    def run(self, max_bursts=None):
+        """consume until stop() or max_bursts event bursts were applied, failed handshakes and connects
+        are retried after reconnect_delay"""
+        self.running = True
+        started = False
+        bursts = 0
+        try:
+            while self.running and (max_bursts is None or bursts < max_bursts):
+                try:
+                    if not started:
+                        self.start()
+                        started = True
+                    events, need_handshake = self.client.connect()
+                except (StreamingError, requests.RequestException) as ex:
+                    log.error('[ChangeEventConsumer] %s failed >> %s' % ('connect' if started else 'handshake', ex))
+                    started = False
+                    time.sleep(self.reconnect_delay)
+                    if '401' in str(ex):
+                        reconnect(self.using)
+                        self.client = None
+                    continue
+
+                if events:
+                    self.apply(events)
+                    bursts += 1
+                if need_handshake:
+                    started = False
+        finally:
+            self.running = False
+            if self.client is not None:
+                self.client.disconnect()
+        return bursts
+
+    def stop(self):
+        self.running = False
+
+    def apply(self, events):
+        """apply a burst of events, one transaction per burst, replay ids saved in the same transaction
+
+        update events only carry their changed fields, an update of a record missing locally is pulled by id,
+        a gap overflow pulls the table after the burst committed and only then saves the replay id of its channel
+        """
+        key_name = SalesforceClient.DEFAULT_SALESFORCE_KEY_NAME
+        changes = {}  # channel -> (records as (change type, data), deleted ids, ids to pull)
+        overflowed = set()  # channels to pull again
+        replay_ids = {}
+        for event in events:
+            channel = event['channel']
+            if channel not in self.models:
+                continue
+            header, record = flatten_change_payload(event['data']['payload'])
+            replay_ids[channel] = event['data']['event']['replayId']
+            change_type = header.get('changeType') or ''
+            if change_type == GAP_OVERFLOW:
+                overflowed.add(channel)
+                continue
+
+            records, deleted_ids, pull_ids = changes.setdefault(channel, ([], [], []))
+            for record_id in header.get('recordIds', []):
+                if change_type.startswith('GAP_'):
+                    pull_ids.append(record_id)  # no field values, deleted ones are found missing
+                elif change_type in DELETE_CHANGE_TYPES:
+                    deleted_ids.append(record_id)
+                else:
+                    data = dict(record)
+                    data[key_name] = record_id
+                    records.append((change_type, data))
+
+        with transaction.atomic(), connections.using(self.using):
+            for channel, (records, deleted_ids, pull_ids) in changes.items():
+                if channel in overflowed:
+                    continue
+                for model in self.models[channel]:
+                    model_records, model_pull_ids = self.get_model_changes(model, records)
+                    if model_records or deleted_ids:
+                        model.apply_remote_changes(model_records, deleted_ids)
+                    if pull_ids or model_pull_ids:
+                        model.pull_by_ids(pull_ids + model_pull_ids)
+            for channel, replay_id in replay_ids.items():
+                if channel not in overflowed:
+                    self.save_replay_id(channel, replay_id)
+
+        # outside the burst transaction, a table pull must not hold its locks or roll back with it
+        with connections.using(self.using):
+            for channel in overflowed:
+                for model in self.models[channel]:
+                    log.warning('[ChangeEventConsumer] %s overflowed, pull all %s' % (channel, model.__name__))
+                    model.pull_all()
+                self.save_replay_id(channel, replay_ids[channel])
+
+        log.info('[ChangeEventConsumer] applied %s events' % len(events))
+
+    @staticmethod
+    def get_model_changes(model, records):
+        """split (change type, data) records into the records to apply and the ids to pull: only a create
+        carries all fields, other changes of a record the model does not store yet are pulled"""
+        key_name = SalesforceClient.DEFAULT_SALESFORCE_KEY_NAME
+        salesforce_ids = [data[key_name] for change_type, data in records if change_type != 'CREATE']
+        known = set(model.objects.filter(salesforce_id__in=salesforce_ids).values_list('salesforce_id', flat=True))
+        model_records, pull_ids = [], []
+        for change_type, data in records:
+            if change_type == 'CREATE' or data[key_name] in known:
+                known.add(data[key_name])
+                model_records.append(data)
+            elif data[key_name] not in pull_ids:
+                pull_ids.append(data[key_name])
+        return model_records, pull_ids
+
+    def save_replay_id(self, channel, replay_id):
+        StreamReplayId.objects.update_or_create(channel=self.get_replay_key(channel),
+                                                defaults={'replay_id': replay_id})
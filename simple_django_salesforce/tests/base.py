@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.test import TestCase
+
+from ..benchmark.server import FakeSalesforceServer
+from ..connections import connections
+
+
+class SalesforceTestCase(TestCase):
+    """test case talking to a local stand-in of salesforce, its store is emptied before each test"""
+    page_size = 2000
+
+    @classmethod
+    def setUpClass(cls):
+        super(SalesforceTestCase, cls).setUpClass()
+        cls.server = FakeSalesforceServer(page_size=cls.page_size).start()
+        cls.addClassCleanup(cls.server.stop)
+        cls.salesforce_client = settings.SALESFORCE_CLIENT = cls.server.client()
+        settings.CHATTER_API_URL = cls.server.url
+        connections.reset()
+
+    def setUp(self):
+        self.server.salesforce.reset()
+        settings.SALESFORCE_CLIENT = self.salesforce_client
+        connections.reset()
+
+    @property
+    def store(self):
+        return self.server.store
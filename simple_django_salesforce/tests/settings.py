@@ -0,0 +1,23 @@
+"""settings of the test suite
+
+    python -m django test simple_django_salesforce.tests --settings=simple_django_salesforce.tests.settings
+
+SALESFORCE_CLIENT is set by SalesforceTestCase to a client of the local stand-in in benchmark.server
+"""
+SECRET_KEY = 'simple_django_salesforce-tests'
+DEBUG = False
+USE_TZ = True
+DATABASES = {'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'}}
+CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+INSTALLED_APPS = ['simple_django_salesforce', 'simple_django_salesforce.benchmark']
+ROOT_URLCONF = 'simple_django_salesforce.urls'
+DEFAULT_AUTO_FIELD = 'django.db.models.AutoField'
+
+SALESFORCE_OFFLINE = False
+SALESFORCE_API_USER = 'tests@example.com'
+SALESFORCE_API_PASSWORD = ''
+SALESFORCE_API_TOKEN = ''
+SALESFORCE_SANDBOX = False
+SALESFORCE_MULTICHOICE_FIELD_SEPARATOR = ';'
+CHATTER_OAUTH_CLIENT_ID = 'tests'
+CHATTER_OAUTH_CLIENT_SECRET = 'tests'
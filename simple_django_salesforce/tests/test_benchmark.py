@@ -0,0 +1,64 @@
+from collections import OrderedDict
+
+from django.test import SimpleTestCase
+
+from ..benchmark import generators, runner
+from .base import SalesforceTestCase
+
+
+def result(records_per_second, db_queries_per_record=1.0, api_calls_per_record=0.01):
+    return {'scenarios': OrderedDict([('pull_all_insert', {
+        'records_per_second': records_per_second, 'db_queries_per_record': db_queries_per_record,
+        'api_calls_per_record': api_calls_per_record})])}
+
+
+class CompareTest(SimpleTestCase):
+
+    def test_within_threshold(self):
+        lines, regressed = runner.compare(result(950), result(1000))
+
+        self.assertFalse(regressed)
+        self.assertEqual(len(lines), 1)
+
+    def test_slower(self):
+        lines, regressed = runner.compare(result(800), result(1000))
+
+        self.assertTrue(regressed)
+        self.assertIn('SLOWER', lines[0])
+
+    def test_more_queries(self):
+        lines, regressed = runner.compare(result(1000, db_queries_per_record=2.0), result(1000))
+
+        self.assertTrue(regressed)
+        self.assertIn('MORE DB_QUERIES_PER_RECORD', lines[0])
+
+    def test_new_scenario_is_skipped(self):
+        self.assertEqual(runner.compare(result(1000), {'scenarios': {}}), ([], False))
+
+
+class GeneratorsTest(SimpleTestCase):
+
+    def test_records_are_reproducible(self):
+        self.assertEqual(generators.account_records(3), generators.account_records(3))
+        self.assertNotEqual(generators.account_records(3), generators.account_records(3, seed=1))
+
+
+class FakeSalesforceTest(SalesforceTestCase):
+    page_size = 2
+
+    def test_query_is_paged(self):
+        account_ids, _ = generators.seed_store(self.store, accounts=5)
+
+        first = self.salesforce_client.query('SELECT Id FROM Account')
+        records = self.salesforce_client.query_all('SELECT Id FROM Account')['records']
+
+        self.assertEqual((first['totalSize'], len(first['records']), first['done']), (5, 2, False))
+        self.assertEqual(sorted(x['Id'] for x in records), sorted(account_ids))
+
+    def test_requests_are_counted(self):
+        account_ids, _ = generators.seed_store(self.store, accounts=1)
+        count = self.server.request_count
+
+        self.salesforce_client.Account.get(account_ids[0])
+
+        self.assertEqual(self.server.request_count, count + 1)
@@ -0,0 +1,99 @@
+import gzip
+import io
+
+from django.conf import settings
+from django.test import SimpleTestCase, override_settings
+from requests.adapters import HTTPAdapter
+from simple_salesforce import Salesforce
+
+from .. import compression, metrics
+from ..benchmark import generators
+from ..benchmark.server import SESSION_ID, LocalSession
+from ..client import SalesforceClient
+from .base import SalesforceTestCase
+
+
+class GzipStreamTest(SimpleTestCase):
+
+    def test_stream_is_compressed_by_chunks(self):
+        data = b'salesforce ' * 20000
+        stream = compression.GzipStream(io.BytesIO(data))
+
+        compressed = b''.join(stream)
+
+        self.assertEqual(gzip.decompress(compressed), data)
+        self.assertEqual((stream.size, stream.compressed_size), (len(data), len(compressed)))
+
+    def test_text_chunks(self):
+        self.assertEqual(gzip.decompress(b''.join(compression.GzipStream(['a', 'é']))), 'aé'.encode('utf-8'))
+
+
+class TransferAdapterTest(SalesforceTestCase):
+
+    def setUp(self):
+        super(TransferAdapterTest, self).setUp()
+        self.account_ids, _ = generators.seed_store(self.store, accounts=20)
+        session = LocalSession(self.server.address)
+        compression.mount_adapter(session, 2, gzip=True, min_size=100)
+        settings.SALESFORCE_CLIENT = Salesforce(instance=self.server.address, session_id=SESSION_ID, session=session)
+        self.account_client = SalesforceClient(salesforce_table_name='Account')
+
+    def test_large_bodies_are_compressed(self):
+        compressed = self.server.salesforce.compressed_requests
+
+        with metrics.collect() as stats:
+            self.account_client.update(self.account_ids[0], {'Description': 'long ' * 1000})
+
+        self.assertEqual(self.server.salesforce.compressed_requests, compressed + 1)
+        self.assertEqual(self.store.get('Account', self.account_ids[0])['Description'], 'long ' * 1000)
+        sent, uncompressed, received, decoded = stats.transfer
+        self.assertEqual(uncompressed, len('{"Description": "%s"}' % ('long ' * 1000)))
+        self.assertLess(sent, uncompressed / 10)
+
+    def test_small_bodies_are_sent_as_is(self):
+        compressed = self.server.salesforce.compressed_requests
+
+        with metrics.collect() as stats:
+            self.account_client.update(self.account_ids[0], {'Name': 'Short'})
+
+        self.assertEqual(self.server.salesforce.compressed_requests, compressed)
+        self.assertEqual(stats.transfer[0], stats.transfer[1])
+
+    def test_responses_are_compressed(self):
+        with metrics.collect() as stats:
+            records = self.account_client.query_all('SELECT Id, Name, Description FROM Account')['records']
+
+        self.assertEqual(len(records), 20)
+        sent, uncompressed, received, decoded = stats.transfer
+        self.assertLess(received, decoded)
+
+
+class LegacyClientTest(SalesforceTestCase):
+
+    def setUp(self):
+        super(LegacyClientTest, self).setUp()
+        self.account_ids, _ = generators.seed_store(self.store, accounts=3)
+        self.account_client = SalesforceClient(salesforce_table_name='Account')
+
+    @override_settings(SALESFORCE_GZIP=True)
+    def test_settings_client_reports_transfer(self):
+        settings.SALESFORCE_CLIENT = self.server.client()
+        compressed = self.server.salesforce.compressed_requests
+
+        with metrics.collect() as stats:
+            self.account_client.update(self.account_ids[0], {'Description': 'long ' * 1000})
+
+        self.assertIsInstance(settings.SALESFORCE_CLIENT.session.get_adapter('https://'),
+                              compression.TransferAdapter)
+        self.assertEqual(self.server.salesforce.compressed_requests, compressed + 1)
+        self.assertIsNotNone(stats.transfer)
+
+    def test_adapters_of_the_application_are_kept(self):
+        client = settings.SALESFORCE_CLIENT = self.server.client()
+        adapter = type('RetryAdapter', (HTTPAdapter,), {})()
+        client.session.mount('https://', adapter)
+        client.session.mount('http://', adapter)
+
+        self.account_client.get(self.account_ids[0], use_cache=False)
+
+        self.assertIs(client.session.get_adapter('https://'), adapter)
@@ -0,0 +1,105 @@
+from unittest import mock
+
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase, override_settings
+
+from ..benchmark import generators
+from ..benchmark.models import BenchmarkAccount
+from ..benchmark.server import SESSION_ID, FakeSalesforceServer, LocalSession
+from ..client import SalesforceClient
+from ..connections import DEFAULT_CONNECTION, Connection, connections
+from ..models import SyncRun
+from .base import SalesforceTestCase
+
+
+class ConfigTest(SimpleTestCase):
+
+    def setUp(self):
+        connections.reset()
+        self.addCleanup(connections.reset)
+
+    def test_default_uses_legacy_settings(self):
+        config, legacy = connections.get_config(DEFAULT_CONNECTION)
+
+        self.assertTrue(legacy)
+        self.assertEqual(config['USERNAME'], 'tests@example.com')
+
+    def test_unknown_alias(self):
+        with self.assertRaises(ImproperlyConfigured):
+            connections['partner']
+        with override_settings(SALESFORCE_CONNECTIONS={'default': {}}), self.assertRaises(ImproperlyConfigured):
+            connections['partner']
+
+    @override_settings(SALESFORCE_CONNECTIONS={'default': {}, 'partner': {}})
+    def test_using_blocks_nest(self):
+        self.assertEqual(connections.get_alias(), DEFAULT_CONNECTION)
+        with connections.using('partner'):
+            self.assertEqual(connections.get_alias(), 'partner')
+            with connections.using(None):
+                self.assertEqual(connections.get_alias(), 'partner')
+            with connections.using('default'):
+                self.assertIs(connections[None], connections['default'])
+            self.assertIs(connections[None], connections['partner'])
+        self.assertEqual(connections.get_alias('partner'), 'partner')
+        self.assertEqual([x.alias for x in connections.all()], ['default', 'partner'])
+
+    def test_expired_client_logs_in_once(self):
+        connection = Connection('tests', {})
+        expired = object()
+        connection.set_client(expired)
+
+        with mock.patch.object(connection, 'login', side_effect=lambda: object()) as login:
+            client = connection.reconnect(expired=expired)
+            self.assertIs(connection.reconnect(expired=expired), client)  # a thread late with the same failure
+        self.assertEqual(login.call_count, 1)
+
+
+class PartnerConnectionTest(SalesforceTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super(PartnerConnectionTest, cls).setUpClass()
+        cls.partner = FakeSalesforceServer().start()
+        cls.addClassCleanup(cls.partner.stop)
+
+    def setUp(self):
+        super(PartnerConnectionTest, self).setUp()
+        self.partner.salesforce.reset()
+        self.partner_ids, _ = generators.seed_store(self.partner.store, accounts=2)
+        self.partner.store.update('Account', self.partner_ids[0], {'Name': 'Partner'})
+        self.account_ids, _ = generators.seed_store(self.store, accounts=3)
+        options = {'session_id': SESSION_ID, 'instance': self.partner.address,
+                   'session': LocalSession(self.partner.address)}
+        settings = override_settings(SALESFORCE_CONNECTIONS={
+            'default': {'OPTIONS': dict(options, instance=self.server.address,
+                                        session=LocalSession(self.server.address))},
+            'partner': {'OPTIONS': options}})
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.addCleanup(connections.reset)
+        connections.reset()
+
+    def test_connections_are_separate(self):
+        self.assertIsNot(connections['default'].client, connections['partner'].client)
+        self.assertEqual(SalesforceClient(salesforce_table_name='Account', using='partner').get(
+            self.partner_ids[0])['Name'], 'Partner')
+        with connections.using('partner'):
+            self.assertEqual(SalesforceClient(salesforce_table_name='Account').get(
+                self.partner_ids[0])['Name'], 'Partner')
+        self.assertNotEqual(SalesforceClient(salesforce_table_name='Account').get(
+            self.account_ids[0])['Name'], 'Partner')
+
+    def test_pull_all_using(self):
+        existed, new, deleted = BenchmarkAccount.pull_all(using='partner', checkpoint=True)
+
+        self.assertEqual(len(new), 2)
+        self.assertEqual(BenchmarkAccount.objects.get(salesforce_id=self.partner_ids[0]).name, 'Partner')
+        self.assertEqual(SyncRun.objects.get().model, 'benchmark.BenchmarkAccount@partner')
+        BenchmarkAccount.pull_all()
+        self.assertEqual(BenchmarkAccount.objects.count(), 3)
+
+    def test_salesforce_using(self):
+        with mock.patch.object(BenchmarkAccount, 'salesforce_using', 'partner'):
+            BenchmarkAccount.pull_all()
+
+        self.assertEqual(BenchmarkAccount.objects.count(), 2)
@@ -0,0 +1,132 @@
+import io
+import json
+import pickle
+from unittest import mock
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase
+from simple_salesforce import Salesforce
+
+from .. import client as client_module, compression, decoder, metrics
+from ..benchmark import generators
+from ..benchmark.server import LocalSession, SESSION_ID
+from ..client import SalesforceClient
+from ..decoder import Columns, Missing, Row
+from .base import SalesforceTestCase
+
+PAGE = {
+    'totalSize': 2,
+    'done': False,
+    'nextRecordsUrl': '/services/data/v38.0/query/01gFAKE-2000',
+    'records': [
+        {'attributes': {'type': 'Contact', 'url': '/x'}, 'Id': '003A', 'IsDeleted': False, 'LastName': 'Lovelace',
+         'Email': None, 'Account': {'attributes': {'type': 'Account'}, 'Id': '001A', 'Name': 'ACME'},
+         'Phone': '1'},
+        {'attributes': {'type': 'Contact'}, 'Id': '003B', 'IsDeleted': True, 'Account': None,
+         'Cases': {'totalSize': 1, 'done': True, 'records': [{'Id': '500A', 'Tags': [1, [2]]}]}},
+    ],
+}
+
+
+class RowTest(SimpleTestCase):
+
+    def setUp(self):
+        self.columns = Columns(['Id', 'Name', 'Id', 'Email'])
+
+    def test_columns_drop_duplicates(self):
+        self.assertEqual(self.columns.names, ('Id', 'Name', 'Email'))
+        self.assertEqual(len(self.columns), 3)
+
+    def test_row_is_a_mapping_of_present_columns(self):
+        row = self.columns.make_row({'Id': '1', 'Email': None, 'Other': 'x'})
+
+        self.assertEqual(dict(row), {'Id': '1', 'Email': None})
+        self.assertEqual(len(row), 2)
+        self.assertEqual(row.get('Name', 'default'), 'default')
+        self.assertNotIn('Other', row)
+        with self.assertRaises(KeyError):
+            row['Name']
+
+    def test_rows_pickle_with_the_missing_marker(self):
+        row = pickle.loads(pickle.dumps(self.columns.make_row({'Id': '1'})))
+
+        self.assertEqual(row.values, ('1', Missing, Missing))
+        self.assertEqual(row.columns.positions, {'Id': 0, 'Name': 1, 'Email': 2})
+        self.assertEqual(dict(row), {'Id': '1'})
+
+
+class ParseStreamTest(SimpleTestCase):
+
+    def setUp(self):
+        if decoder.ijson is None:
+            self.skipTest('ijson is not installed')
+        self.columns = Columns(['Id', 'IsDeleted', 'LastName', 'Email', 'Account', 'Cases'])
+
+    def parse(self, data):
+        return decoder.parse_stream(io.BytesIO(json.dumps(data).encode('utf-8')), self.columns)
+
+    def test_same_as_projected_json(self):
+        self.assertEqual(self.parse(PAGE), decoder.project(PAGE, self.columns))
+
+    def test_page_keys_and_rows(self):
+        page = self.parse(PAGE)
+
+        self.assertEqual((page['totalSize'], page['done'], page['nextRecordsUrl']),
+                         (2, False, PAGE['nextRecordsUrl']))
+        first, second = page['records']
+        self.assertEqual(dict(first), {'Id': '003A', 'IsDeleted': False, 'LastName': 'Lovelace', 'Email': None,
+                                       'Account': PAGE['records'][0]['Account']})
+        self.assertEqual(second['Cases']['records'][0]['Tags'], [1, [2]])
+        self.assertIsNone(second['Account'])
+        self.assertNotIn('LastName', second)
+
+    def test_numbers_are_floats(self):
+        page = self.parse({'done': True, 'records': [{'Id': '1', 'LastName': 0.1}]})
+
+        self.assertIs(type(page['records'][0]['LastName']), float)
+
+    def test_empty_page(self):
+        self.assertEqual(self.parse({'totalSize': 0, 'done': True, 'records': []}),
+                         {'totalSize': 0, 'done': True, 'records': []})
+
+
+class QueryRowsTest(SalesforceTestCase):
+    page_size = 2
+
+    def setUp(self):
+        super(QueryRowsTest, self).setUp()
+        self.account_ids, _ = generators.seed_store(self.store, accounts=3)
+        self.columns = Columns(['Id', 'Name'])
+
+    def test_query_all_rows(self):
+        client = SalesforceClient(salesforce_table_name='Account')
+
+        data = client.query_all_rows('SELECT Id, Name, Industry FROM Account', self.columns)
+
+        self.assertEqual(len(data['records']), 3)
+        self.assertEqual(sorted(x['Id'] for x in data['records']), sorted(self.account_ids))
+        self.assertTrue(all(isinstance(x, Row) and 'Industry' not in x for x in data['records']))
+
+    def test_streamed_bytes_are_counted(self):
+        session = LocalSession(self.server.address)
+        compression.mount_adapter(session, 1, gzip=True)
+        settings.SALESFORCE_CLIENT = Salesforce(instance=self.server.address, session_id=SESSION_ID, version='38.0',
+                                                session=session)
+        client = SalesforceClient(salesforce_table_name='Account')
+
+        with metrics.collect() as stats:
+            client.query_rows('SELECT Id, Name FROM Account', self.columns)
+
+        self.assertGreater(stats.transfer[2], 0)
+        self.assertGreater(stats.transfer[3], 0)
+
+    def test_unsupported_simple_salesforce_fails_clearly(self):
+        client = SalesforceClient(salesforce_table_name='Account')
+
+        with mock.patch.object(client_module, 'get_simple_salesforce_version', return_value=(0, 74, 1)):
+            with self.assertRaisesRegex(ImproperlyConfigured, r'>=0\.75\.3, found 0\.74\.1'):
+                client.query_rows('SELECT Id, Name FROM Account', self.columns)
+        with mock.patch.object(type(self.salesforce_client), '_call_salesforce', None):
+            with self.assertRaises(ImproperlyConfigured):
+                client.query_rows('SELECT Id, Name FROM Account', self.columns)
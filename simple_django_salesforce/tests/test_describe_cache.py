@@ -0,0 +1,123 @@
+import shutil
+import tempfile
+import time
+from unittest import mock
+
+from django.core.cache import caches
+from django.test import SimpleTestCase, override_settings
+from simple_salesforce.exceptions import SalesforceError
+
+from .. import cache
+from ..benchmark import generators
+from ..client import SalesforceClient
+from .base import SalesforceTestCase
+
+
+class DescribeCacheTest(SimpleTestCase):
+
+    def setUp(self):
+        caches['default'].clear()
+        self.cache = cache.DescribeCache(cache.DjangoCacheStorage(), ttl=10)
+        self.calls = []
+
+    def fetch(self, headers):
+        self.calls.append(headers)
+        if headers and self.not_modified:
+            raise SalesforceError('url', 304, 'describe', None)
+        return {'fields': len(self.calls)}
+
+    def get(self, at):
+        with mock.patch('time.time', return_value=at):
+            return self.cache.get('default', 'describe', 'Account', self.fetch)
+
+    def test_fresh_entry_is_not_fetched(self):
+        self.not_modified = True
+
+        self.assertEqual(self.get(1000), {'fields': 1})
+        self.assertEqual(self.get(1005), {'fields': 1})
+        self.assertEqual(self.calls, [None])
+
+    def test_not_modified_renews_entry(self):
+        self.not_modified = True
+        self.get(1000)
+
+        self.assertEqual(self.get(1020), {'fields': 1})
+        self.assertEqual(self.calls[1], {'If-Modified-Since': 'Thu, 01 Jan 1970 00:16:40 GMT'})
+        self.assertEqual(self.get(1025), {'fields': 1})
+        self.assertEqual(len(self.calls), 2)
+
+    def test_modified_replaces_entry(self):
+        self.not_modified = False
+        self.get(1000)
+
+        self.assertEqual(self.get(1020), {'fields': 2})
+
+    def test_invalidate(self):
+        self.not_modified = True
+        self.get(1000)
+        self.cache.invalidate('Account')
+        self.assertEqual(self.get(1001), {'fields': 2})
+
+        self.cache.invalidate()
+        self.assertEqual(self.get(1002), {'fields': 3})
+        self.assertEqual(self.calls, [None, None, None])
+
+    def test_file_storage(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        storage = cache.FileStorage(directory)
+
+        storage.set('default:describe:Account', {'fetched_at': 1, 'value': [1]})
+        self.assertEqual(storage.get('default:describe:Account'), {'fetched_at': 1, 'value': [1]})
+        storage.delete('default:describe:Account')
+        self.assertIsNone(storage.get('default:describe:Account'))
+        storage.set('default:describe:Account', {})
+        storage.clear()
+        self.assertIsNone(storage.get('default:describe:Account'))
+
+
+@override_settings(SALESFORCE_DESCRIBE_CACHE={'TTL': 10})
+class ClientDescribeCacheTest(SalesforceTestCase):
+
+    def setUp(self):
+        super(ClientDescribeCacheTest, self).setUp()
+        caches['default'].clear()
+        cache._describe_cache = None
+        self.addCleanup(setattr, cache, '_describe_cache', None)
+        self.addCleanup(self.server.salesforce.schema_modified.clear)
+        generators.seed_store(self.store, accounts=1)
+        self.account_client = SalesforceClient(salesforce_table_name='Account')
+
+    def describe(self, at):
+        with mock.patch.object(cache.time, 'time', return_value=at):
+            return self.account_client.describe()
+
+    def test_describe_is_revalidated(self):
+        now = time.time()
+        self.server.salesforce.schema_modified['Account'] = now - 1000
+        describe = self.describe(now - 100)
+        count = self.server.request_count
+
+        self.assertEqual(self.describe(now - 95), describe)
+        self.assertEqual(self.server.request_count, count)
+        self.assertEqual(self.describe(now), describe)  # 304
+        self.assertEqual(self.server.request_count, count + 1)
+        self.assertEqual(self.describe(now + 5), describe)
+        self.assertEqual(self.server.request_count, count + 1)
+
+    def test_changed_schema_is_fetched(self):
+        now = time.time()
+        self.describe(now - 100)
+        self.store.insert('Account', {'Name': 'New field', 'Rating': 'Hot'})
+        self.server.salesforce.schema_modified['Account'] = now
+
+        self.assertIn('Rating', [x['name'] for x in self.describe(now)['fields']])
+
+    def test_metadata_and_use_cache(self):
+        self.account_client.metadata()
+        count = self.server.request_count
+
+        self.assertEqual(self.account_client.metadata()['objectDescribe']['name'], 'Account')
+        self.assertEqual(self.server.request_count, count)
+        self.account_client.metadata(use_cache=False)
+        self.assertEqual(self.server.request_count, count + 1)
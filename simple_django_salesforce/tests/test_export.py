@@ -0,0 +1,108 @@
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase
+
+from .. import export
+from ..benchmark import generators
+from ..client import SalesforceClient
+from .base import SalesforceTestCase
+
+DESCRIBE = {'fields': [{'name': 'Id', 'type': 'id'}, {'name': 'Name', 'type': 'string'},
+                       {'name': 'NumberOfEmployees', 'type': 'int'}, {'name': 'BillingAddress', 'type': 'address'},
+                       {'name': 'AnnualRevenue', 'type': 'currency', 'precision': 18, 'scale': 2},
+                       {'name': 'Share__c', 'type': 'percent', 'precision': 0, 'scale': 0}]}
+
+
+class ColumnsTest(SimpleTestCase):
+
+    def test_get_columns(self):
+        self.assertEqual(export.get_columns('SELECT id, NumberOfEmployees, Owner.Name, Unknown FROM Account', DESCRIBE),
+                         [('Id', export.STRING), ('NumberOfEmployees', export.INTEGER),
+                          ('Owner.Name', export.STRING), ('Unknown', export.STRING)])
+        with self.assertRaises(export.ExportError):
+            export.get_columns('SELECT Id, (SELECT Id FROM Contacts) FROM Account', DESCRIBE)
+
+    def test_get_export_sql(self):
+        self.assertEqual(export.get_export_sql('Account', DESCRIBE),
+                         'SELECT Id, Name, NumberOfEmployees, AnnualRevenue, Share__c FROM Account')
+
+    def test_currency_and_percent_are_decimals(self):
+        self.assertEqual(export.get_columns('SELECT AnnualRevenue, Share__c FROM Account', DESCRIBE),
+                         [('AnnualRevenue', (export.DECIMAL, 18, 2)), ('Share__c', export.FLOAT)])
+        self.assertEqual(export.convert(1500000.1, (export.DECIMAL, 18, 2)), Decimal('1500000.10'))
+        self.assertEqual(export.convert(0.1, (export.DECIMAL, 18, 2)), Decimal('0.10'))
+
+    def test_convert_and_get_value(self):
+        self.assertEqual(export.convert('2020-02-29', export.DATE), date(2020, 2, 29))
+        self.assertEqual(export.convert({'city': 'Oslo'}, export.STRING), '{"city": "Oslo"}')
+        self.assertIsNone(export.convert(None, export.FLOAT))
+        self.assertEqual(export.get_value({'Owner': {'name': 'Ann'}}, ['owner', 'Name']), 'Ann')
+        self.assertIsNone(export.get_value({'Owner': None}, ['Owner', 'Name']))
+
+
+@unittest.skipIf(export.pyarrow is None, 'pyarrow is not installed')
+class ExportTest(SalesforceTestCase):
+    page_size = 2
+
+    def setUp(self):
+        super(ExportTest, self).setUp()
+        self.account_ids, _ = generators.seed_store(self.store, accounts=5)
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.account_client = SalesforceClient(salesforce_table_name='Account')
+
+    def test_parquet(self):
+        path = os.path.join(self.directory, 'account.parquet')
+
+        rows = self.account_client.export('SELECT Id, NumberOfEmployees, Active__c, Founded__c, LastActivity__c FROM Account',
+                                  path, batch_size=3)
+
+        table = export.pyarrow.parquet.read_table(path)
+        self.assertEqual((rows, table.num_rows), (5, 5))
+        self.assertEqual([str(x) for x in table.schema.types], ['string', 'int64', 'bool', 'date32[day]',
+                                                                'timestamp[ms, tz=UTC]'])
+        remote = self.store.get('Account', self.account_ids[0])
+        first = table.to_pylist()[0]
+        self.assertEqual(first['Id'], self.account_ids[0])
+        self.assertEqual(first['NumberOfEmployees'], remote['NumberOfEmployees'])
+        self.assertEqual(first['Founded__c'].isoformat(), remote['Founded__c'])
+        self.assertEqual(first['LastActivity__c'].astimezone(timezone.utc).replace(tzinfo=None),
+                         datetime.strptime(remote['LastActivity__c'][:19], '%Y-%m-%dT%H:%M:%S'))
+
+    def test_decimal_columns_keep_exact_values(self):
+        path = os.path.join(self.directory, 'revenue.parquet')
+        writer = export.ExportWriter(path, export.get_columns('SELECT Id, AnnualRevenue FROM Account', DESCRIBE))
+        writer.write([{'Id': 'a', 'AnnualRevenue': 12345678901234.57}, {'Id': 'b', 'AnnualRevenue': None},
+                      {'Id': 'c', 'AnnualRevenue': 0.1}])
+        writer.close()
+
+        table = export.pyarrow.parquet.read_table(path)
+        self.assertEqual(str(table.schema.field('AnnualRevenue').type), 'decimal128(18, 2)')
+        self.assertEqual(table.column('AnnualRevenue').to_pylist(),
+                         [Decimal('12345678901234.57'), None, Decimal('0.10')])
+
+    def test_arrow_of_all_fields(self):
+        path = os.path.join(self.directory, 'account.arrow')
+
+        rows = self.account_client.export(None, path, format=export.ARROW)
+
+        table = export.pyarrow.ipc.open_file(path).read_all()
+        self.assertEqual((rows, table.num_rows), (5, 5))
+        self.assertIn('Name', table.column_names)
+
+    def test_sf_export_command(self):
+        path = os.path.join(self.directory, 'account.parquet')
+        out = StringIO()
+
+        call_command('sf_export', 'Account', path, '--soql', 'SELECT Id FROM Account', stdout=out)
+
+        self.assertIn('5 rows written', out.getvalue())
+        with self.assertRaises(CommandError):
+            call_command('sf_export', 'Account', path, '--soql', 'SELECT (SELECT Id FROM Contacts) FROM Account')
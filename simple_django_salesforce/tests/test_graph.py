@@ -0,0 +1,75 @@
+from ..benchmark import generators
+from ..benchmark.models import BenchmarkAccount, BenchmarkContact
+from ..graph import PushGraphError, collect_nodes, push_graph
+from .base import SalesforceTestCase
+
+
+class CollectNodesTest(SalesforceTestCase):
+
+    def setUp(self):
+        super(CollectNodesTest, self).setUp()
+        self.account = BenchmarkAccount.objects.create(name='ACME')
+        self.contacts = [BenchmarkContact.objects.create(account=self.account, last_name='Doe %s' % i)
+                         for i in range(2)]
+
+    def test_parents_first_once(self):
+        nodes = collect_nodes(self.contacts)
+
+        self.assertEqual(list(nodes.values()), [self.account] + self.contacts)
+
+    def test_synced_parents_are_left_out(self):
+        self.account.salesforce_id = '001000000000001AAA'
+
+        self.assertEqual(list(collect_nodes(self.contacts[:1]).values()), self.contacts[:1])
+
+    def test_unsaved_objects(self):
+        with self.assertRaises(PushGraphError):
+            collect_nodes([BenchmarkContact(account=self.account, last_name='Unsaved')])
+
+
+class PushGraphTest(SalesforceTestCase):
+
+    def setUp(self):
+        super(PushGraphTest, self).setUp()
+        self.account = BenchmarkAccount.objects.create(name='ACME', active=True)
+        self.contacts = [BenchmarkContact.objects.create(account=self.account, last_name='Doe %s' % i)
+                         for i in range(2)]
+
+    def test_new_records_in_one_request(self):
+        count = self.server.request_count
+
+        pushed = self.contacts[0].push_graph(self.contacts[1:])
+
+        self.assertEqual(self.server.request_count, count + 1)
+        self.assertEqual(pushed, [self.account] + self.contacts)
+        account = BenchmarkAccount.objects.get(pk=self.account.pk)
+        self.assertTrue(account.salesforce_id)
+        self.assertTrue(account.is_sync)
+        self.assertEqual(self.store.get('Account', account.salesforce_id)['Name'], 'ACME')
+        for contact in BenchmarkContact.objects.filter(pk__in=[x.pk for x in self.contacts]):
+            self.assertTrue(contact.is_sync)
+            self.assertEqual(self.store.get('Contact', contact.salesforce_id)['AccountId'], account.salesforce_id)
+
+    def test_existing_records_are_updated(self):
+        account_ids, contact_ids = generators.seed_store(self.store, accounts=1, contacts=1)
+        BenchmarkContact.objects.filter(pk=self.contacts[0].pk).update(salesforce_id=contact_ids[0])
+        self.contacts[0].refresh_from_db()
+        self.contacts[0].last_name = 'Updated'
+        self.contacts[0].save()
+
+        push_graph(self.contacts[:1])
+
+        record = self.store.get('Contact', contact_ids[0])
+        self.assertEqual(record['LastName'], 'Updated')
+        self.assertEqual(self.store.get('Account', record['AccountId'])['Name'], 'ACME')
+
+    def test_failed_graph_changes_nothing(self):
+        BenchmarkContact.objects.filter(pk=self.contacts[1].pk).update(salesforce_id='003000000000000AAA')
+        self.contacts[1].refresh_from_db()
+
+        with self.assertRaises(PushGraphError) as context:
+            push_graph(self.contacts)
+
+        self.assertEqual(context.exception.errors[0]['httpStatusCode'], 404)
+        self.assertEqual(dict(self.store.tables['Account']), {})
+        self.assertIsNone(BenchmarkAccount.objects.get(pk=self.account.pk).salesforce_id)
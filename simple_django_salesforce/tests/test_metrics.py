@@ -0,0 +1,70 @@
+from django.test import SimpleTestCase
+
+from .. import metrics
+from ..benchmark import generators
+from ..benchmark.models import BenchmarkAccount
+from ..client import SalesforceClient
+from .base import SalesforceTestCase
+
+
+class HelpersTest(SimpleTestCase):
+
+    def test_parse_limit_info(self):
+        self.assertEqual(metrics.parse_limit_info('api-usage=25/15000'), (25, 15000))
+        self.assertEqual(metrics.parse_limit_info('per-app-api-usage=1/10, api-usage=2/20'), (2, 20))
+        self.assertIsNone(metrics.parse_limit_info('api-usage=x/y'))
+        self.assertIsNone(metrics.parse_limit_info(None))
+
+    def test_get_payload_size(self):
+        self.assertEqual(metrics.get_payload_size({'Name': 'é', 'Count': 12}), 4 + 2 + 5 + 2)
+        self.assertEqual(metrics.get_payload_size([b'abc', None, object()]), 3)
+
+    def test_collector_adds_up_metrics(self):
+        with metrics.collect('run') as stats:
+            metrics.record(metrics.CallMetric('get', table='Account', latency=0.5, api_usage=(1, 10),
+                                              transfer=(1, 2, 3, 4)))
+            metrics.record(metrics.CallMetric('get', table='Account', latency=0.25, success=False, retries=2))
+        metrics.record(metrics.CallMetric('query'))  # after the block
+
+        data = stats.as_dict()
+        self.assertEqual((data['calls'], data['errors'], data['retries'], data['latency']), (2, 1, 2, 0.75))
+        self.assertEqual(data['api_usage'], (1, 10))
+        self.assertEqual((data['bytes_sent'], data['bytes_received_decoded']), (1, 4))
+        self.assertEqual(data['operations'], {'Account.get': {'calls': 2, 'errors': 1, 'latency': 0.75}})
+
+
+class CallMetricsTest(SalesforceTestCase):
+
+    def setUp(self):
+        super(CallMetricsTest, self).setUp()
+        self.account_ids, _ = generators.seed_store(self.store, accounts=2)
+        self.metrics = []
+        metrics.register_callback(self.metrics.append)
+        self.addCleanup(metrics.unregister_callback, self.metrics.append)
+
+    def test_calls_are_reported_to_callbacks_and_signal(self):
+        received = []
+        receiver = lambda sender, metric, **kwargs: received.append(metric)
+        metrics.salesforce_call.connect(receiver)
+        self.addCleanup(metrics.salesforce_call.disconnect, receiver)
+
+        SalesforceClient(salesforce_table_name='Account').get(self.account_ids[0])
+
+        metric = self.metrics[-1]
+        self.assertIs(received[-1], metric)
+        self.assertEqual((metric.operation, metric.table, metric.success), ('call_get', 'Account', True))
+        self.assertEqual(metric.api_usage[1], 15000)
+
+    def test_failed_calls_are_reported(self):
+        with self.assertRaises(Exception):
+            SalesforceClient(salesforce_table_name='Account').get('001000000000000AAA')
+
+        self.assertFalse(self.metrics[-1].success)
+        self.assertIsNotNone(self.metrics[-1].error)
+
+    def test_pull_all_returns_stats(self):
+        existed, new, deleted, stats = BenchmarkAccount.pull_all(return_stats=True)
+
+        self.assertEqual(len(new), 2)
+        self.assertGreaterEqual(stats.calls, 1)
+        self.assertEqual(stats.errors, 0)
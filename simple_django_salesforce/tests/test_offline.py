@@ -0,0 +1,148 @@
+from datetime import datetime, timezone
+
+from django.test import SimpleTestCase, TestCase, override_settings
+from simple_salesforce.exceptions import SalesforceMalformedRequest, SalesforceResourceNotFound
+
+from .. import client, offline
+from ..benchmark.models import BenchmarkAccount, BenchmarkContact
+from ..client import SalesforceClient
+from ..offline import SObjectStore, SOQLError, parse_soql
+
+
+class ParseSoqlTest(SimpleTestCase):
+
+    def test_fields_conditions_order_and_limit(self):
+        parsed = parse_soql("SELECT Id, Name, Account.Name FROM Contact "
+                            "WHERE Name = 'O\\'Brien' AND Amount >= 1.5 AND Id IN ('1', '2') AND IsDeleted = false "
+                            "ORDER BY Name DESC LIMIT 10")
+
+        self.assertEqual(parsed['fields'], ['Id', 'Name', 'Account.Name'])
+        self.assertEqual(parsed['table'], 'Contact')
+        self.assertEqual(parsed['conditions'], [('Name', '=', "O'Brien"), ('Amount', '>=', 1.5),
+                                                ('Id', 'IN', ['1', '2']), ('IsDeleted', '=', False)])
+        self.assertEqual((parsed['order'], parsed['descending'], parsed['limit']), ('Name', True, 10))
+
+    def test_subqueries(self):
+        parsed = parse_soql("SELECT Id, (SELECT Id, LastName FROM Contacts WHERE LastName != null) FROM Account")
+
+        self.assertEqual(parsed['fields'], ['Id'])
+        self.assertEqual(parsed['table'], 'Account')
+        self.assertEqual(parsed['subqueries'][0]['table'], 'Contacts')
+        self.assertEqual(parsed['subqueries'][0]['conditions'], [('LastName', '!=', None)])
+
+    def test_datetime_literal(self):
+        parsed = parse_soql('SELECT Id FROM Account WHERE SystemModstamp > 2020-01-02T03:04:05Z')
+
+        self.assertEqual(parsed['conditions'][0][2], datetime(2020, 1, 2, 3, 4, 5, tzinfo=timezone.utc))
+
+    def test_unsupported(self):
+        with self.assertRaises(SOQLError):
+            parse_soql('SELECT Id FROM Account GROUP BY Name')
+        with self.assertRaises(SOQLError):
+            parse_soql("SELECT Id FROM Account WHERE Name LIKE 'A%'")
+
+
+class SObjectStoreTest(SimpleTestCase):
+
+    def setUp(self):
+        self.store = SObjectStore(page_size=2)
+        self.account_id = self.store.insert('Account', {'Name': 'ACME'})
+        self.contact_ids = [self.store.insert('Contact', {'LastName': x, 'AccountId': self.account_id})
+                            for x in ('C', 'A', 'B')]
+
+    def test_insert_update_delete(self):
+        self.assertTrue(self.account_id.startswith('001'))
+        self.assertEqual(len(self.account_id), 18)
+        self.assertTrue(self.store.update('Account', self.account_id, {'Name': 'Renamed'}))
+        self.assertEqual(self.store.get('Account', self.account_id)['Name'], 'Renamed')
+
+        self.assertTrue(self.store.delete('Account', self.account_id))
+        self.assertIsNone(self.store.get('Account', self.account_id))
+        self.assertTrue(self.store.get('Account', self.account_id, include_deleted=True)['IsDeleted'])
+        self.assertFalse(self.store.update('Account', self.account_id, {'Name': 'Gone'}))
+
+    def test_upsert_by_external_id(self):
+        record_id, created = self.store.upsert('Account', 'Code__c', 'X1', {'Name': 'New'})
+        self.assertTrue(created)
+        self.assertEqual(self.store.upsert('Account', 'Code__c', 'X1', {'Name': 'Again'}), (record_id, False))
+        self.assertEqual(self.store.get('Account', record_id)['Name'], 'Again')
+
+    def test_query_conditions_and_order(self):
+        records = self.store.query("SELECT Id, LastName FROM Contact WHERE LastName != 'C' ORDER BY LastName")
+
+        self.assertEqual([x['LastName'] for x in records], ['A', 'B'])
+        self.assertEqual(records[0]['attributes']['type'], 'Contact')
+
+    def test_query_relationships(self):
+        contact = self.store.query("SELECT Account.Name FROM Contact WHERE Id = '%s'" % self.contact_ids[0])[0]
+        account = self.store.query('SELECT Id, (SELECT LastName FROM Contacts ORDER BY LastName) FROM Account')[0]
+
+        self.assertEqual(contact['Account']['Name'], 'ACME')
+        self.assertEqual(account['Contacts']['totalSize'], 3)
+
+    def test_query_pages(self):
+        page = self.store.query_page('SELECT Id FROM Contact')
+        self.assertEqual((page['totalSize'], page['done'], len(page['records'])), (3, False, 2))
+
+        page = self.store.query_more(page['nextRecordsUrl'])
+        self.assertEqual((page['done'], len(page['records'])), (True, 1))
+
+    def test_listeners(self):
+        changes = []
+        self.store.listeners.append(lambda *args: changes.append(args[:3]))
+
+        self.store.update('Account', self.account_id, {'Name': 'Renamed'})
+        self.store.delete('Account', self.account_id, hard=True)
+
+        self.assertEqual(changes, [('Account', 'UPDATE', self.account_id), ('Account', 'DELETE', self.account_id)])
+        self.assertNotIn(self.account_id, self.store.tables['Account'])
+
+
+@override_settings(SALESFORCE_OFFLINE=True)
+class OfflineModeTest(TestCase):
+
+    def setUp(self):
+        offline.reset()
+        self.addCleanup(offline.reset)
+
+    def test_push_and_pull_all(self):
+        account = BenchmarkAccount.objects.create(name='Offline', employees=3)
+        account.push()
+        self.assertEqual(offline.store.get('Account', account.salesforce_id)['Name'], 'Offline')
+
+        offline.store.insert('Contact', {'LastName': 'Remote', 'AccountId': account.salesforce_id})
+        existed, new, deleted = BenchmarkContact.pull_all()
+
+        self.assertEqual([(x.last_name, x.account_id) for x in new], [('Remote', account.pk)])
+
+    def test_errors_like_salesforce(self):
+        client = SalesforceClient(salesforce_table_name='Account')
+
+        with self.assertRaises(SalesforceResourceNotFound):
+            client.get('001000000000000AAA')
+        with self.assertRaises(SalesforceMalformedRequest):
+            client.query('SELECT Id FROM Account GROUP BY Name', use_cache=False)
+
+    def test_file_helpers_do_not_call_salesforce(self):
+        account = BenchmarkAccount.objects.create(name='Offline', salesforce_id='001000000000000AAA')
+
+        self.assertEqual(account.link_to_files('069000000000000AAA'), (True, None))
+        self.assertIsNone(account.find_attach_file_by_title('contract.pdf'))
+        self.assertIsNone(account.get_first_file_link_by_salesforce_id())
+        self.assertFalse(offline.store.tables.get('ContentDocumentLink'))
+
+
+class OfflineDecoratorTest(SimpleTestCase):
+
+    def test_deprecated_decorators_warn_and_delegate(self):
+        def call():
+            return 'online'
+
+        with self.assertWarns(DeprecationWarning):
+            self.assertIs(client.offline_decorator(call), call)
+        with self.assertWarns(DeprecationWarning):
+            decorated = client.offline_decorator2('offline')(call)
+        with override_settings(SALESFORCE_OFFLINE=True):
+            self.assertEqual(decorated(), 'offline')
+        with override_settings(SALESFORCE_OFFLINE=False):
+            self.assertEqual(decorated(), 'online')
@@ -0,0 +1,101 @@
+from datetime import date
+from decimal import Decimal
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import models
+
+from .. import parallel
+from ..benchmark import generators
+from ..benchmark.models import BenchmarkAccount, BenchmarkContact
+from ..decoder import Missing
+from .base import SalesforceTestCase
+
+
+class CustomAccount(BenchmarkAccount):
+    class Meta:
+        proxy = True
+
+    def deserialize(self, obj_data):
+        return super(CustomAccount, self).deserialize(obj_data)
+
+
+class PlanTest(SalesforceTestCase):
+
+    def test_get_plan(self):
+        fields, fks = parallel.get_plan(BenchmarkContact)
+
+        self.assertEqual(fks, [('AccountId', 'account')])
+        self.assertIn(('LastName', 'last_name', models.CharField), fields)
+        self.assertIsNone(parallel.get_plan(CustomAccount))
+
+    def test_only_parsed_columns_go_to_workers(self):
+        plan = ([('Name', 'name', models.CharField), ('AnnualRevenue', 'annual_revenue', models.DecimalField),
+                 ('Founded__c', 'founded', models.DateField)], [])
+        records = [{'Name': 'a', 'AnnualRevenue': '12.50', 'Founded__c': '2001-02-03'},
+                   {'Name': 'b', 'AnnualRevenue': '1.00'},
+                   {'Name': 'c', 'AnnualRevenue': 'not a number'}]
+
+        field_types, columns = parallel.get_columns(plan, records)
+        self.assertEqual(field_types, (models.DecimalField, models.DateField))
+        self.assertEqual(columns, [('12.50', '1.00', 'not a number'), ('2001-02-03', Missing, Missing)])
+
+        decoded, errors = parallel.decode_columns(field_types, columns)
+        self.assertEqual(decoded[0][:2], (Decimal('12.50'), Decimal('1.00')))
+        self.assertEqual(decoded[1], (date(2001, 2, 3), Missing, Missing))
+        self.assertEqual(list(errors), [2])
+
+        deserialize = parallel.Deserializer(BenchmarkAccount, plan, records, (decoded, errors))
+        account = BenchmarkAccount()
+        deserialize(account, records[1])
+        self.assertEqual((account.name, account.annual_revenue, account.founded), ('b', Decimal('1.00'), None))
+        with self.assertRaises(ValueError):
+            deserialize(BenchmarkAccount(), records[2])
+
+    def test_deserializer_resolves_foreign_keys_once(self):
+        account_ids, contact_ids = generators.seed_store(self.store, accounts=2, contacts=4)
+        BenchmarkAccount.pull_all()
+        plan = parallel.get_plan(BenchmarkContact)
+        records = [self.store.get('Contact', x) for x in contact_ids]
+        deserialize = parallel.Deserializer(BenchmarkContact, plan, records,
+                                          parallel.decode_columns(*parallel.get_columns(plan, records)))
+        contacts = [BenchmarkContact() for _ in records]
+
+        with self.assertNumQueries(1):
+            for contact, record in zip(contacts, records):
+                deserialize(contact, record)
+
+        accounts = dict(BenchmarkAccount.objects.values_list('salesforce_id', 'pk'))
+        for contact, record in zip(contacts, records):
+            self.assertEqual(contact.last_name, record['LastName'])
+            self.assertEqual(contact.account_id, accounts[record['AccountId']])
+
+    def test_workers_must_be_positive(self):
+        with self.assertRaises(ImproperlyConfigured):
+            parallel.get_executor(0)
+
+
+class ParallelPullTest(SalesforceTestCase):
+    page_size = 3
+
+    def test_pull_all_with_workers(self):
+        account_ids, contact_ids = generators.seed_store(self.store, accounts=4, contacts=8)
+        BenchmarkAccount.pull_all(workers=2)
+
+        existed, new, deleted = BenchmarkContact.pull_all(workers=2)
+        self.assertEqual(len(new), 8)
+
+        for contact in BenchmarkContact.objects.select_related('account'):
+            record = self.store.get('Contact', contact.salesforce_id)
+            self.assertEqual((contact.last_name, contact.email), (record['LastName'], record['Email']))
+            self.assertEqual(contact.account.salesforce_id, record['AccountId'])
+        for account in BenchmarkAccount.objects.all():
+            record = self.store.get('Account', account.salesforce_id)
+            self.assertEqual((account.annual_revenue, account.founded.isoformat()),
+                             (Decimal(record['AnnualRevenue']), record['Founded__c']))
+
+    def test_custom_deserialize_is_pulled_without_workers(self):
+        generators.seed_store(self.store, accounts=2)
+
+        existed, new, deleted = CustomAccount.pull_all(workers=2)
+
+        self.assertEqual(len(new), 2)
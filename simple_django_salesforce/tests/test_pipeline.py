@@ -0,0 +1,79 @@
+import time
+from unittest import mock
+
+from django.test import override_settings
+from simple_salesforce.exceptions import SalesforceError
+
+from .. import metrics, pipeline, tracing
+from ..benchmark import generators
+from ..benchmark.models import BenchmarkAccount
+from ..client import SalesforceClient
+from .base import SalesforceTestCase
+
+
+class PagePrefetcherTest(SalesforceTestCase):
+    page_size = 2
+
+    def setUp(self):
+        super(PagePrefetcherTest, self).setUp()
+        self.account_ids, _ = generators.seed_store(self.store, accounts=10)
+        self.account_client = SalesforceClient(salesforce_table_name='Account')
+
+    def test_pages_in_order(self):
+        pages = list(pipeline.PagePrefetcher(self.account_client, 'SELECT Id FROM Account ORDER BY Id'))
+
+        self.assertEqual(len(pages), 5)
+        self.assertEqual([x['Id'] for page in pages for x in page['records']], sorted(self.account_ids))
+
+    def test_prefetch_is_bounded(self):
+        count = self.server.request_count
+        pages = iter(pipeline.PagePrefetcher(self.account_client, 'SELECT Id FROM Account', prefetch=1))
+
+        next(pages)
+        time.sleep(0.3)
+
+        # one page waiting in the queue, one waiting for room
+        self.assertEqual(self.server.request_count - count, 3)
+        pages.close()
+        self.assertEqual(self.server.request_count - count, 3)
+
+    def test_errors_reach_the_consumer(self):
+        error = SalesforceError('url', 400, 'query', [])
+        with mock.patch.object(self.salesforce_client, 'query_more', side_effect=error), \
+                self.assertRaises(SalesforceError):
+            list(pipeline.PagePrefetcher(self.account_client, 'SELECT Id FROM Account'))
+
+    def test_calls_are_reported_to_the_consumer(self):
+        with metrics.collect() as stats, tracing.trace() as tracer:
+            list(pipeline.PagePrefetcher(self.account_client, 'SELECT Id FROM Account'))
+
+        self.assertEqual(stats.calls, 5)
+        self.assertEqual(tracer.stages()['fetch']['spans'], 5)
+
+
+class PipelinedPullTest(SalesforceTestCase):
+    page_size = 2
+
+    def setUp(self):
+        super(PipelinedPullTest, self).setUp()
+        self.account_ids, _ = generators.seed_store(self.store, accounts=5)
+
+    def test_pull_all(self):
+        BenchmarkAccount.pull_all()
+        self.store.delete('Account', self.account_ids[0], hard=True)
+        self.store.update('Account', self.account_ids[1], {'Name': 'Renamed'})
+
+        existed, new, deleted = BenchmarkAccount.pull_all(pipelined=True)
+
+        self.assertEqual((len(existed), len(new), len(deleted)), (4, 0, 1))
+        self.assertEqual(BenchmarkAccount.objects.get(salesforce_id=self.account_ids[1]).name, 'Renamed')
+        self.assertFalse(BenchmarkAccount.objects.filter(salesforce_id=self.account_ids[0]).exists())
+
+    @override_settings(SALESFORCE_PULL_PIPELINED=True, SALESFORCE_PULL_PREFETCH=1)
+    def test_setting(self):
+        with mock.patch.object(BenchmarkAccount, '_pull_all_pipelined',
+                               wraps=BenchmarkAccount._pull_all_pipelined) as pull:
+            existed, new, deleted = BenchmarkAccount.pull_all()
+
+        self.assertEqual(pull.call_count, 1)
+        self.assertEqual(len(new), 5)
@@ -0,0 +1,68 @@
+from decimal import Decimal
+
+from ..benchmark import generators
+from ..benchmark.models import BenchmarkAccount
+from .base import SalesforceTestCase
+
+
+class SkipUnchangedTest(SalesforceTestCase):
+
+    def setUp(self):
+        super(SkipUnchangedTest, self).setUp()
+        self.account_ids, _ = generators.seed_store(self.store, accounts=3)
+        BenchmarkAccount.pull_all()
+        self.account = BenchmarkAccount.objects.get(salesforce_id=self.account_ids[0])
+
+    def get_record(self, **fields):
+        return dict(self.store.get('Account', self.account.salesforce_id), IsDeleted=False, **fields)
+
+    def test_pull_all_skips_unchanged_rows(self):
+        self.store.update('Account', self.account_ids[1], {'Name': 'Renamed'})
+
+        existed, new, deleted = BenchmarkAccount.pull_all()
+
+        self.assertEqual(len(existed), 3)
+        self.assertEqual(BenchmarkAccount.objects.get(pk=self.account.pk).modify_at, self.account.modify_at)
+        renamed = BenchmarkAccount.objects.get(salesforce_id=self.account_ids[1])
+        self.assertEqual(renamed.name, 'Renamed')
+        self.assertTrue(renamed.is_sync)
+
+    def test_save_records_writes_changed_fields_only(self):
+        BenchmarkAccount.objects.filter(pk=self.account.pk).update(description='Local')
+
+        BenchmarkAccount._pull_records([{'Id': self.account.salesforce_id, 'IsDeleted': False, 'Name': 'Remote'}])
+
+        account = BenchmarkAccount.objects.get(pk=self.account.pk)
+        self.assertEqual((account.name, account.description), ('Remote', 'Local'))
+        self.assertGreater(account.modify_at, self.account.modify_at)
+        self.assertTrue(account.is_sync)
+
+    def test_save_records_decimal_of_float_is_unchanged(self):
+        BenchmarkAccount.objects.filter(pk=self.account.pk).update(annual_revenue=Decimal('0.10'))
+
+        BenchmarkAccount._pull_records([self.get_record(AnnualRevenue=0.1)])
+
+        self.assertEqual(BenchmarkAccount.objects.get(pk=self.account.pk).modify_at, self.account.modify_at)
+
+    def test_apply_remote_changes_returns_changed_rows_only(self):
+        changed, new = BenchmarkAccount.apply_remote_changes([
+            self.get_record(),
+            dict(self.store.get('Account', self.account_ids[1]), Name='Renamed'),
+        ])
+
+        self.assertEqual([x.salesforce_id for x in changed], [self.account_ids[1]])
+        self.assertEqual(new, [])
+        self.assertEqual(BenchmarkAccount.objects.get(pk=self.account.pk).modify_at, self.account.modify_at)
+
+    def test_apply_remote_changes_decimal_of_float_is_unchanged(self):
+        BenchmarkAccount.objects.filter(pk=self.account.pk).update(annual_revenue=Decimal('0.10'))
+
+        changed, new = BenchmarkAccount.apply_remote_changes([self.get_record(AnnualRevenue=0.1)])
+
+        self.assertEqual(changed, [])
+
+    def test_get_changed_fields(self):
+        pull_fields = [('annual_revenue', 'annual_revenue'), ('employees', 'employees'), ('name', 'name')]
+        self.account.annual_revenue, self.account.employees, self.account.name = Decimal(0.1), 7, 'Same'
+
+        self.assertEqual(self.account.get_changed_fields(pull_fields, (Decimal('0.10'), 8, 'Same')), ['employees'])
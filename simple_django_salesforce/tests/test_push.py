@@ -0,0 +1,64 @@
+from datetime import timedelta
+
+from django.db import connection
+from django.utils import timezone
+
+from ..benchmark import generators
+from ..benchmark.models import BenchmarkAccount
+from ..manager import pending_push_index
+from .base import SalesforceTestCase
+
+
+class PushPendingTest(SalesforceTestCase):
+
+    def setUp(self):
+        super(PushPendingTest, self).setUp()
+        self.account_ids, _ = generators.seed_store(self.store, accounts=3)
+        BenchmarkAccount.pull_all()
+
+    def test_pending_push(self):
+        synced, modified, _ = BenchmarkAccount.objects.order_by('pk')
+        BenchmarkAccount.objects.filter(pk=modified.pk).update(sync_at=modified.modify_at - timedelta(seconds=1))
+        new = BenchmarkAccount.objects.create(name='New')
+
+        self.assertEqual(sorted(BenchmarkAccount.objects.pending_push().values_list('pk', flat=True)),
+                         sorted([modified.pk, new.pk]))
+
+    def test_pending_push_index_backs_the_query(self):
+        index = pending_push_index('benchmark_account_pending_push')
+        queryset = BenchmarkAccount.objects.pending_push().order_by('pk')
+        with connection.cursor() as cursor:
+            cursor.execute(str(index.create_sql(BenchmarkAccount, connection.schema_editor())))
+            sql, params = queryset.query.sql_with_params()
+            cursor.execute('EXPLAIN QUERY PLAN %s' % sql, params)
+            plan = ' '.join(str(x) for x in cursor.fetchall())
+
+        self.assertIn('benchmark_account_pending_push', plan)
+
+    def test_push_pending_creates_and_updates(self):
+        account = BenchmarkAccount.objects.get(salesforce_id=self.account_ids[0])
+        account.name = 'Local'
+        account.save()
+        new = BenchmarkAccount.objects.create(name='New')
+
+        pushed, failed = BenchmarkAccount.objects.push_pending(chunk_size=1)
+
+        self.assertEqual((pushed, failed), (2, 0))
+        self.assertEqual(self.store.get('Account', account.salesforce_id)['Name'], 'Local')
+        new.refresh_from_db()
+        self.assertEqual(self.store.get('Account', new.salesforce_id)['Name'], 'New')
+        self.assertTrue(new.is_sync)
+        self.assertFalse(BenchmarkAccount.objects.pending_push().exists())
+
+    def test_push_pending_with_bulk(self):
+        BenchmarkAccount.objects.create(name='New')
+
+        self.assertEqual(BenchmarkAccount.objects.push_pending(use_bulk=True), (1, 0))
+        self.assertEqual(len(self.store.tables['Account']), 4)
+
+    def test_rows_changed_after_the_read_stay_pending(self):
+        new = BenchmarkAccount.objects.create(name='New')
+        BenchmarkAccount.objects.push_pending()
+        BenchmarkAccount.objects.filter(pk=new.pk).update(modify_at=timezone.now() + timedelta(seconds=1))
+
+        self.assertEqual(list(BenchmarkAccount.objects.pending_push()), [new])
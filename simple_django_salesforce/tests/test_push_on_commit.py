@@ -0,0 +1,77 @@
+import json
+from datetime import date
+from decimal import Decimal
+
+from django.db.models import F
+
+from ..benchmark import generators
+from ..benchmark.models import BenchmarkAccount
+from ..models import PushFailure
+from .base import SalesforceTestCase
+
+
+class PushOnCommitTest(SalesforceTestCase):
+
+    def setUp(self):
+        super(PushOnCommitTest, self).setUp()
+        self.account_ids, _ = generators.seed_store(self.store, accounts=2)
+        BenchmarkAccount.pull_all()
+        self.account = BenchmarkAccount.objects.get(salesforce_id=self.account_ids[0])
+
+    def test_push_runs_after_commit(self):
+        self.account.name = 'Committed'
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.assertIsNone(self.account.save_and_push(on_commit=True))
+            self.assertNotEqual(self.store.get('Account', self.account.salesforce_id)['Name'], 'Committed')
+
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(self.store.get('Account', self.account.salesforce_id)['Name'], 'Committed')
+        self.assertFalse(PushFailure.objects.exists())
+
+    def test_failed_push_is_recorded_and_retried(self):
+        self.store.delete('Account', self.account.salesforce_id, hard=True)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.account.save_and_push(on_commit=True)
+
+        failure = PushFailure.objects.get()
+        self.assertEqual((failure.model, failure.operation, failure.object_pk),
+                         ('benchmark.BenchmarkAccount', PushFailure.PUSH, str(self.account.pk)))
+        self.assertFalse(failure.retry())
+        self.assertEqual(PushFailure.objects.get().attempts, 2)
+
+    def test_record_encodes_decimals_and_dates(self):
+        payload = [{'Id': self.account.salesforce_id, 'AnnualRevenue': Decimal('1.50'), 'Founded__c': date(2020, 1, 2)}]
+
+        failure = PushFailure.record(BenchmarkAccount, PushFailure.BULK_UPDATE, payload, error='failed')
+
+        data = json.loads(failure.payload)[0]
+        self.assertEqual((data['AnnualRevenue'], data['Founded__c']), ('1.50', '2020-01-02'))
+
+    def test_payload_json_can_not_encode_is_not_retried(self):
+        payload = [{'Id': self.account.salesforce_id, 'NumberOfEmployees': F('employees') + 1}]
+        failure = PushFailure.record(BenchmarkAccount, PushFailure.BULK_UPDATE, payload, error='failed')
+        self.assertEqual(failure.payload, '')
+        self.assertIn('payload not recorded', failure.error)
+
+        requests = self.server.request_count
+        self.assertFalse(failure.retry())
+        self.assertEqual(self.server.request_count, requests)
+        self.assertIn('payload was not recorded', PushFailure.objects.get().error)
+
+    def test_bulk_update_pushes_decimals_and_dates(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            BenchmarkAccount.objects.filter(pk=self.account.pk).update_and_push(
+                on_commit=True, annual_revenue=Decimal('1.50'), founded=date(2020, 1, 2))
+
+        self.assertFalse(PushFailure.objects.exists())
+        record = self.store.get('Account', self.account.salesforce_id)
+        self.assertEqual((str(record['AnnualRevenue']), record['Founded__c']), ('1.50', '2020-01-02'))
+
+    def test_update_and_push_rejects_expressions(self):
+        employees = self.account.employees
+        for on_commit in (True, False):
+            with self.assertRaises(ValueError):
+                BenchmarkAccount.objects.filter(pk=self.account.pk).update_and_push(
+                    on_commit=on_commit, employees=F('employees') + 1)
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.employees, employees)
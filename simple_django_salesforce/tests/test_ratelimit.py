@@ -0,0 +1,194 @@
+from unittest import mock
+
+from django.core.cache import caches
+from django.test import SimpleTestCase, override_settings
+from simple_salesforce.exceptions import SalesforceError
+
+from .. import ratelimit
+from ..benchmark import generators
+from ..client import SalesforceClient
+from .base import SalesforceTestCase
+
+REQUEST_LIMIT_EXCEEDED = [{'errorCode': 'REQUEST_LIMIT_EXCEEDED', 'message': 'TotalRequests Limit exceeded.'}]
+SERVER_UNAVAILABLE = [{'errorCode': 'SERVER_UNAVAILABLE', 'message': 'Server unavailable.'}]
+
+
+class IsThrottledTest(SimpleTestCase):
+
+    def test_statuses(self):
+        self.assertTrue(ratelimit.is_throttled(status=429))
+        self.assertTrue(ratelimit.is_throttled(status=503))
+        self.assertTrue(ratelimit.is_throttled(status=403, content=REQUEST_LIMIT_EXCEEDED))
+        self.assertFalse(ratelimit.is_throttled(status=403, content=[{'errorCode': 'INSUFFICIENT_ACCESS'}]))
+        self.assertFalse(ratelimit.is_throttled(status=400))
+
+    def test_calls_not_idempotent_only_retry_rejected_ones(self):
+        self.assertTrue(ratelimit.is_throttled(status=429, idempotent=False))
+        self.assertTrue(ratelimit.is_throttled(status=403, content=REQUEST_LIMIT_EXCEEDED, idempotent=False))
+        self.assertFalse(ratelimit.is_throttled(status=503, idempotent=False))
+        self.assertFalse(ratelimit.is_throttled(status=403, content=SERVER_UNAVAILABLE, idempotent=False))
+
+    def test_exceptions(self):
+        self.assertTrue(ratelimit.is_throttled(SalesforceError('url', 403, 'Account', REQUEST_LIMIT_EXCEEDED)))
+        self.assertFalse(ratelimit.is_throttled(ValueError('403')))
+
+
+class TokenBucketTest(SimpleTestCase):
+
+    def test_burst_then_wait(self):
+        bucket = ratelimit.TokenBucket(rate=2, burst=3)
+
+        self.assertEqual([bucket.try_acquire() for _ in range(3)], [0, 0, 0])
+        wait = bucket.try_acquire()
+        self.assertGreater(wait, 0)
+        self.assertLessEqual(wait, 0.5)
+
+    def test_refill(self):
+        bucket = ratelimit.TokenBucket(rate=10, burst=1)
+        with mock.patch('time.monotonic', return_value=bucket.updated_at):
+            self.assertEqual(bucket.try_acquire(), 0)
+            self.assertGreater(bucket.try_acquire(), 0)
+        with mock.patch('time.monotonic', return_value=bucket.updated_at + 0.1):
+            self.assertEqual(bucket.try_acquire(), 0)
+
+    def test_cache_window_counter_is_shared(self):
+        caches['default'].clear()
+        first = ratelimit.CacheWindowCounter('tests', rate=2)
+        second = ratelimit.CacheWindowCounter('tests', rate=2)
+
+        with mock.patch('time.time', return_value=1000.0):
+            self.assertEqual([first.try_acquire(), second.try_acquire()], [0, 0])
+            self.assertEqual(first.try_acquire(), 1.0)
+        self.assertIs(ratelimit.CacheTokenBucket, ratelimit.CacheWindowCounter)
+
+    def test_cache_window_counter_allows_twice_the_rate_around_a_boundary(self):
+        caches['default'].clear()
+        counter = ratelimit.CacheWindowCounter('tests', rate=2)
+
+        with mock.patch('time.time', return_value=1000.9):
+            self.assertEqual([counter.try_acquire(), counter.try_acquire()], [0, 0])
+        with mock.patch('time.time', return_value=1001.1):
+            self.assertEqual([counter.try_acquire(), counter.try_acquire()], [0, 0])
+
+
+class RateLimiterTest(SimpleTestCase):
+
+    def test_unlimited_by_default(self):
+        limiter = ratelimit.RateLimiter('tests')
+
+        self.assertIsNone(limiter.bucket)
+        limiter.acquire()
+
+    def test_adapt_slows_down_on_low_quota(self):
+        limiter = ratelimit.RateLimiter('tests', RATE=10)
+
+        limiter.adapt((50, 100))
+        self.assertEqual(limiter.rate, 10)
+        limiter.adapt((95, 100))
+        self.assertAlmostEqual(limiter.rate, 5.0)
+        self.assertAlmostEqual(limiter.bucket.rate, 5.0)
+        limiter.adapt((100, 100))
+        self.assertEqual(limiter.rate, 0.1)
+        limiter.adapt((0, 100))  # new day
+        self.assertEqual(limiter.rate, 10)
+
+    def test_adapt_unlimited_uses_low_quota_rate(self):
+        limiter = ratelimit.RateLimiter('tests')
+
+        limiter.adapt((99, 100))
+        self.assertAlmostEqual(limiter.rate, 0.5)
+        limiter.adapt(None)
+        self.assertAlmostEqual(limiter.rate, 0.5)
+
+    def test_backoff(self):
+        limiter = ratelimit.RateLimiter('tests', MAX_RETRIES=2, BACKOFF_BASE=1, BACKOFF_MAX=3)
+
+        self.assertTrue(limiter.should_retry(2))
+        self.assertFalse(limiter.should_retry(3))
+        with mock.patch('time.sleep') as sleep:
+            for attempt in range(1, 5):
+                limiter.backoff(attempt)
+        waits = [x[0][0] for x in sleep.call_args_list]
+        self.assertTrue(all(0 <= wait <= min(3, 2 ** attempt) for attempt, wait in zip(range(1, 5), waits)))
+
+    @override_settings(SALESFORCE_RATE_LIMITS={'limited': {'RATE': 3}})
+    def test_get_rate_limiter(self):
+        ratelimit._limiters.clear()
+        self.addCleanup(ratelimit._limiters.clear)
+
+        limiter = ratelimit.get_rate_limiter('limited')
+        self.assertIs(ratelimit.get_rate_limiter('limited'), limiter)
+        self.assertEqual(limiter.rate, 3)
+        self.assertIsNone(ratelimit.get_rate_limiter().rate)
+
+
+class ThrottledCallTest(SalesforceTestCase):
+
+    def setUp(self):
+        super(ThrottledCallTest, self).setUp()
+        ratelimit._limiters.clear()
+        self.addCleanup(ratelimit._limiters.clear)
+        self.account_ids, _ = generators.seed_store(self.store, accounts=1)
+        handle_data = self.server.salesforce.handle_data
+        self.throttled = 0
+
+        self.throttle_response = (403, REQUEST_LIMIT_EXCEEDED)
+
+        def throttle(*args, **kwargs):
+            if self.throttled < self.throttle_count:
+                self.throttled += 1
+                return self.throttle_response
+            return handle_data(*args, **kwargs)
+
+        patcher = mock.patch.object(self.server.salesforce, 'handle_data', side_effect=throttle)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @mock.patch('time.sleep')
+    def test_throttled_call_is_retried(self, sleep):
+        self.throttle_count = 2
+
+        record = SalesforceClient(salesforce_table_name='Account').get(self.account_ids[0])
+
+        self.assertEqual(record['Id'], self.account_ids[0])
+        self.assertEqual(self.throttled, 2)
+        self.assertEqual(sleep.call_count, 2)
+
+    @mock.patch('time.sleep')
+    @override_settings(SALESFORCE_RATE_LIMITS={'default': {'MAX_RETRIES': 1}})
+    def test_retries_are_limited(self, sleep):
+        self.throttle_count = 5
+
+        with self.assertRaises(SalesforceError):
+            SalesforceClient(salesforce_table_name='Account').get(self.account_ids[0])
+        self.assertEqual(self.throttled, 2)
+
+    @mock.patch('time.sleep')
+    def test_unavailable_read_is_retried(self, sleep):
+        self.throttle_count, self.throttle_response = 1, (503, SERVER_UNAVAILABLE)
+
+        record = SalesforceClient(salesforce_table_name='Account').get(self.account_ids[0], use_cache=False)
+
+        self.assertEqual((record['Id'], self.throttled), (self.account_ids[0], 1))
+
+    @mock.patch('time.sleep')
+    def test_unavailable_create_is_not_retried(self, sleep):
+        self.throttle_count, self.throttle_response = 1, (503, SERVER_UNAVAILABLE)
+        client = SalesforceClient(salesforce_table_name='Account')
+
+        with self.assertRaises(SalesforceError):
+            client.create({'Name': 'Once'})
+        self.throttled = 0
+        with self.assertRaises(SalesforceError):
+            client.collection_create([{'Name': 'Once'}])
+        self.assertEqual(self.throttled, 1)
+        sleep.assert_not_called()
+
+    @mock.patch('time.sleep')
+    def test_rejected_create_is_retried(self, sleep):
+        self.throttle_count = 1
+
+        result = SalesforceClient(salesforce_table_name='Account').create({'Name': 'Once'})
+
+        self.assertEqual(self.store.get('Account', result['id'])['Name'], 'Once')
+        self.assertEqual(self.throttled, 1)
@@ -0,0 +1,162 @@
+import time
+from datetime import timedelta
+
+from django.test import SimpleTestCase, override_settings
+from django.utils import timezone
+from django.utils.http import http_date
+from simple_salesforce.exceptions import SalesforceError
+
+from .. import read_cache
+from ..benchmark import generators
+from ..benchmark.models import BenchmarkAccount
+from ..client import SalesforceClient, is_not_modified
+from ..read_cache import LocMemStorage, DjangoCacheStorage, ReadCache
+from .base import SalesforceTestCase
+
+
+class SoqlTest(SimpleTestCase):
+
+    def test_normalize_soql(self):
+        self.assertEqual(read_cache.normalize_soql(' SELECT Id\n  FROM Account '), 'SELECT Id FROM Account')
+
+    def test_get_soql_table_skips_subqueries(self):
+        self.assertEqual(read_cache.get_soql_table(
+            'SELECT Id, (SELECT Id FROM Contacts WHERE Id IN (SELECT ContactId FROM Case)) FROM Account'),
+            'Account')
+        self.assertIsNone(read_cache.get_soql_table('SELECT Id'))
+
+    def test_get_header_parts(self):
+        self.assertEqual(read_cache.get_header_parts({'Sforce-Auto-Assign': 'FALSE'}),
+                         (('sforce-auto-assign', 'FALSE'),))
+        self.assertEqual(read_cache.get_header_parts(None), ())
+
+    def test_is_conditional(self):
+        self.assertTrue(read_cache.is_conditional({'If-Modified-Since': 'x'}))
+        self.assertFalse(read_cache.is_conditional({'Sforce-Auto-Assign': 'FALSE'}))
+        self.assertFalse(read_cache.is_conditional(None))
+
+
+class ReadCacheTest(SimpleTestCase):
+
+    def get_cache(self):
+        return ReadCache(LocMemStorage(max_entries=2), ttl=30)
+
+    def test_hit_does_not_fetch(self):
+        cache, calls = self.get_cache(), []
+        fetch = lambda: calls.append(1) or {'Id': '1'}
+
+        self.assertEqual(cache.get('default', 'Account', 'get', ('1',), fetch), {'Id': '1'})
+        self.assertEqual(cache.get('default', 'Account', 'get', ('1',), fetch), {'Id': '1'})
+        self.assertEqual(len(calls), 1)
+
+    def test_values_are_copied(self):
+        cache = self.get_cache()
+        cache.get('default', 'Account', 'get', ('1',), lambda: {'Id': '1'})['Id'] = 'changed'
+
+        self.assertEqual(cache.get('default', 'Account', 'get', ('1',), lambda: None), {'Id': '1'})
+
+    def test_invalidate_table_bumps_its_generation_only(self):
+        cache = self.get_cache()
+        cache.get('default', 'Account', 'get', ('1',), lambda: 'account')
+        cache.get('default', 'Contact', 'get', ('2',), lambda: 'contact')
+
+        cache.invalidate('default', 'account')
+
+        self.assertEqual(cache.get('default', 'Account', 'get', ('1',), lambda: 'fetched'), 'fetched')
+        self.assertEqual(cache.get('default', 'Contact', 'get', ('2',), lambda: 'fetched'), 'contact')
+        self.assertEqual(cache.get('partner', 'Contact', 'get', ('2',), lambda: 'partner'), 'partner')
+
+    def test_invalidate_all(self):
+        cache = ReadCache(DjangoCacheStorage('default'))
+        cache.get('default', 'Account', 'get', ('1',), lambda: 'account')
+
+        cache.invalidate('default')
+
+        self.assertEqual(cache.get('default', 'Account', 'get', ('1',), lambda: 'fetched'), 'fetched')
+
+    def test_least_recently_used_is_evicted(self):
+        storage = LocMemStorage(max_entries=2)
+        storage.set('a', 1, 30)
+        storage.set('b', 2, 30)
+        storage.get('a')
+        storage.set('c', 3, 30)
+
+        self.assertEqual((storage.get('a'), storage.get('b'), storage.get('c')), (1, None, 3))
+
+    def test_entries_expire(self):
+        storage = LocMemStorage()
+        storage.set('a', 1, -1)
+
+        self.assertIsNone(storage.get('a'))
+
+    def test_none_is_not_cached(self):
+        cache, calls = self.get_cache(), []
+        for _ in range(2):
+            cache.get('default', 'Account', 'get', ('1',), lambda: calls.append(1))
+
+        self.assertEqual(len(calls), 2)
+
+
+@override_settings(SALESFORCE_READ_CACHE={'TTL': 30})
+class ClientReadCacheTest(SalesforceTestCase):
+
+    def setUp(self):
+        super(ClientReadCacheTest, self).setUp()
+        read_cache._read_cache = None
+        self.addCleanup(setattr, read_cache, '_read_cache', None)
+        self.account_ids, _ = generators.seed_store(self.store, accounts=2)
+        self.salesforce = SalesforceClient(salesforce_table_name='Account')
+
+    def test_get_is_cached_until_a_write(self):
+        self.salesforce.get(self.account_ids[0])
+        count = self.server.request_count
+        self.assertEqual(self.salesforce.get(self.account_ids[0])['Id'], self.account_ids[0])
+        self.assertEqual(self.server.request_count, count)
+
+        self.salesforce.update(self.account_ids[0], {'Name': 'Renamed'})
+
+        self.assertEqual(self.salesforce.get(self.account_ids[0])['Name'], 'Renamed')
+
+    def test_query_is_cached(self):
+        sql = "SELECT Id, Name FROM Account"
+        self.salesforce.query(sql)
+        count = self.server.request_count
+
+        self.assertEqual(self.salesforce.query(' %s ' % sql)['totalSize'], 2)
+        self.assertEqual(self.server.request_count, count)
+        self.salesforce.query(sql, use_cache=False)
+        self.assertEqual(self.server.request_count, count + 1)
+
+    def test_conditional_get_is_not_served_from_the_cache(self):
+        self.salesforce.get(self.account_ids[0])
+        count = self.server.request_count
+
+        with self.assertRaises(SalesforceError) as raised:
+            self.salesforce.get(self.account_ids[0], headers={'If-Modified-Since': http_date(time.time() + 3600)})
+
+        self.assertTrue(is_not_modified(raised.exception))
+        self.assertEqual(self.server.request_count, count + 1)
+
+    def test_pull_does_not_apply_a_cached_record_over_newer_data(self):
+        self.salesforce.get(self.account_ids[0])  # cached before the pull
+        BenchmarkAccount.pull_all()
+        account = BenchmarkAccount.objects.get(salesforce_id=self.account_ids[0])
+        later = timezone.now() + timedelta(hours=1)  # synced after the last remote change
+        BenchmarkAccount.objects.filter(pk=account.pk).update(name='Local', modify_at=later, sync_at=later)
+        account.refresh_from_db()
+        self.assertIsNotNone(account.get_modified_since())
+
+        account.pull()
+
+        account.refresh_from_db()
+        self.assertEqual(account.name, 'Local')
+
+    def test_not_modified_is_not_cached(self):
+        headers = {'If-Modified-Since': http_date(time.time() + 3600)}
+        with self.assertRaises(SalesforceError) as raised:
+            self.salesforce.get(self.account_ids[0], headers=headers)
+        self.assertTrue(is_not_modified(raised.exception))
+        count = self.server.request_count
+
+        self.assertEqual(self.salesforce.get(self.account_ids[0])['Id'], self.account_ids[0])
+        self.assertEqual(self.server.request_count, count + 1)
@@ -0,0 +1,73 @@
+from datetime import timedelta
+
+from django.test import override_settings
+from django.utils import timezone
+
+from ..benchmark import generators
+from ..benchmark.models import BenchmarkAccount
+from .base import SalesforceTestCase
+
+OLD_MODSTAMP = '2020-01-01T00:00:00.000+0000'
+
+
+@override_settings(SALESFORCE_PULL_CLOCK_SKEW=0)
+class ConditionalPullTest(SalesforceTestCase):
+
+    def setUp(self):
+        super(ConditionalPullTest, self).setUp()
+        self.account_ids, _ = generators.seed_store(self.store, accounts=3)
+        BenchmarkAccount.pull_all()
+        # synced a while ago, later remote changes have a newer SystemModstamp
+        now = timezone.now()
+        BenchmarkAccount.objects.update(modify_at=now - timedelta(seconds=20), sync_at=now - timedelta(seconds=10))
+        for record in self.store.tables['Account'].values():
+            record['SystemModstamp'] = OLD_MODSTAMP
+
+    def test_unchanged_record_is_not_written(self):
+        account = BenchmarkAccount.objects.get(salesforce_id=self.account_ids[0])
+        self.store.tables['Account'][self.account_ids[0]]['Name'] = 'Changed without a modstamp'
+
+        with self.assertNumQueries(0):
+            account.pull()
+
+        self.assertNotEqual(account.name, 'Changed without a modstamp')
+        account.pull(force=True)
+        self.assertEqual(BenchmarkAccount.objects.get(pk=account.pk).name, 'Changed without a modstamp')
+
+    def test_changed_record_is_pulled(self):
+        account = BenchmarkAccount.objects.get(salesforce_id=self.account_ids[0])
+        self.store.update('Account', self.account_ids[0], {'Name': 'Renamed'})
+
+        account.pull()
+
+        self.assertEqual(BenchmarkAccount.objects.get(pk=account.pk).name, 'Renamed')
+
+    def test_local_changes_are_overwritten(self):
+        account = BenchmarkAccount.objects.get(salesforce_id=self.account_ids[0])
+        BenchmarkAccount.objects.filter(pk=account.pk).update(name='Local', modify_at=timezone.now())
+        account.refresh_from_db()
+
+        account.pull()
+
+        self.assertEqual(BenchmarkAccount.objects.get(pk=account.pk).name,
+                         self.store.get('Account', self.account_ids[0])['Name'])
+
+    def test_refresh_by_ids(self):
+        self.store.update('Account', self.account_ids[0], {'Name': 'Renamed'})
+        self.store.delete('Account', self.account_ids[1], hard=True)
+        new_id = self.store.insert('Account', generators.account_records(1, seed=1)[0])
+
+        changed, new, deleted = BenchmarkAccount.refresh_by_ids(self.account_ids + [new_id])
+
+        self.assertEqual([x.salesforce_id for x in changed], [self.account_ids[0]])
+        self.assertEqual([x.salesforce_id for x in new], [new_id])
+        self.assertEqual(deleted, [self.account_ids[1]])
+        self.assertEqual(BenchmarkAccount.objects.get(salesforce_id=self.account_ids[0]).name, 'Renamed')
+        self.assertFalse(BenchmarkAccount.objects.filter(salesforce_id=self.account_ids[1]).exists())
+
+    def test_queryset_refresh(self):
+        self.store.update('Account', self.account_ids[2], {'Name': 'Renamed'})
+
+        changed, new, deleted = BenchmarkAccount.objects.all().refresh()
+
+        self.assertEqual(([x.salesforce_id for x in changed], new, deleted), ([self.account_ids[2]], [], []))
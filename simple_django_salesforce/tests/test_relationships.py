@@ -0,0 +1,51 @@
+from ..benchmark import generators
+from ..benchmark.models import (BenchmarkAccount, BenchmarkAccountWithContacts, BenchmarkContact,
+                                BenchmarkContactWithAccount)
+from .base import SalesforceTestCase
+
+
+class RelationshipQueryTest(SalesforceTestCase):
+
+    def setUp(self):
+        super(RelationshipQueryTest, self).setUp()
+        self.account_ids, self.contact_ids = generators.seed_store(self.store, accounts=3, contacts=6)
+
+    def test_pull_all_sql(self):
+        self.assertIn('Account.Id,Account.Name,', BenchmarkContactWithAccount.get_pull_all_sql())
+        self.assertNotIn('Account.IsDeleted', BenchmarkContactWithAccount.get_pull_all_sql())
+        self.assertIn(',(SELECT Id,', BenchmarkAccountWithContacts.get_pull_all_sql())
+        self.assertIn(' FROM Contacts) FROM Account', BenchmarkAccountWithContacts.get_pull_all_sql())
+
+    def test_parents_are_pulled_with_the_query(self):
+        count = self.server.request_count
+
+        existed, new, deleted = BenchmarkContactWithAccount.pull_all()
+
+        self.assertEqual(self.server.request_count, count + 1)
+        self.assertEqual(len(new), 6)
+        for contact in BenchmarkContact.objects.exclude(account=None).select_related('account'):
+            remote = self.store.get('Account', contact.account.salesforce_id)
+            self.assertEqual(contact.account.name, remote['Name'])
+            self.assertEqual(self.store.get('Contact', contact.salesforce_id)['AccountId'],
+                             contact.account.salesforce_id)
+
+    def test_existing_parents_are_updated(self):
+        BenchmarkAccount.pull_all()
+        self.store.update('Account', self.account_ids[0], {'Name': 'Renamed'})
+
+        BenchmarkContactWithAccount.pull_all()
+
+        self.assertEqual(BenchmarkAccount.objects.count(), 3)
+        self.assertEqual(BenchmarkAccount.objects.get(salesforce_id=self.account_ids[0]).name, 'Renamed')
+
+    def test_children_are_pulled_with_the_query(self):
+        count = self.server.request_count
+
+        BenchmarkAccountWithContacts.pull_all()
+
+        self.assertEqual(self.server.request_count, count + 1)
+        with_account = [x for x in self.contact_ids if self.store.get('Contact', x)['AccountId']]
+        self.assertEqual(sorted(BenchmarkContact.objects.values_list('salesforce_id', flat=True)),
+                         sorted(with_account))
+        for contact in BenchmarkContact.objects.select_related('account'):
+            self.assertEqual(contact.account.salesforce_id, self.store.get('Contact', contact.salesforce_id)['AccountId'])
@@ -0,0 +1,155 @@
+import threading
+from unittest import mock
+
+from django.core.cache import caches
+from django.test import SimpleTestCase, override_settings
+from simple_salesforce import Salesforce
+
+from .. import sessions
+from ..connections import Connection
+
+IDENTITY = ('tests@example.com', False, None)
+
+
+class SessionCacheTest(SimpleTestCase):
+
+    def setUp(self):
+        caches['default'].clear()
+        self.cache = sessions.SessionCache(ttl=60, lock_timeout=0.5)
+        self.logins = []
+        patcher = mock.patch.object(sessions, 'POLL_INTERVAL', 0.01)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def login(self):
+        self.logins.append(1)
+        return {'session_id': 'token-%s' % len(self.logins)}
+
+    def test_session_is_shared(self):
+        self.assertEqual(self.cache.get('default', 'api', IDENTITY, self.login), {'session_id': 'token-1'})
+        self.assertEqual(self.cache.get('default', 'api', IDENTITY, self.login), {'session_id': 'token-1'})
+        self.assertEqual(len(self.logins), 1)
+
+        self.cache.get('default', 'chatter', IDENTITY, self.login)
+        self.cache.get('partner', 'api', IDENTITY, self.login)
+        self.cache.get('default', 'api', ('other@example.com', False, None), self.login)
+        self.assertEqual(len(self.logins), 4)
+
+    def test_waits_for_the_login_of_another_process(self):
+        key = self.cache.make_key('default', 'api', IDENTITY)
+        caches['default'].add('%s:lock' % key, 'other', 10)
+        timer = threading.Timer(0.1, caches['default'].set, (key, {'session_id': 'other'}))
+        timer.start()
+        self.addCleanup(timer.cancel)
+
+        self.assertEqual(self.cache.get('default', 'api', IDENTITY, self.login), {'session_id': 'other'})
+        self.assertEqual(self.logins, [])
+
+    def test_lock_timeout(self):
+        key = self.cache.make_key('default', 'api', IDENTITY)
+        caches['default'].add('%s:lock' % key, 'other', 10)
+
+        self.assertEqual(self.cache.get('default', 'api', IDENTITY, self.login), {'session_id': 'token-1'})
+        self.assertEqual(caches['default'].get('%s:lock' % key), 'other')
+
+    def test_concurrent_logins(self):
+        def slow_login():
+            threading.Event().wait(0.1)
+            return self.login()
+
+        threads = [threading.Thread(target=self.cache.get, args=('default', 'api', IDENTITY, slow_login))
+                   for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(self.logins), 1)
+
+    def test_login_releases_its_lock(self):
+        session_cache = sessions.SessionCache(ttl=60, lock_timeout=30)
+        key = session_cache.make_key('default', 'api', IDENTITY)
+
+        session_cache.get('default', 'api', IDENTITY, self.login)
+
+        self.assertIsNone(caches['default'].get('%s:lock' % key))
+
+    def test_slow_login_leaves_the_lock_to_expire(self):
+        session_cache = sessions.SessionCache(ttl=60, lock_timeout=30)
+        key = session_cache.make_key('default', 'api', IDENTITY)
+        clock = [0.0]
+
+        def slow_login():
+            clock[0] += 29  # the lock may expire and be taken by another process any moment now
+            return self.login()
+
+        with mock.patch.object(sessions.time, 'monotonic', lambda: clock[0]), \
+                mock.patch.object(caches['default'], 'delete') as delete:
+            self.assertEqual(session_cache.get('default', 'api', IDENTITY, slow_login), {'session_id': 'token-1'})
+
+        delete.assert_not_called()
+        self.assertIsNotNone(caches['default'].get('%s:lock' % key))
+
+    def test_invalidate_keeps_newer_sessions(self):
+        self.cache.get('default', 'api', IDENTITY, self.login)
+
+        self.cache.invalidate('default', 'api', IDENTITY, 'token-0', 'session_id')
+        self.assertEqual(self.cache.get('default', 'api', IDENTITY, self.login), {'session_id': 'token-1'})
+        self.cache.invalidate('default', 'api', IDENTITY, 'token-1', 'session_id')
+        self.assertEqual(self.cache.get('default', 'api', IDENTITY, self.login), {'session_id': 'token-2'})
+
+    def test_get_session_cache(self):
+        self.addCleanup(setattr, sessions, '_session_cache', None)
+        sessions._session_cache = None
+        self.assertIsNone(sessions.get_session_cache())
+
+        with override_settings(SALESFORCE_SESSION_CACHE={'TTL': 10}):
+            session_cache = sessions.get_session_cache()
+        self.assertEqual((session_cache.alias, session_cache.ttl, session_cache.lock_timeout), ('default', 10, 30))
+
+
+@override_settings(SALESFORCE_SESSION_CACHE={'TTL': 60})
+class ConnectionLoginTest(SimpleTestCase):
+
+    def setUp(self):
+        caches['default'].clear()
+        sessions._session_cache = None
+        self.addCleanup(setattr, sessions, '_session_cache', None)
+        self.logins = 0
+
+    def call_login(self):
+        self.logins += 1
+        return Salesforce(instance='eu1.example.com', session_id='token-%s' % self.logins)
+
+    def connect(self):
+        """connection of another process"""
+        connection = Connection('default', {'USERNAME': 'tests@example.com', 'OPTIONS': {'version': '52.0'}})
+        connection.call_login = self.call_login
+        return connection
+
+    def test_processes_share_the_login(self):
+        first, second = self.connect(), self.connect()
+
+        self.assertEqual(first.reconnect().session_id, 'token-1')
+        client = second.reconnect()
+
+        self.assertEqual((client.session_id, client.sf_instance, client.sf_version), ('token-1', 'eu1.example.com',
+                                                                                      '52.0'))
+        self.assertIs(client.session, second.session)
+        self.assertEqual(self.logins, 1)
+
+    def test_expired_session_is_replaced(self):
+        first, second = self.connect(), self.connect()
+        expired = first.reconnect()
+        second.reconnect()
+
+        self.assertEqual(first.reconnect(expired=expired).session_id, 'token-2')
+        self.assertEqual(second.reconnect(expired=second.get_client()).session_id, 'token-2')
+        self.assertEqual(self.logins, 2)
+
+    def test_session_id_connections_do_not_share(self):
+        connection = Connection('default', {'OPTIONS': {'session_id': 'given', 'instance': 'eu1.example.com'}})
+
+        self.assertIsNone(connection.get_session_identity('api'))
+        self.assertEqual(connection.reconnect().session_id, 'given')
+        self.assertEqual(caches['default'].get(sessions.SessionCache().make_key('default', 'api', None)), None)
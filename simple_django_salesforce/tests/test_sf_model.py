@@ -0,0 +1,74 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import caches
+from django.core.management import CommandError, call_command
+
+from .. import cache
+from ..benchmark import generators
+from .base import SalesforceTestCase
+
+
+class SfModelTest(SalesforceTestCase):
+
+    def setUp(self):
+        super(SfModelTest, self).setUp()
+        caches['default'].clear()
+        cache._describe_cache = None
+        self.addCleanup(setattr, cache, '_describe_cache', None)
+        generators.seed_store(self.store, accounts=2, contacts=2)
+        self.store.insert('Widget__c', {'Name': 'Gear', 'Teeth__c': 12, 'Active__c': True})
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def call(self, *args):
+        out = StringIO()
+        call_command('sf_model', *args, stdout=out, stderr=StringIO())
+        return out.getvalue()
+
+    def test_modules_are_written(self):
+        out = self.call('Account', 'Contact', '--output-dir', self.directory, '--workers', '2')
+
+        self.assertIn('Account: %s written' % os.path.join(self.directory, 'account.py'), out)
+        with open(os.path.join(self.directory, 'contact.py')) as f:
+            module = f.read()
+        compile(module, 'contact.py', 'exec')
+        self.assertIn('class Contact(SalesforceModel):', module)
+        self.assertIn("salesforce_table_name = 'Contact'", module)
+        self.assertIn("'salesforce_id': 'Id',", module)
+        self.assertIn("'last_name': 'LastName',", module)
+
+    def test_all_custom_objects(self):
+        out = self.call('--all')
+
+        self.assertIn('class Widget__c(SalesforceModel):', out)
+        self.assertIn("'teeth__c': 'Teeth__c',", out)
+        self.assertNotIn('class Account(', out)
+
+    def test_describes_are_cached(self):
+        self.call('Account', '--cache-dir', self.directory)
+        count = self.server.request_count
+
+        self.call('Account', '--cache-dir', self.directory)
+
+        self.assertEqual(self.server.request_count, count)
+
+    def test_failed_tables_are_reported(self):
+        handle_data = self.server.salesforce.handle_data
+
+        def forbid_contact(method, path, *args):
+            if path.startswith('sobjects/Contact/'):
+                return 403, [{'errorCode': 'INSUFFICIENT_ACCESS', 'message': 'no access'}]
+            return handle_data(method, path, *args)
+
+        with mock.patch.object(self.server.salesforce, 'handle_data', forbid_contact), \
+                self.assertRaisesMessage(CommandError, '1 tables failed: Contact'):
+            self.call('Account', 'Contact', '--output-dir', self.directory)
+        self.assertTrue(os.path.exists(os.path.join(self.directory, 'account.py')))
+
+    def test_table_names_are_required(self):
+        with self.assertRaises(CommandError):
+            self.call()
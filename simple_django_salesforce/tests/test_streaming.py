@@ -0,0 +1,127 @@
+from unittest import mock
+
+from ..benchmark import generators
+from ..benchmark.models import BenchmarkAccount, BenchmarkContact, BenchmarkUniqueAccount
+from ..models import StreamReplayId
+from ..streaming import ChangeEventConsumer, StreamingClient, StreamingError, REPLAY_ALL, flatten_change_payload
+from .base import SalesforceTestCase
+
+
+class FlakyStreamingClient(StreamingClient):
+    """fails the first handshake and the first connect"""
+    failures = ('handshake', 'connect')
+
+    def __init__(self, *args, **kwargs):
+        super(FlakyStreamingClient, self).__init__(*args, **kwargs)
+        self.failed = []
+
+    def fail_once(self, name):
+        if name in self.failures and name not in self.failed:
+            self.failed.append(name)
+            raise StreamingError('503 unavailable')
+
+    def handshake(self):
+        self.fail_once('handshake')
+        super(FlakyStreamingClient, self).handshake()
+
+    def connect(self):
+        self.fail_once('connect')
+        return super(FlakyStreamingClient, self).connect()
+
+
+def change_event(change_type, record_ids, replay_id=1, entity='Account', **fields):
+    payload = dict(fields, ChangeEventHeader={'entityName': entity, 'changeType': change_type,
+                                              'recordIds': record_ids, 'changedFields': list(fields)})
+    return {'channel': '/data/%sChangeEvent' % entity,
+            'data': {'payload': payload, 'event': {'replayId': replay_id}}}
+
+
+class ChangeEventConsumerTest(SalesforceTestCase):
+
+    def setUp(self):
+        super(ChangeEventConsumerTest, self).setUp()
+        self.account_ids, _ = generators.seed_store(self.store, accounts=3)
+
+    def test_flatten_change_payload(self):
+        header, record = flatten_change_payload({
+            'ChangeEventHeader': {'changeType': 'UPDATE', 'changedFields': ['Name.LastName', 'Phone']},
+            'Name': {'FirstName': 'Ada', 'LastName': 'Lovelace'}, 'Phone': '1', 'Fax': None})
+
+        self.assertEqual(header['changeType'], 'UPDATE')
+        self.assertEqual(record, {'LastName': 'Lovelace', 'Phone': '1'})
+
+    def test_events_are_applied_to_every_model_of_the_table(self):
+        consumer = ChangeEventConsumer([BenchmarkAccount, BenchmarkUniqueAccount], replay=REPLAY_ALL)
+
+        self.assertEqual(consumer.run(max_bursts=1), 1)
+
+        for model in (BenchmarkAccount, BenchmarkUniqueAccount):
+            self.assertEqual(sorted(model.objects.values_list('salesforce_id', flat=True)), sorted(self.account_ids))
+        self.assertEqual(StreamReplayId.objects.get(channel='/data/AccountChangeEvent').replay_id, 3)
+
+    def test_gap_events_pull_their_records(self):
+        BenchmarkAccount.pull_all()
+        self.store.update('Account', self.account_ids[0], {'Name': 'Changed'})
+        self.store.delete('Account', self.account_ids[1])
+        consumer = ChangeEventConsumer([BenchmarkAccount])
+
+        consumer.apply([change_event('GAP_UPDATE', [self.account_ids[0]], replay_id=1),
+                        change_event('GAP_DELETE', [self.account_ids[1]], replay_id=2)])
+
+        self.assertEqual(BenchmarkAccount.objects.get(salesforce_id=self.account_ids[0]).name, 'Changed')
+        self.assertFalse(BenchmarkAccount.objects.filter(salesforce_id=self.account_ids[1]).exists())
+        self.assertEqual(StreamReplayId.objects.get(channel='/data/AccountChangeEvent').replay_id, 2)
+
+    def test_update_of_a_stored_record_applies_its_changed_fields(self):
+        BenchmarkAccount.pull_all()
+        industry = BenchmarkAccount.objects.get(salesforce_id=self.account_ids[0]).industry
+        requests = self.server.request_count
+
+        ChangeEventConsumer([BenchmarkAccount]).apply([change_event('UPDATE', [self.account_ids[0]], Name='Changed')])
+
+        account = BenchmarkAccount.objects.get(salesforce_id=self.account_ids[0])
+        self.assertEqual((account.name, account.industry), ('Changed', industry))
+        self.assertEqual(self.server.request_count, requests)
+
+    def test_update_of_a_missing_record_pulls_it(self):
+        self.store.update('Account', self.account_ids[0], {'Name': 'Changed'})
+
+        ChangeEventConsumer([BenchmarkAccount]).apply([change_event('UPDATE', [self.account_ids[0]], Name='Changed'),
+                                                       change_event('UNDELETE', [self.account_ids[1]], Name='Back')])
+
+        record = self.store.get('Account', self.account_ids[0])
+        account = BenchmarkAccount.objects.get(salesforce_id=self.account_ids[0])
+        self.assertEqual((account.name, account.industry), ('Changed', record['Industry']))
+        self.assertEqual(BenchmarkAccount.objects.get(salesforce_id=self.account_ids[1]).name,
+                         self.store.get('Account', self.account_ids[1])['Name'])
+
+    def test_gap_overflow_pulls_the_table(self):
+        consumer = ChangeEventConsumer([BenchmarkAccount, BenchmarkUniqueAccount])
+
+        consumer.apply([change_event('GAP_OVERFLOW', [])])
+
+        self.assertEqual(BenchmarkAccount.objects.count(), 3)
+        self.assertEqual(BenchmarkUniqueAccount.objects.count(), 3)
+
+    def test_gap_overflow_pulls_after_the_burst_committed(self):
+        generators.seed_store(self.store, accounts=0, contacts=1)
+        contact_id = list(self.store.tables['Contact'])[0]
+        consumer = ChangeEventConsumer([BenchmarkAccount, BenchmarkContact])
+
+        with mock.patch.object(BenchmarkAccount, 'pull_all', side_effect=RuntimeError('pull failed')):
+            with self.assertRaises(RuntimeError):
+                consumer.apply([change_event('GAP_OVERFLOW', [], replay_id=4),
+                                change_event('GAP_CREATE', [contact_id], replay_id=5, entity='Contact')])
+
+        self.assertTrue(BenchmarkContact.objects.filter(salesforce_id=contact_id).exists())
+        self.assertEqual(list(StreamReplayId.objects.values_list('channel', 'replay_id')),
+                         [('/data/ContactChangeEvent', 5)])
+
+    def test_failed_handshake_and_connect_are_retried(self):
+        client = FlakyStreamingClient.from_salesforce(self.salesforce_client)
+        consumer = ChangeEventConsumer([BenchmarkAccount], client=client, replay=REPLAY_ALL, reconnect_delay=0)
+
+        self.assertEqual(consumer.run(max_bursts=1), 1)
+
+        self.assertEqual(client.failed, ['handshake', 'connect'])
+        self.assertEqual(BenchmarkAccount.objects.count(), 3)
@@ -0,0 +1,103 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+
+from ..benchmark import generators
+from ..benchmark.models import BenchmarkAccount
+from ..models import SyncRun
+from .base import SalesforceTestCase
+
+
+class Interrupted(Exception):
+    pass
+
+
+class CheckpointedPullTest(SalesforceTestCase):
+    page_size = 2
+
+    def setUp(self):
+        super(CheckpointedPullTest, self).setUp()
+        self.account_ids, _ = generators.seed_store(self.store, accounts=5)
+
+    def interrupt(self, target, name, after):
+        """make `target.name` raise from its call number `after + 1`"""
+        original, calls = getattr(target, name), []
+
+        def side_effect(*args, **kwargs):
+            calls.append(1)
+            if len(calls) > after:
+                raise Interrupted()
+            return original(*args, **kwargs)
+        return mock.patch.object(target, name, side_effect=side_effect)
+
+    def test_runs_are_checkpointed(self):
+        existed, new, deleted = BenchmarkAccount.pull_all(checkpoint=True)
+
+        run = SyncRun.objects.get()
+        self.assertEqual(len(new), 5)
+        self.assertEqual(run.status, SyncRun.DONE)
+        self.assertEqual((run.total_size, run.processed, run.created, run.updated), (5, 5, 5, 0))
+        self.assertEqual(run.last_id, max(self.account_ids))
+        self.assertIsNone(run.next_records_url)
+
+    def test_failed_run_keeps_committed_pages(self):
+        with self.interrupt(BenchmarkAccount, '_pull_records', after=1), self.assertRaises(Interrupted):
+            BenchmarkAccount.pull_all(checkpoint=True)
+
+        run = SyncRun.objects.get()
+        self.assertEqual(run.status, SyncRun.FAILED)
+        self.assertEqual(run.processed, 2)
+        self.assertIsNotNone(run.next_records_url)
+        self.assertEqual(BenchmarkAccount.objects.count(), 2)
+
+    def test_resume_from_query_locator(self):
+        with self.interrupt(self.salesforce_client, 'query_more', after=1), self.assertRaises(Interrupted):
+            BenchmarkAccount.pull_all(checkpoint=True)
+        self.assertEqual(SyncRun.objects.get().processed, 4)
+        query_count = self.server.request_count
+
+        existed, new, deleted = BenchmarkAccount.pull_all(resume=True)
+
+        run = SyncRun.objects.get()
+        self.assertEqual((run.status, run.processed, run.created), (SyncRun.DONE, 5, 5))
+        self.assertEqual((len(new), len(deleted)), (1, 0))
+        self.assertEqual(self.server.request_count, query_count + 1)
+        self.assertEqual(sorted(BenchmarkAccount.objects.values_list('salesforce_id', flat=True)),
+                         sorted(self.account_ids))
+
+    def test_resume_after_last_id_when_locator_expired(self):
+        with self.interrupt(BenchmarkAccount, '_pull_records', after=1), self.assertRaises(Interrupted):
+            BenchmarkAccount.pull_all(checkpoint=True)
+        self.store.cursors.clear()
+
+        existed, new, deleted = BenchmarkAccount.pull_all(resume=True)
+
+        run = SyncRun.objects.get()
+        self.assertEqual((run.status, run.processed), (SyncRun.DONE, 5))
+        self.assertEqual(len(new), 3)
+        self.assertEqual(BenchmarkAccount.objects.count(), 5)
+
+    def test_resumed_run_deletes_stale_rows_only(self):
+        BenchmarkAccount.pull_all()
+        self.store.delete('Account', self.account_ids[-1], hard=True)
+        with self.interrupt(self.salesforce_client, 'query_more', after=0), self.assertRaises(Interrupted):
+            BenchmarkAccount.pull_all(checkpoint=True)
+
+        existed, new, deleted = BenchmarkAccount.pull_all(resume=True)
+
+        self.assertEqual([x.salesforce_id for x in deleted], [self.account_ids[-1]])
+        self.assertEqual(BenchmarkAccount.objects.count(), 4)
+
+    def test_done_run_is_not_resumed(self):
+        BenchmarkAccount.pull_all(checkpoint=True)
+        BenchmarkAccount.pull_all(resume=True)
+
+        self.assertEqual(SyncRun.objects.filter(status=SyncRun.DONE).count(), 2)
+
+    def test_sf_pull_command(self):
+        out = StringIO()
+        call_command('sf_pull', 'benchmark.BenchmarkAccount', stdout=out)
+
+        self.assertIn('BenchmarkAccount: 0 updated, 5 created, 0 deleted', out.getvalue())
+        self.assertEqual(SyncRun.objects.get().status, SyncRun.DONE)
@@ -0,0 +1,98 @@
+import json
+import os
+import shutil
+import tempfile
+
+from django.test import SimpleTestCase, override_settings
+
+from .. import tracing
+from ..benchmark import generators
+from ..benchmark.models import BenchmarkAccount, BenchmarkContact
+from .base import SalesforceTestCase
+
+
+class SpanTest(SimpleTestCase):
+
+    def test_spans_need_a_trace(self):
+        with tracing.span('deserialize') as stage:
+            stage.set(count=1)
+
+        self.assertIs(stage, tracing.NULL_SPAN)
+        self.assertFalse(tracing.is_tracing())
+
+    def test_trace_collects_spans(self):
+        with tracing.trace('tests') as tracer:
+            with tracing.span('deserialize', table='Account') as stage:
+                stage.set(count=3)
+            with self.assertRaises(ValueError), tracing.span('db_write'):
+                raise ValueError('locked')
+            tracing.add_span('fetch', 1.0, 1.5)
+        with tracing.span('outside'):
+            pass
+
+        self.assertEqual([x.name for x in tracer.spans], ['deserialize', 'db_write', 'fetch'])
+        self.assertEqual(tracer.spans[0].attributes, {'table': 'Account', 'count': 3})
+        self.assertEqual(tracer.spans[1].attributes['error'], "ValueError('locked')")
+        self.assertEqual(tracer.stages()['deserialize']['count'], 3)
+        self.assertIn('deserialize 1x', tracer.summary())
+        event = tracer.as_chrome_trace()['traceEvents'][2]
+        self.assertEqual((event['ph'], event['ts'], event['dur']), ('X', 1000000, 500000))
+
+    def test_callbacks(self):
+        spans = []
+        tracing.register_callback(spans.append)
+        self.addCleanup(tracing.unregister_callback, spans.append)
+        tracing.register_callback(lambda span: 1 / 0)
+        self.addCleanup(tracing._callbacks.pop)
+
+        with tracing.span('db_read'):
+            pass
+
+        self.assertEqual([x.name for x in spans], ['db_read'])
+
+    def test_opentelemetry_callback(self):
+        started = []
+
+        class OtelSpan(object):
+            def end(self, end_time):
+                started[-1].append(end_time)
+
+        class OtelTracer(object):
+            def start_span(self, name, start_time, attributes):
+                started.append([name, start_time, attributes])
+                return OtelSpan()
+
+        tracing.opentelemetry_callback(OtelTracer())(tracing.Span('fetch', 1.0, 2.0, table='Account', count=None))
+
+        self.assertEqual(started, [['salesforce.fetch', 10 ** 9, {'table': 'Account'}, 2 * 10 ** 9]])
+
+
+class PullTraceTest(SalesforceTestCase):
+
+    def setUp(self):
+        super(PullTraceTest, self).setUp()
+        generators.seed_store(self.store, accounts=3, contacts=3)
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def test_pull_all_stages(self):
+        path = os.path.join(self.directory, 'pull_all.trace.json')
+        BenchmarkAccount.pull_all()
+
+        with tracing.trace('pull_all', path=path) as tracer:
+            BenchmarkContact.pull_all()
+
+        stages = tracer.stages()
+        for name in ('pull_all', 'fetch', 'decode', 'db_read', 'deserialize', 'fk_resolve', 'db_write'):
+            self.assertIn(name, stages)
+        self.assertEqual(stages['deserialize']['count'], 3)
+        with open(path) as f:
+            self.assertEqual(len(json.load(f)['traceEvents']), len(tracer.spans))
+
+    def test_profile_dir(self):
+        with override_settings(SALESFORCE_PROFILE_DIR=self.directory):
+            BenchmarkAccount.pull_all()
+
+        names = os.listdir(self.directory)
+        self.assertEqual(len(names), 1)
+        self.assertTrue(names[0].startswith('BenchmarkAccount.pull_all.'))
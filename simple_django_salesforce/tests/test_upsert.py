@@ -0,0 +1,84 @@
+from decimal import Decimal
+
+from ..benchmark import generators
+from ..benchmark.models import BenchmarkUniqueAccount, BenchmarkUniqueContact
+from .base import SalesforceTestCase
+
+
+class UpsertRecordsTest(SalesforceTestCase):
+
+    def setUp(self):
+        super(UpsertRecordsTest, self).setUp()
+        self.account_ids, self.contact_ids = generators.seed_store(self.store, accounts=3, contacts=3)
+        BenchmarkUniqueAccount.pull_all()
+        BenchmarkUniqueContact.pull_all()
+
+    def test_pull_all_creates_and_updates(self):
+        self.assertEqual(BenchmarkUniqueAccount.objects.count(), 3)
+        self.store.update('Account', self.account_ids[0], {'Name': 'Renamed'})
+
+        existed, new, deleted = BenchmarkUniqueAccount.pull_all()
+
+        self.assertEqual((len(existed), len(new), len(deleted)), (3, 0, 0))
+        account = BenchmarkUniqueAccount.objects.get(salesforce_id=self.account_ids[0])
+        self.assertEqual(account.name, 'Renamed')
+        self.assertTrue(account.is_sync)
+        self.assertEqual(sorted(x.pk for x in existed), sorted(BenchmarkUniqueAccount.objects.values_list('pk', flat=True)))
+
+    def test_partial_record_keeps_stored_values(self):
+        before = BenchmarkUniqueAccount.objects.get(salesforce_id=self.account_ids[0])
+
+        BenchmarkUniqueAccount._pull_records([{'Id': before.salesforce_id, 'IsDeleted': False, 'Name': 'Partial'}])
+
+        after = BenchmarkUniqueAccount.objects.get(pk=before.pk)
+        self.assertEqual(after.name, 'Partial')
+        self.assertEqual(after.industry, before.industry)
+        self.assertEqual(after.annual_revenue, before.annual_revenue)
+        self.assertEqual(after.employees, before.employees)
+        self.assertEqual(after.description, before.description)
+        self.assertEqual(after.founded, before.founded)
+
+    def test_partial_records_of_one_page_keep_their_own_values(self):
+        first, second = BenchmarkUniqueAccount.objects.filter(salesforce_id__in=self.account_ids[:2]).order_by('pk')
+
+        BenchmarkUniqueAccount._pull_records([
+            {'Id': first.salesforce_id, 'IsDeleted': False, 'Name': 'First'},
+            {'Id': second.salesforce_id, 'IsDeleted': False, 'Description': 'Second'},
+        ])
+
+        first_after, second_after = BenchmarkUniqueAccount.objects.filter(pk__in=[first.pk, second.pk]).order_by('pk')
+        self.assertEqual((first_after.name, first_after.description), ('First', first.description))
+        self.assertEqual((second_after.name, second_after.description), (second.name, 'Second'))
+
+    def test_unresolved_foreign_key_keeps_stored_value(self):
+        contact = BenchmarkUniqueContact.objects.exclude(account=None).first()
+        self.assertIsNotNone(contact.account_id)
+        record = dict(self.store.get('Contact', contact.salesforce_id), IsDeleted=False,
+                      AccountId='001000000000000AAA', LastName='Moved')
+
+        BenchmarkUniqueContact._pull_records([record])
+
+        contact_after = BenchmarkUniqueContact.objects.get(pk=contact.pk)
+        self.assertEqual(contact_after.last_name, 'Moved')
+        self.assertEqual(contact_after.account_id, contact.account_id)
+
+    def test_unchanged_records_are_not_written(self):
+        account = BenchmarkUniqueAccount.objects.get(salesforce_id=self.account_ids[0])
+        record = dict(self.store.get('Account', account.salesforce_id), IsDeleted=False)
+
+        BenchmarkUniqueAccount._pull_records([record])
+
+        after = BenchmarkUniqueAccount.objects.get(pk=account.pk)
+        self.assertEqual(after.modify_at, account.modify_at)
+        self.assertGreaterEqual(after.sync_at, account.sync_at)
+
+    def test_decimal_of_float_is_unchanged(self):
+        account = BenchmarkUniqueAccount.objects.get(salesforce_id=self.account_ids[0])
+        account.annual_revenue = Decimal('0.10')
+        account.save()
+        account.refresh_from_db()
+        record = dict(self.store.get('Account', account.salesforce_id), IsDeleted=False, AnnualRevenue=0.1)
+
+        BenchmarkUniqueAccount._pull_records([record])
+
+        self.assertEqual(BenchmarkUniqueAccount.objects.get(pk=account.pk).modify_at, account.modify_at)
@@ -0,0 +1,110 @@
+import json
+from unittest import mock
+
+from django.test import override_settings
+
+from ..benchmark import generators
+from ..benchmark.models import BenchmarkAccount
+from .. import webhooks
+from ..model import get_salesforce_models_by_table
+from ..models import PushFailure
+from .base import SalesforceTestCase
+
+OUTBOUND_MESSAGE = '''<?xml version="1.0" encoding="UTF-8"?>
+<soapenv:Envelope xmlns:soapenv="http://schemas.xmlsoap.org/soap/envelope/"
+    xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">
+<soapenv:Body>
+<notifications xmlns="http://soap.sforce.com/2005/09/outbound">
+<OrganizationId>00DFAKE000000000AAA</OrganizationId>
+<Notification>
+<Id>04l000000000001AAA</Id>
+<sObject xsi:type="sf:Account" xmlns:sf="urn:sobject.enterprise.soap.sforce.com">
+<sf:Id>%(id)s</sf:Id>
+<sf:Name>Forged name</sf:Name>
+<sf:NumberOfEmployees>7</sf:NumberOfEmployees>
+</sObject>
+</Notification>
+</notifications>
+</soapenv:Body>
+</soapenv:Envelope>'''
+
+
+@override_settings(SALESFORCE_OUTBOUND_MESSAGE_TOKEN='secret', SALESFORCE_WEBHOOK_TOKEN='secret')
+class OutboundMessageTest(SalesforceTestCase):
+
+    def setUp(self):
+        super(OutboundMessageTest, self).setUp()
+        self.account_ids, _ = generators.seed_store(self.store, accounts=2)
+
+    def post(self, token='secret', record_id=None):
+        return self.client.post('/outbound-message/?token=%s' % token,
+                                OUTBOUND_MESSAGE % {'id': record_id or self.account_ids[0]},
+                                content_type='text/xml')
+
+    def test_parse_keeps_ids_only(self):
+        organization_id, changes = webhooks.parse_outbound_message(
+            (OUTBOUND_MESSAGE % {'id': self.account_ids[0]}).encode())
+
+        self.assertEqual(organization_id, '00DFAKE000000000AAA')
+        self.assertEqual(list(changes['Account'].records.values()), [{'Id': self.account_ids[0]}])
+
+    def test_wrong_token_is_forbidden(self):
+        self.assertEqual(self.post(token='guess').status_code, 403)
+        self.assertFalse(BenchmarkAccount.objects.exists())
+
+    @override_settings(SALESFORCE_OUTBOUND_MESSAGE_TOKEN=None)
+    def test_token_is_required(self):
+        self.assertEqual(self.post(token='').status_code, 403)
+
+    def test_records_are_pulled_from_salesforce(self):
+        response = self.post()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'<Ack>true</Ack>', response.content)
+        account = BenchmarkAccount.objects.get(salesforce_id=self.account_ids[0])
+        remote = self.store.get('Account', self.account_ids[0])
+        self.assertEqual(account.name, remote['Name'])
+        self.assertEqual(account.employees, remote['NumberOfEmployees'])
+
+    def test_unknown_record_is_deleted(self):
+        BenchmarkAccount.pull_all()
+        self.store.delete('Account', self.account_ids[0])
+
+        self.assertEqual(self.post().status_code, 200)
+        self.assertFalse(BenchmarkAccount.objects.filter(salesforce_id=self.account_ids[0]).exists())
+
+    def test_webhook_applies_complete_records(self):
+        record = dict(self.store.get('Account', self.account_ids[1]))
+        record['Name'] = 'From webhook'
+
+        response = self.client.post('/webhook/', json.dumps({'table': 'Account', 'records': [record]}),
+                                    content_type='application/json', HTTP_X_SALESFORCE_WEBHOOK_TOKEN='secret')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(BenchmarkAccount.objects.get(salesforce_id=self.account_ids[1]).name, 'From webhook')
+
+    def test_webhook_rejects_ids_that_are_not_strings(self):
+        for data in ({'table': 'Account', 'records': [{'Id': 5}]}, {'table': 'Account', 'deleted': [['x']]},
+                     {'table': 'Account', 'records': {'Id': self.account_ids[0]}}, {'table': ['Account']}):
+            response = self.client.post('/webhook/', json.dumps(data), content_type='application/json',
+                                        HTTP_X_SALESFORCE_WEBHOOK_TOKEN='secret')
+            self.assertEqual(response.status_code, 400)
+
+    def test_failed_background_apply_is_recorded_and_retried(self):
+        changes = webhooks.parse_webhook({'table': 'Account', 'records': [self.account_ids[0]],
+                                          'deleted': [self.account_ids[1]]})
+
+        with mock.patch.object(BenchmarkAccount, 'pull_by_ids', side_effect=RuntimeError('unavailable')):
+            webhooks.ChangeQueue().apply(changes)
+
+        # every model of the table, the ones after the failed one were not applied either
+        self.assertEqual(PushFailure.objects.filter(operation=PushFailure.PULL).count(),
+                         len(get_salesforce_models_by_table('Account')))
+        failure = PushFailure.objects.get(model='benchmark.BenchmarkAccount')
+        self.assertEqual(failure.operation, PushFailure.PULL)
+        self.assertEqual(json.loads(failure.payload), sorted(self.account_ids[:2]))
+        self.assertIn('unavailable', failure.error)
+
+        self.assertTrue(failure.retry())
+        self.assertEqual(BenchmarkAccount.objects.get(salesforce_id=self.account_ids[0]).name,
+                         self.store.get('Account', self.account_ids[0])['Name'])
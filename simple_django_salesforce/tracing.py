@@ -0,0 +1,248 @@
+"""spans of the sync pipeline stages: fetch, decode, deserialize, fk_resolve, db_write, sync_at ...
+
+    with tracing.trace('Product.pull_all') as tracer:
+        Product.pull_all()
+    print(tracer.summary())
+    tracer.dump('/tmp/pull_all.trace.json')  # chrome://tracing or https://ui.perfetto.dev
+
+spans are only created inside a trace() block of the thread or with a registered callback,
+`settings.SALESFORCE_PROFILE_DIR` runs pull_all() and push() under cProfile
+"""
+import contextlib
+import cProfile
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+log = logging.getLogger(__name__)
+log.setLevel(logging.INFO)
+
+_callbacks = []
+_local = threading.local()
+
+
+class Span(object):
+    """one finished stage"""
+    __slots__ = ('name', 'start', 'end', 'attributes', 'thread_id')
+
+    def __init__(self, name, start, end=None, thread_id=None, **attributes):
+        self.name = name
+        self.start = start
+        self.end = end
+        self.attributes = attributes  # `count`: number of records handled by the stage
+        self.thread_id = thread_id or threading.get_ident()
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    @property
+    def duration(self):
+        return (self.end or time.time()) - self.start
+
+    def __repr__(self):
+        return '<Span %s %.3fs>' % (self.name, self.duration)
+
+
+class _NullSpan(object):
+    """returned when nothing records spans, so instrumented code costs one check"""
+
+    def set(self, **attributes):
+        pass
+
+
+NULL_SPAN = _NullSpan()
+
+
+def register_callback(callback):
+    """register `callback(span)` to be called after every finished span"""
+    if callback not in _callbacks:
+        _callbacks.append(callback)
+
+
+def unregister_callback(callback):
+    if callback in _callbacks:
+        _callbacks.remove(callback)
+
+
+def is_tracing():
+    return bool(_callbacks or getattr(_local, 'tracers', None))
+
+
+def record(span):
+    """dispatch a finished span to active tracers of the thread and callbacks"""
+    for tracer in getattr(_local, 'tracers', ()):
+        tracer.add(span)
+    for callback in list(_callbacks):
+        try:
+            callback(span)
+        except Exception as ex:
+            log.error('[tracing] callback %s failed >> %s' % (callback, ex))
+
+
+def add_span(name, start, end, **attributes):
+    """record a span measured elsewhere"""
+    if is_tracing():
+        record(Span(name, start, end, **attributes))
+
+
+class span(object):
+    """time a stage of the current thread
+
+        with tracing.span('deserialize', table='Account') as stage:
+            ...
+            stage.set(count=len(records))
+    """
+
+    def __init__(self, name, **attributes):
+        self.name = name
+        self.attributes = attributes
+        self.span = None
+
+    def __enter__(self):
+        if not is_tracing():
+            return NULL_SPAN
+        self.span = Span(self.name, time.time(), **self.attributes)
+        return self.span
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self.span is None:
+            return
+        self.span.end = time.time()
+        if exc_type is not None:
+            self.span.set(error=repr(exc_val))
+        record(self.span)
+
+
+class Tracer(object):
+    """spans collected by a trace() block"""
+
+    def __init__(self, name=None):
+        self.name = name
+        self.spans = []
+        self.lock = threading.Lock()
+        self.started_at = time.time()
+        self.finished_at = None
+
+    def add(self, span):
+        with self.lock:
+            self.spans.append(span)
+
+    def finish(self):
+        self.finished_at = time.time()
+
+    def stages(self):
+        """{stage: {'spans', 'seconds', 'count'}} in order of first appearance"""
+        stages = OrderedDict()
+        for span in self.spans:
+            stat = stages.setdefault(span.name, {'spans': 0, 'seconds': 0.0, 'count': 0})
+            stat['spans'] += 1
+            stat['seconds'] += span.duration
+            stat['count'] += span.attributes.get('count', 0) or 0
+        return stages
+
+    def summary(self):
+        stages = ', '.join('%s %sx %.3fs%s' % (name, x['spans'], x['seconds'], ' %s rows' % x['count'] if x['count'] else '')
+                           for name, x in self.stages().items())
+        return '[%s] %.3fs: %s' % (self.name, (self.finished_at or time.time()) - self.started_at, stages)
+
+    def as_chrome_trace(self):
+        """trace event format, complete events in microseconds"""
+        pid = os.getpid()
+        events = []
+        for span in self.spans:
+            events.append({
+                'name': span.name, 'cat': self.name or 'salesforce', 'ph': 'X', 'pid': pid, 'tid': span.thread_id,
+                'ts': int(span.start * 1000000), 'dur': int(span.duration * 1000000),
+                'args': dict((k, v if isinstance(v, (int, float, bool, str)) or v is None else str(v))
+                             for k, v in span.attributes.items()),
+            })
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def dump(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.as_chrome_trace(), f)
+
+
+class trace(object):
+    """collect spans of the current thread within the block, dumped as chrome trace to `path` if given"""
+
+    def __init__(self, name=None, path=None):
+        self.tracer = Tracer(name)
+        self.path = path
+
+    def __enter__(self):
+        if not hasattr(_local, 'tracers'):
+            _local.tracers = []
+        _local.tracers.append(self.tracer)
+        return self.tracer
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        _local.tracers.remove(self.tracer)
+        self.tracer.finish()
+        if self.path:
+            self.tracer.dump(self.path)
+
+
+def get_tracers():
+    return list(getattr(_local, 'tracers', ()))
+
+
+@contextlib.contextmanager
+def attach(tracers):
+    """record spans of this thread to tracers of another thread"""
+    previous = getattr(_local, 'tracers', [])
+    _local.tracers = previous + list(tracers)
+    try:
+        yield
+    finally:
+        _local.tracers = previous
+
+
+def opentelemetry_callback(tracer=None):
+    """callback exporting spans to OpenTelemetry, needs `pip install opentelemetry-api`
+
+        tracing.register_callback(tracing.opentelemetry_callback())
+    """
+    if tracer is None:
+        from opentelemetry import trace as otel_trace
+        tracer = otel_trace.get_tracer('simple_django_salesforce')
+
+    def callback(span):
+        attributes = dict((k, v if isinstance(v, (int, float, bool, str)) else str(v))
+                          for k, v in span.attributes.items() if v is not None)
+        otel_span = tracer.start_span('salesforce.%s' % span.name, start_time=int(span.start * 1e9),
+                                      attributes=attributes)
+        otel_span.end(end_time=int(span.end * 1e9))
+
+    return callback
+
+
+def profiled(func):
+    """run under cProfile when `settings.SALESFORCE_PROFILE_DIR` is set,
+    stats written to `<dir>/<Model>.<function>.<timestamp>.prof` for pstats or snakeviz"""
+
+    @functools.wraps(func)
+    def wrapper(obj, *args, **kwargs):
+        directory = getattr(settings, 'SALESFORCE_PROFILE_DIR', None)
+        if not directory or getattr(_local, 'profiling', False):
+            return func(obj, *args, **kwargs)
+
+        name = '%s.%s' % (obj.__name__ if isinstance(obj, type) else type(obj).__name__, func.__name__)
+        profile = cProfile.Profile()
+        _local.profiling = True
+        try:
+            return profile.runcall(func, obj, *args, **kwargs)
+        finally:
+            _local.profiling = False
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, '%s.%s.prof' % (name, time.strftime('%Y%m%d%H%M%S')))
+            profile.dump_stats(path)
+            log.info('[tracing.profiled] %s profile written to %s' % (name, path))
+
+    return wrapper
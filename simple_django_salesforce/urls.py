@@ -0,0 +1,8 @@
+from django.urls import path
+
+from . import views
+
+urlpatterns = [
+    path('outbound-message/', views.outbound_message, name='salesforce_outbound_message'),
+    path('webhook/', views.webhook, name='salesforce_webhook'),
+]
@@ -0,0 +1,55 @@
+import hmac
+import json
+import logging
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseBadRequest, HttpResponseForbidden, JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+
+from . import webhooks
+
+log = logging.getLogger(__name__)
+log.setLevel(logging.INFO)
+
+
+@csrf_exempt
+@require_POST
+def outbound_message(request):
+    """receive salesforce outbound messages, ack after the notified records are pulled or queued,
+    authenticated by `?token=` in the endpoint url == settings.SALESFORCE_OUTBOUND_MESSAGE_TOKEN"""
+    token = getattr(settings, 'SALESFORCE_OUTBOUND_MESSAGE_TOKEN', None)
+    if not token or not hmac.compare_digest(request.GET.get('token', ''), token):
+        return HttpResponseForbidden()
+
+    try:
+        organization_id, changes = webhooks.parse_outbound_message(request.body)
+    except webhooks.NotificationError as ex:
+        log.error('[outbound_message] %s' % ex)
+        return HttpResponseBadRequest(str(ex))
+
+    expected_organization_id = getattr(settings, 'SALESFORCE_ORGANIZATION_ID', None)
+    if expected_organization_id and (organization_id or '')[:15] != expected_organization_id[:15]:
+        log.warning('[outbound_message] unknown organization id %s' % organization_id)
+        return HttpResponseForbidden()
+
+    webhooks.process(changes)
+    return HttpResponse(webhooks.ACK_RESPONSE % 'true', content_type='text/xml; charset=utf-8')
+
+
+@csrf_exempt
+@require_POST
+def webhook(request):
+    """receive json changes, authenticated by `X-Salesforce-Webhook-Token` == settings.SALESFORCE_WEBHOOK_TOKEN"""
+    token = getattr(settings, 'SALESFORCE_WEBHOOK_TOKEN', None)
+    if not token or not hmac.compare_digest(request.META.get('HTTP_X_SALESFORCE_WEBHOOK_TOKEN', ''), token):
+        return HttpResponseForbidden()
+
+    try:
+        changes = webhooks.parse_webhook(json.loads(request.body.decode('utf-8')))
+    except (ValueError, webhooks.NotificationError) as ex:
+        log.error('[webhook] %s' % ex)
+        return HttpResponseBadRequest(str(ex))
+
+    webhooks.process(changes)
+    return JsonResponse({'success': True, 'records': sum(len(x) for x in changes.values())})
@@ -0,0 +1,221 @@
+"""apply changes pushed by salesforce outbound messages and json webhooks"""
+import logging
+import re
+import threading
+import time
+import xml.etree.ElementTree as ET
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from .client import SalesforceClient
+from .model import get_salesforce_models_by_table
+
+log = logging.getLogger(__name__)
+log.setLevel(logging.INFO)
+
+SOAP_NS = 'http://schemas.xmlsoap.org/soap/envelope/'
+OUTBOUND_NS = 'http://soap.sforce.com/2005/09/outbound'
+XSI_NS = 'http://www.w3.org/2001/XMLSchema-instance'
+SALESFORCE_ID_RE = re.compile(r'^[a-zA-Z0-9]{15}([a-zA-Z0-9]{3})?$')
+
+ACK_RESPONSE = '''<?xml version="1.0" encoding="UTF-8"?>
+<soapenv:Envelope xmlns:soapenv="http://schemas.xmlsoap.org/soap/envelope/">
+<soapenv:Body>
+<notificationsResponse xmlns="http://soap.sforce.com/2005/09/outbound"><Ack>%s</Ack></notificationsResponse>
+</soapenv:Body>
+</soapenv:Envelope>'''
+
+
+class NotificationError(Exception):
+    pass
+
+
+def validate_id(record_id):
+    """a 400 for anything but a salesforce id, salesforce would resend a notification answered by a 500"""
+    if not isinstance(record_id, str) or not SALESFORCE_ID_RE.match(record_id):
+        raise NotificationError('invalid salesforce id `%s`' % (record_id,))
+
+
+class ChangeSet(object):
+    """changes of one salesforce table, complete records are applied as is, others are pulled by id"""
+
+    def __init__(self, table_name):
+        self.table_name = table_name
+        self.records = {}
+        self.deleted_ids = set()
+
+    def add_record(self, record):
+        record_id = record.get(SalesforceClient.DEFAULT_SALESFORCE_KEY_NAME)
+        validate_id(record_id)
+        self.deleted_ids.discard(record_id)
+        self.records[record_id] = dict(self.records.get(record_id, {}), **record)
+
+    def add_deleted(self, record_id):
+        validate_id(record_id)
+        self.records.pop(record_id, None)
+        self.deleted_ids.add(record_id)
+
+    def merge(self, other):
+        for record in other.records.values():
+            self.add_record(record)
+        for record_id in other.deleted_ids:
+            self.add_deleted(record_id)
+
+    def __len__(self):
+        return len(self.records) + len(self.deleted_ids)
+
+    def apply(self):
+        """apply to every model of the table, return number of applied records"""
+        models = get_salesforce_models_by_table(self.table_name)
+        if not models:
+            log.warning('[ChangeSet.apply] no salesforce model for table %s' % self.table_name)
+            return 0
+
+        for model in models:
+            remote_fields = set(model.fields_map.values())
+            records, pull_ids = [], []
+            for record_id, record in self.records.items():
+                if remote_fields.issubset(record):
+                    records.append(record)
+                else:
+                    # notification only carries some fields, pull the whole record
+                    pull_ids.append(record_id)
+            if records or self.deleted_ids:
+                model.apply_remote_changes(records, self.deleted_ids)
+            if pull_ids:
+                model.pull_by_ids(pull_ids)
+        return len(self)
+
+
+def parse_outbound_message(body):
+    """return (organization id, {table: ChangeSet}) from a soap outbound message, only the ids are kept,
+    field values of the message are untyped strings and the records are pulled from salesforce instead"""
+    try:
+        root = ET.fromstring(body)
+    except ET.ParseError as ex:
+        raise NotificationError('invalid xml: %s' % ex)
+
+    notifications = root.find('{%s}Body/{%s}notifications' % (SOAP_NS, OUTBOUND_NS))
+    if notifications is None:
+        raise NotificationError('no notifications in message')
+
+    organization_id = notifications.findtext('{%s}OrganizationId' % OUTBOUND_NS)
+    changes = {}
+    for notification in notifications.findall('{%s}Notification' % OUTBOUND_NS):
+        sobject = notification.find('{%s}sObject' % OUTBOUND_NS)
+        if sobject is None:
+            continue
+        table_name = sobject.get('{%s}type' % XSI_NS, '').split(':')[-1]
+        key_name = SalesforceClient.DEFAULT_SALESFORCE_KEY_NAME
+        record_id = next((x.text for x in sobject if x.tag.split('}')[-1] == key_name), None)
+        changes.setdefault(table_name, ChangeSet(table_name)).add_record({key_name: record_id})
+    return organization_id, changes
+
+
+def parse_webhook(data):
+    """return {table: ChangeSet} from json `{"table": "Product__c", "records": [...], "deleted": [...]}` or a list"""
+    changes = {}
+    for item in data if isinstance(data, list) else [data]:
+        if not isinstance(item, dict) or not item.get('table') or not isinstance(item['table'], str):
+            raise NotificationError('missing `table`')
+        for name in ('records', 'deleted'):
+            if not isinstance(item.get(name) or [], list):
+                raise NotificationError('`%s` is not a list' % name)
+        change_set = changes.setdefault(item['table'], ChangeSet(item['table']))
+        for record in item.get('records') or []:
+            if not isinstance(record, dict):
+                record = {SalesforceClient.DEFAULT_SALESFORCE_KEY_NAME: record}  # bare id, pull it
+            change_set.add_record(record)
+        for record_id in item.get('deleted') or []:
+            change_set.add_deleted(record_id)
+    return changes
+
+
+class ChangeQueue(object):
+    """collect notifications and apply them in batches from a background thread, so they can be acked at once"""
+
+    def __init__(self, delay=1.0, max_size=1000):
+        self.delay = delay
+        self.max_size = max_size
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.ready = threading.Condition(self.lock)
+        self.thread = None
+
+    def put(self, changes):
+        with self.lock:
+            for table_name, change_set in changes.items():
+                self.pending.setdefault(table_name, ChangeSet(table_name)).merge(change_set)
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self.run, name='salesforce-webhooks')
+                self.thread.daemon = True
+                self.thread.start()
+            self.ready.notify()
+
+    def size(self):
+        return sum(len(x) for x in self.pending.values())
+
+    def take(self):
+        with self.lock:
+            while not self.pending:
+                self.ready.wait()
+            # wait a bit for more notifications of the same burst
+            deadline = time.time() + self.delay
+            while self.size() < self.max_size and time.time() < deadline:
+                self.ready.wait(deadline - time.time())
+            changes, self.pending = self.pending, {}
+        return changes
+
+    def run(self):
+        while True:
+            changes = self.take()
+            try:
+                self.apply(changes)
+            finally:
+                close_old_connections()
+
+    def apply(self, changes):
+        """apply table by table, failures are recorded as the notifications were acked already"""
+        for table_name, change_set in changes.items():
+            try:
+                apply_changes({table_name: change_set})
+            except Exception as ex:
+                record_failure(change_set, ex)
+
+
+def apply_changes(changes):
+    applied = 0
+    for change_set in changes.values():
+        try:
+            applied += change_set.apply()
+        except Exception as ex:
+            log.error('[webhooks.apply_changes] %s failed >> %s' % (change_set.table_name, ex))
+            raise
+    log.info('[webhooks.apply_changes] %s records applied' % applied)
+    return applied
+
+
+def record_failure(change_set, error):
+    """salesforce does not resend acked notifications, queue the pull of their ids in PushFailure
+    for `./manage.py sf_retry_push`"""
+    salesforce_ids = sorted(set(change_set.records) | change_set.deleted_ids)
+    for model in get_salesforce_models_by_table(change_set.table_name):
+        try:
+            from .models import PushFailure
+
+            PushFailure.record(model, PushFailure.PULL, salesforce_ids, error=error)
+        except Exception as ex:
+            log.error('[webhooks.record_failure] notification of %s %s lost >> %s' % (
+                model.__name__, ', '.join(salesforce_ids), ex))
+
+
+queue = ChangeQueue(delay=getattr(settings, 'SALESFORCE_WEBHOOK_BATCH_DELAY', 1.0))
+
+
+def process(changes):
+    """apply in a background batch when `SALESFORCE_WEBHOOK_ASYNC`, otherwise before responding"""
+    if getattr(settings, 'SALESFORCE_WEBHOOK_ASYNC', False):
+        queue.put(changes)
+    else:
+        apply_changes(changes)